@@ -0,0 +1,285 @@
+"""
+A local stand-in for Mojang's servers, serving a synthetic Minecraft version (manifest, version JSON, jar, libraries,
+asset index and objects) with configurable latency and bandwidth
+
+Layout (base URL from FakeCDN.url):
+    /mc/game/version_manifest.json
+    /versions/<version>/<version>.json
+    /versions/<version>/<version>.jar
+    /versions/<version>/minecraft_server.<version>.jar   a server bundle sharing half the client's libraries
+    /indexes/<version>.json
+    /resources/<hash[:2]>/<hash>
+    /libraries/<maven path>
+    /java-runtime/all.json
+    /java-runtime/<component>/manifest.json
+    /java-runtime/files/<sha1>[.lzma]
+"""
+import io
+import lzma
+import time
+import json
+import random
+import hashlib
+import logging
+import zipfile
+import threading
+from http import HTTPStatus
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit
+from mc_launcher_core.web.endpoints import Endpoints
+from mc_launcher_core.web.java_runtime import get_runtime_platform
+
+
+logger = logging.getLogger(__name__)
+
+RUNTIME_COMPONENT = "java-runtime-bench"
+
+# enough of a JVM for javautils.probe_java
+FAKE_JAVA = b"""#!/bin/sh
+echo 'openjdk version "17.0.8" 2023-07-18' >&2
+"""
+
+MINECRAFT_ARGUMENTS = (
+    "--username ${auth_player_name} --version ${version_name} --gameDir ${game_directory} "
+    "--assetsDir ${assets_root} --assetIndex ${assets_index_name} --uuid ${auth_uuid} "
+    "--accessToken ${auth_access_token} --userType ${user_type} --versionType ${version_type}"
+)
+
+# a Mojang style client log config: XML events to the console
+LOG_CONFIG = b"""<?xml version="1.0" encoding="UTF-8"?>
+<Configuration status="WARN">
+    <Appenders>
+        <Console name="SysOut" target="SYSTEM_OUT">
+            <XMLLayout />
+        </Console>
+    </Appenders>
+    <Loggers>
+        <Root level="info">
+            <AppenderRef ref="SysOut"/>
+        </Root>
+    </Loggers>
+</Configuration>
+"""
+
+
+class _FakeCDNRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def do_GET(self):
+        cdn = self.server.cdn
+        body = cdn.files.get(urlsplit(self.path).path)
+
+        if cdn.latency:
+            time.sleep(cdn.latency)
+
+        if body is None:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+
+        if not cdn.bandwidth:
+            self.wfile.write(body)
+            return
+
+        # pace each response to the bandwidth
+        chunk_size = 16 * 1024
+        start = time.monotonic()
+        for offset in range(0, len(body), chunk_size):
+            self.wfile.write(body[offset:offset + chunk_size])
+            ahead = (offset + chunk_size) / cdn.bandwidth - (time.monotonic() - start)
+            if ahead > 0:
+                time.sleep(ahead)
+
+
+class FakeCDN:
+    """
+    Serves a synthetic Minecraft version (or several sharing their libraries and assets) from memory
+    """
+    def __init__(self, mcversion="bench-1.0", assets=2000, asset_size=4096, libraries=40, library_size=256*1024,
+                 jar_size=8*1024*1024, latency=0.0, bandwidth=None, seed=0, host="127.0.0.1", port=0, versions=1,
+                 runtime_files=100, runtime_file_size=16*1024):
+        """
+        :param mcversion: string, id of the synthetic version
+        :param assets: int, number of asset objects
+        :param asset_size: int, average asset size in bytes
+        :param libraries: int, number of libraries
+        :param library_size: int, average library size in bytes
+        :param jar_size: int, size of the client jar in bytes
+        :param latency: float, seconds added before each response
+        :param bandwidth: int / None, bytes per second for each response (None for unlimited)
+        :param seed: int, the generated files only depend on the parameters and this
+        :param host: string
+        :param port: int, 0 to pick a free port
+        :param versions: int, number of versions, the extra ones (<mcversion>-2, ...) have their own jar and version JSON
+        but share the libraries and asset index
+        :param runtime_files: int, number of files in the Java runtime the versions ask for
+        :param runtime_file_size: int, average runtime file size in bytes
+        """
+        self.mcversion = mcversion
+        self.versions = [mcversion] + ["{}-{}".format(mcversion, i) for i in range(2, versions + 1)]
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.files = dict()  # URL path -> bytes
+
+        self._httpd = ThreadingHTTPServer((host, port), _FakeCDNRequestHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.cdn = self
+        self._thread = None
+
+        self._generate(random.Random(seed), assets, asset_size, libraries, library_size, jar_size, runtime_files, runtime_file_size)
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return "http://{}:{}/".format(host, port)
+
+    @property
+    def manifest_url(self):
+        return self.url + "mc/game/version_manifest.json"
+
+    @property
+    def java_runtime_manifest_url(self):
+        return self.url + "java-runtime/all.json"
+
+    @property
+    def endpoints(self):
+        """
+        :return: Endpoints, pointing only at this CDN
+        """
+        return Endpoints([self.url + "resources/"], [self.url + "versions/"], [self.url + "libraries/"])
+
+    def _add(self, path, data):
+        self.files["/" + path] = data
+        return dict(url=self.url + path, sha1=hashlib.sha1(data).hexdigest(), size=len(data))
+
+    def _generate_runtime(self, rng, files, file_size):
+        def add_file(data, executable=False):
+            h = hashlib.sha1(data).hexdigest()
+            return dict(type="file", executable=executable, downloads=dict(
+                raw=self._add("java-runtime/files/" + h, data),
+                lzma=self._add("java-runtime/files/{}.lzma".format(h), lzma.compress(data, lzma.FORMAT_ALONE))
+            ))
+
+        # compressible, like real class libraries
+        words = [rng.randbytes(8) for _ in range(64)]
+        entries = {"bin": dict(type="directory"), "lib": dict(type="directory"), "legal": dict(type="directory")}
+        entries["bin/java"] = add_file(FAKE_JAVA, executable=True)
+        for i in range(files):
+            data = b"".join(rng.choice(words) for _ in range(rng.randint(file_size // 16, file_size * 3 // 16)))
+            entries["lib/file{}.bin".format(i)] = add_file(data)
+        for name in ("java.base", "java.desktop", "java.xml"):
+            entries["legal/{}".format(name)] = dict(type="directory")
+            entries["legal/{}/LICENSE".format(name)] = add_file(b"GPLv2 with the Classpath Exception\n")
+        entries["lib/jvm.link"] = dict(type="link", target="file0.bin")
+
+        manifest = self._add("java-runtime/{}/manifest.json".format(RUNTIME_COMPONENT), json.dumps(dict(files=entries)).encode())
+        self._add("java-runtime/all.json", json.dumps({
+            get_runtime_platform(): {
+                RUNTIME_COMPONENT: [dict(
+                    availability=dict(group=1, progress=100),
+                    manifest=manifest,
+                    version=dict(name="17.0.8", released="2023-07-18T00:00:00+00:00")
+                )]
+            }
+        }).encode())
+
+    def _server_bundle(self, rng, version, libs, jar_size):
+        """
+        A bundled server jar (1.18+ layout): the server and its libraries under META-INF with *.list files naming them
+        """
+        def listed(kind, entries):
+            lines = []
+            for id, path, data in entries:
+                z.writestr("META-INF/{}/{}".format(kind, path), data)
+                lines.append("{}\t{}\t{}".format(hashlib.sha256(data).hexdigest(), id, path))
+            z.writestr("META-INF/{}.list".format(kind), "\n".join(lines) + "\n")
+
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as z:
+            z.writestr("META-INF/main-class", "net.minecraft.server.Main\n")
+            server_only = "bench/server/1.0/server-1.0.jar"
+            listed("libraries", [
+                (lib["name"], lib["downloads"]["artifact"]["path"], self.files["/libraries/" + lib["downloads"]["artifact"]["path"]])
+                for lib in libs[:len(libs) // 2]
+            ] + [("bench:server:1.0", server_only, rng.randbytes(64 * 1024))])
+            listed("versions", [(version, "{0}/server-{0}.jar".format(version), rng.randbytes(jar_size // 2))])
+
+        return self._add("versions/{0}/minecraft_server.{0}.jar".format(version), buffer.getvalue())
+
+    def _generate(self, rng, assets, asset_size, libraries, library_size, jar_size, runtime_files, runtime_file_size):
+        v = self.mcversion
+        self._generate_runtime(rng, runtime_files, runtime_file_size)
+
+        objects = dict()
+        for i in range(assets):
+            data = rng.randbytes(rng.randint(asset_size // 2, asset_size * 3 // 2))
+            h = hashlib.sha1(data).hexdigest()
+            self._add("resources/{}/{}".format(h[:2], h), data)
+            objects["minecraft/bench/asset_{}.bin".format(i)] = dict(hash=h, size=len(data))
+
+        index = self._add("indexes/{}.json".format(v), json.dumps(dict(objects=objects)).encode())
+
+        libs = []
+        for i in range(libraries):
+            path = "bench/lib{0}/1.0/lib{0}-1.0.jar".format(i)
+            info = self._add("libraries/" + path, rng.randbytes(rng.randint(library_size // 2, library_size * 3 // 2)))
+            libs.append(dict(
+                name="bench:lib{}:1.0".format(i),
+                downloads=dict(artifact=dict(path=path, **info))
+            ))
+
+        log_config = self._add("log_configs/client-bench.xml", LOG_CONFIG)
+        logging_config = dict(client=dict(
+            argument="-Dlog4j.configurationFile=${path}",
+            file=dict(id="client-bench.xml", **log_config),
+            type="log4j2-xml"
+        ))
+
+        manifest_versions = []
+        for version in self.versions:
+            client = self._add("versions/{0}/{0}.jar".format(version), rng.randbytes(jar_size))
+            server = self._server_bundle(rng, version, libs, jar_size)
+
+            version_json = self._add("versions/{0}/{0}.json".format(version), json.dumps(dict(
+                id=version,
+                type="release",
+                mainClass="net.minecraft.client.main.Main",
+                minecraftArguments=MINECRAFT_ARGUMENTS,
+                assets=v,
+                assetIndex=dict(id=v, **index),
+                javaVersion=dict(component=RUNTIME_COMPONENT, majorVersion=17),
+                downloads=dict(client=client, server=server),
+                logging=logging_config,
+                libraries=libs
+            )).encode())
+            manifest_versions.append(dict(id=version, type="release", url=version_json["url"]))
+
+        self._add("mc/game/version_manifest.json", json.dumps(dict(
+            latest=dict(release=v, snapshot=v),
+            versions=manifest_versions
+        )).encode())
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-cdn", daemon=True)
+        self._thread.start()
+
+    def shutdown(self):
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._httpd.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
@@ -0,0 +1,116 @@
+"""
+Import time benchmark: times importing the lightweight entry points in fresh interpreters, and checks that none of them
+pull in the heavy modules (unpack200, lzma, zipfile, networking) that should only load on first use
+
+Usage:
+    python benchmarks/import_time.py --output import_results.json
+    python benchmarks/import_time.py --check    # exits with 1 if a heavy module is imported eagerly
+
+Results use the same JSON layout as run.py (and are included in its results), so --compare works on either
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# module -> heavy modules it must not import
+TARGETS = {
+    "mc_launcher_core": ("mc_launcher_core.web", "mc_launcher_core.launch"),
+    "mc_launcher_core.launch": ("mc_launcher_core.web.install",),
+    "mc_launcher_core.models": ("mc_launcher_core.web",),
+    "mc_launcher_core.web.util": (),
+    "mc_launcher_core.web": (),
+}
+HEAVY_MODULES = ("unpack200", "zipfile", "urllib.request", "http.client", "ssl", "asyncio", "email.utils")
+
+_PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps(dict(elapsed=elapsed, loaded=[m for m in {watch!r} if m in sys.modules])))
+"""
+
+
+def probe(module, watch):
+    """
+    Imports module in a fresh interpreter
+    :param module: string
+    :param watch: tuple<string>, modules to report if they got imported
+    :return: dict<elapsed: float, loaded: list<string>>
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(x for x in (ROOT, env.get("PYTHONPATH")) if x)
+
+    output = subprocess.check_output(
+        [sys.executable, "-c", _PROBE.format(module=module, watch=tuple(watch))],
+        env=env
+    )
+    return json.loads(output.decode())
+
+
+def measure_imports(repeat=10):
+    """
+    :param repeat: int, fresh interpreters per module
+    :return: tuple<dict<name: result>, list<string>>, results (in run.py's layout) and eager heavy imports found
+    """
+    results = dict()
+    problems = []
+
+    for module, forbidden in TARGETS.items():
+        watch = HEAVY_MODULES + forbidden
+        runs = []
+        loaded = set()
+
+        probe(module, watch)  # warm the bytecode cache
+        for _ in range(repeat):
+            result = probe(module, watch)
+            runs.append(result["elapsed"])
+            loaded.update(result["loaded"])
+
+        for name in sorted(loaded):
+            problems.append("import {} loads {}".format(module, name))
+
+        results["import " + module] = dict(
+            runs=runs,
+            min=min(runs),
+            median=statistics.median(runs),
+            mean=statistics.mean(runs),
+            unit="s",
+            loaded=sorted(loaded)
+        )
+
+    return results, problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=10, help="fresh interpreters per module")
+    parser.add_argument("--check", action="store_true", help="exit with 1 if a heavy module is imported eagerly")
+    parser.add_argument("--output", help="file to write the JSON results to (default stdout)")
+    args = parser.parse_args(argv)
+
+    results, problems = measure_imports(args.repeat)
+    output = dict(meta=dict(python=sys.version.split()[0]), results=results)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(output, f, indent=2)
+    else:
+        json.dump(output, sys.stdout, indent=2)
+        print()
+
+    for problem in problems:
+        print(problem, file=sys.stderr)
+
+    if args.check and problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
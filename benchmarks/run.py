@@ -0,0 +1,388 @@
+"""
+Benchmarks for the install, verify and launch-prep hot paths, run against a local FakeCDN
+
+Usage:
+    python benchmarks/run.py --output results.json
+    python benchmarks/run.py --latency 0.02 --bandwidth 5000000 --compare results.json
+
+Results are written as JSON (to stdout, or --output) so runs can be compared between commits, --compare prints the
+change in median time against an earlier results file
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import io
+import logging
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mc_launcher_core.web as web  # noqa: E402
+import mc_launcher_core.web.java_runtime as java_runtime  # noqa: E402
+from mc_launcher_core import MinecraftUserProfile  # noqa: E402
+from mc_launcher_core.gamelog import GameLogStore, GameLogWriter, LaunchMetrics, ingest_game_output  # noqa: E402
+from mc_launcher_core.launch import build_commands, CLASSPATH_CACHE_FILENAME  # noqa: E402
+from mc_launcher_core.prewarm import get_prewarm_paths, prewarm_files  # noqa: E402
+from mc_launcher_core.util import java_esque_string_substitutor  # noqa: E402
+from mc_launcher_core.web.batch import download_minecraft_versions  # noqa: E402
+from mc_launcher_core.web.endpoints import set_default_endpoints  # noqa: E402
+from mc_launcher_core.web.install_pipeline import run_install_pipeline  # noqa: E402
+from mc_launcher_core.web.transfer import TransferPolicy, set_default_policy  # noqa: E402
+from mc_launcher_core.web.util import verify_sha1  # noqa: E402
+from fake_cdn import FakeCDN, MINECRAFT_ARGUMENTS, RUNTIME_COMPONENT  # noqa: E402
+from import_time import measure_imports  # noqa: E402
+
+
+logger = logging.getLogger(__name__)
+
+SUBSTITUTIONS = dict(
+    auth_player_name="Player", version_name="bench-1.0", game_directory="/tmp/game", assets_root="/tmp/assets",
+    assets_index_name="bench-1.0", auth_uuid="0" * 32, auth_access_token="a" * 300, user_type="mojang",
+    version_type="release"
+)
+
+
+class BenchSession:
+    """
+    Just enough of a MinecraftSession for build_commands
+    """
+    def __init__(self):
+        self.username = "bench"
+        self.access_token = "a" * 300
+        self.selected_user = MinecraftUserProfile("0" * 32, "Player")
+
+    def get_session_id(self):
+        return "token:{}:{}".format(self.access_token, self.selected_user.id)
+
+
+class Install:
+    """
+    Directories for one install
+    """
+    def __init__(self, root):
+        self.root = root
+        self.bindir = os.path.join(root, "bin")
+        self.assetsdir = os.path.join(root, "assets")
+        self.libdir = os.path.join(root, "libraries")
+        self.nativesdir = os.path.join(self.bindir, "natives")
+        self.gamedir = os.path.join(root, "game")
+
+
+def measure(func, repeat, setup=None, teardown=None):
+    """
+    Times func(*setup()) repeat times
+    :return: dict
+    """
+    runs = []
+    for _ in range(repeat):
+        args = setup() if setup is not None else ()
+        start = time.perf_counter()
+        func(*args)
+        runs.append(time.perf_counter() - start)
+        if teardown is not None:
+            teardown(*args)
+
+    return dict(
+        runs=runs,
+        min=min(runs),
+        median=statistics.median(runs),
+        mean=statistics.mean(runs),
+        unit="s"
+    )
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def point_at(cdn):
+    """
+    Sends all downloads to cdn, with a fresh TransferPolicy so retries / breakers don't carry between runs
+    """
+    set_default_endpoints(cdn.endpoints)
+    set_default_policy(TransferPolicy())
+    web.MINECRAFT_VERSION_MANIFEST_URL = cdn.manifest_url
+    web._minecraft_versions_maybe = None
+    java_runtime.JAVA_RUNTIME_MANIFEST_URL = cdn.java_runtime_manifest_url
+    java_runtime._runtime_manifests.clear()
+
+
+def run_benchmarks(args, workdir):
+    results = dict()
+    selected = set(args.only.split(",")) if args.only else None
+
+    def wanted(name):
+        return selected is None or name in selected
+
+    counter = [0]
+
+    def fresh_install():
+        counter[0] += 1
+        return Install(os.path.join(workdir, "run{}".format(counter[0])))
+
+    def remove(install, *_):
+        shutil.rmtree(install.root, ignore_errors=True)
+
+    with FakeCDN(assets=args.assets, asset_size=args.asset_size, libraries=args.libraries,
+                 library_size=args.library_size, jar_size=args.jar_size, latency=args.latency,
+                 bandwidth=args.bandwidth, versions=args.versions, runtime_files=args.runtime_files) as cdn:
+        mcversion = cdn.mcversion
+
+        # a complete install for the benchmarks that need one
+        point_at(cdn)
+        warm = Install(os.path.join(workdir, "warm"))
+        web.download_minecraft(warm.bindir, warm.assetsdir, warm.libdir, warm.nativesdir, mcversion)
+        index_path = os.path.join(warm.assetsdir, "indexes", "{}.json".format(mcversion))
+        with open(os.path.join(warm.bindir, "minecraft.json")) as f:
+            libraries = json.load(f)["libraries"]
+
+        # build_commands only probes Java for its version, so the CDN's fake runtime does unless --java is given
+        javapath = args.java or java_runtime.install_java_runtime(os.path.join(workdir, "runtimes"), RUNTIME_COMPONENT)
+
+        if wanted("download_minecraft"):
+            def setup():
+                point_at(cdn)
+                return (fresh_install(),)
+
+            results["download_minecraft"] = measure(
+                lambda i: web.download_minecraft(i.bindir, i.assetsdir, i.libdir, i.nativesdir, mcversion),
+                args.repeat, setup, remove
+            )
+
+        if wanted("install_pipeline"):
+            def setup():
+                point_at(cdn)
+                return (fresh_install(),)
+
+            results["install_pipeline"] = measure(
+                lambda i: run_install_pipeline(i.bindir, i.assetsdir, i.libdir, i.nativesdir, mcversion),
+                args.repeat, setup, remove
+            )
+
+        if wanted("save_minecraft_assets"):
+            def setup():
+                point_at(cdn)
+                return (fresh_install(),)
+
+            results["save_minecraft_assets"] = measure(
+                lambda i: web.save_minecraft_assets(index_path, i.assetsdir),
+                args.repeat, setup, remove
+            )
+
+        if wanted("save_minecraft_libs"):
+            def setup():
+                point_at(cdn)
+                return (fresh_install(),)
+
+            results["save_minecraft_libs"] = measure(
+                lambda i: web.save_minecraft_libs(i.libdir, i.nativesdir, libraries),
+                args.repeat, setup, remove
+            )
+
+        # several versions into one install: each separately vs. one deduplicated batch
+        def bindirs_for(install):
+            return {v: os.path.join(install.root, "versions", v) for v in cdn.versions}
+
+        if wanted("download_minecraft_each"):
+            def setup():
+                point_at(cdn)
+                return (fresh_install(),)
+
+            def install_each(install):
+                for v, bindir in bindirs_for(install).items():
+                    web.download_minecraft(bindir, install.assetsdir, install.libdir, os.path.join(bindir, "natives"), v)
+
+            results["download_minecraft_each"] = measure(install_each, args.repeat, setup, remove)
+
+        if wanted("download_minecraft_versions"):
+            def setup():
+                point_at(cdn)
+                return (fresh_install(),)
+
+            results["download_minecraft_versions"] = measure(
+                lambda i: download_minecraft_versions(bindirs_for(i), i.assetsdir, i.libdir),
+                args.repeat, setup, remove
+            )
+
+        if wanted("download_minecraft_server"):
+            # into a fresh server directory, sharing the warm install's library cache
+            def setup():
+                point_at(cdn)
+                return (fresh_install(),)
+
+            results["download_minecraft_server"] = measure(
+                lambda i: web.download_minecraft_server(os.path.join(i.root, "server"), mcversion, warm.libdir),
+                args.repeat, setup, remove
+            )
+
+        if wanted("install_java_runtime"):
+            def setup():
+                point_at(cdn)
+                return (fresh_install(),)
+
+            results["install_java_runtime"] = measure(
+                lambda i: java_runtime.install_java_runtime(os.path.join(i.root, "runtimes"), RUNTIME_COMPONENT),
+                args.repeat, setup, remove
+            )
+
+    if wanted("verify_sha1"):
+        with open(index_path) as f:
+            objects = json.load(f)["objects"].values()
+
+        tree = [
+            (os.path.join(warm.assetsdir, "objects", o["hash"][:2], o["hash"]), o["hash"])
+            for o in objects
+        ]
+
+        def verify_tree():
+            for path, sha1 in tree:
+                if not verify_sha1(path, sha1):
+                    raise AssertionError("Hash mismatch: {}".format(path))
+
+        results["verify_sha1"] = measure(verify_tree, args.repeat)
+
+    if wanted("prewarm"):
+        # everything the warm install's launch reads (a warm page cache here, so this is the overhead of prewarming)
+        prewarm_paths = get_prewarm_paths(warm.bindir, warm.libdir, warm.assetsdir, ("*",))
+        results["prewarm"] = measure(lambda: prewarm_files(prewarm_paths), args.repeat)
+        results["prewarm_read"] = measure(lambda: prewarm_files(prewarm_paths, read=True), args.repeat)
+
+    if wanted("gamelog_ingest") or wanted("gamelog_search"):
+        # console output as the log config makes the game write it
+        output = "".join(
+            '<log4j:Event logger="bench.Logger{0}" timestamp="{1}" level="{2}" thread="Render thread">\n'
+            '  <log4j:Message><![CDATA[Bench message {0} with some detail]]></log4j:Message>\n'
+            '</log4j:Event>\n\n'.format(i, 1700000000000 + i, "ERROR" if i % 1000 == 0 else "INFO")
+            for i in range(args.log_events)
+        ).encode()
+        logdir = os.path.join(workdir, "logs")
+
+        def ingest():
+            store = GameLogStore(logdir)
+            writer = GameLogWriter(store, "bench")
+            ingest_game_output(io.BytesIO(output), writer, LaunchMetrics("bench", time.time()), echo=None)
+            writer.close()
+            return store
+
+        if wanted("gamelog_ingest"):
+            results["gamelog_ingest"] = measure(ingest, args.repeat, teardown=lambda *_: shutil.rmtree(logdir, ignore_errors=True))
+
+        if wanted("gamelog_search"):
+            store = ingest()
+            # ERROR events are in 1 block in 2 or so, the rest are skipped by the index
+            results["gamelog_search"] = measure(lambda: sum(1 for _ in store.search("detail", level="ERROR")), args.repeat)
+            shutil.rmtree(logdir, ignore_errors=True)
+
+    if wanted("java_esque_string_substitutor"):
+        items = MINECRAFT_ARGUMENTS.split(" ")
+
+        def substitute():
+            for _ in range(args.substitutions):
+                for item in items:
+                    java_esque_string_substitutor(item, **SUBSTITUTIONS)
+
+        results["java_esque_string_substitutor"] = measure(substitute, args.repeat)
+
+    if wanted("imports"):
+        import_results, problems = measure_imports(args.repeat)
+        results.update(import_results)
+        for problem in problems:
+            logger.error("Heavy module imported eagerly: {}".format(problem))
+
+    if wanted("build_commands") or wanted("build_commands_cold"):
+        def build():
+            build_commands(warm.bindir, warm.gamedir, warm.assetsdir, javapath, BenchSession(), 2048, warm.libdir)
+
+        def clear_class_path_cache():
+            cache = os.path.join(warm.bindir, CLASSPATH_CACHE_FILENAME)
+            if os.path.isfile(cache):
+                os.remove(cache)
+            return ()
+
+        if wanted("build_commands_cold"):
+            results["build_commands_cold"] = measure(build, args.repeat, clear_class_path_cache)
+        if wanted("build_commands"):
+            build()
+            results["build_commands"] = measure(build, args.repeat)
+
+    return results
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+
+    for name, result in sorted(results.items()):
+        if name not in baseline:
+            continue
+        before, after = baseline[name]["median"], result["median"]
+        print("{:<32} {:>10.4f}s -> {:>10.4f}s  ({:+.1f}%)".format(
+            name, before, after, (after - before) / before * 100 if before else 0.0
+        ), file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="runs of each benchmark")
+    parser.add_argument("--only", help="comma separated benchmarks to run (\"imports\" for the import times)")
+    parser.add_argument("--assets", type=int, default=2000, help="number of asset objects")
+    parser.add_argument("--asset-size", type=int, default=4096, help="average asset size in bytes")
+    parser.add_argument("--libraries", type=int, default=40, help="number of libraries")
+    parser.add_argument("--library-size", type=int, default=256*1024, help="average library size in bytes")
+    parser.add_argument("--versions", type=int, default=4, help="versions for the multi-version install benchmarks")
+    parser.add_argument("--runtime-files", type=int, default=100, help="number of files in the Java runtime")
+    parser.add_argument("--jar-size", type=int, default=8*1024*1024, help="client jar size in bytes")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds of latency added to each response")
+    parser.add_argument("--bandwidth", type=int, default=None, help="bytes per second for each response")
+    parser.add_argument("--substitutions", type=int, default=2000, help="argument lists substituted per run")
+    parser.add_argument("--log-events", type=int, default=50000, help="log events for the game log benchmarks")
+    parser.add_argument("--java", help="Java executable for build_commands (defaults to the fake CDN's runtime)")
+    parser.add_argument("--output", help="file to write the JSON results to (default stdout)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.ERROR)
+
+    workdir = tempfile.mkdtemp(prefix="mc_launcher_core_bench_")
+    try:
+        results = run_benchmarks(args, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    output = dict(
+        meta=dict(
+            timestamp=time.time(),
+            commit=git_commit(),
+            python=platform.python_version(),
+            platform=platform.platform(),
+            params={k: v for k, v in vars(args).items() if k not in ("output", "compare", "only")}
+        ),
+        results=results
+    )
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(output, f, indent=2)
+    else:
+        json.dump(output, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
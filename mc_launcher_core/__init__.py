@@ -1,12 +1,39 @@
 """
 In charge of the base low-level Minecraft API stuff
+
+Importing the package is kept cheap (launchers are often started just to run one short command): the networking and
+install stack are only imported when first used, and the names re-exported here are loaded on first access
 """
+import os
+import time
 import logging
-import subprocess
-from mc_launcher_core.web import authenticate_user
-from mc_launcher_core.launch import build_commands
+import importlib
+from mc_launcher_core.exceptions import InvalidLoginError
+from mc_launcher_core.session_store import make_stored_session
 logger = logging.getLogger(__name__)
 
+# name -> module it's loaded from on first access
+_LAZY_ATTRIBUTES = {
+    "build_commands": "mc_launcher_core.launch",
+    "authenticate_user": "mc_launcher_core.web",
+    "validate_token": "mc_launcher_core.web",
+    "refresh_token": "mc_launcher_core.web",
+}
+
+
+def __getattr__(name):
+    module = _LAZY_ATTRIBUTES.get(name)
+    if module is None:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
+
 
 class MinecraftUserProfile:
     """
@@ -35,13 +62,86 @@ def make_minecraft_user_profile(d):
 class MinecraftSession:
     """
     A 'session' of Minecraft, basically loads login information and preps for launching minecraft
-    THE PASSWORD IS NOT STORED. Store the client_token for persistence instead.
+    THE PASSWORD IS NOT STORED. Store the client_token for persistence instead, or use a SessionStore.
     """
-    def __init__(self, username, password, client_token=None):
+    def __init__(self, username, password=None, client_token=None, session_store=None, authserver=None):
+        """
+        :param username: string
+        :param password: string / None, only used if there's no usable session in session_store
+        :param client_token: string / None
+        :param session_store: SessionStore / None, cache of access tokens to validate / refresh before logging in with the password
+        :param authserver: string / None, base URL of the auth server, defaults to web.AUTHSERVER_URL
+        """
         self.username = username
         self.available_users = []
+        self.session_store = session_store
+        self.authserver = authserver
 
-        self._authenticate(password, client_token)
+        if session_store is None or not self._restore(password is not None):
+            if password is None:
+                raise InvalidLoginError()
+            self._authenticate(password, client_token)
+
+    def _restore(self, can_log_in=False):
+        """
+        Tries to reuse the session from session_store, validating and refreshing it as needed
+        :param can_log_in: bool, whether there's a password to fall back on, if so failing to reach the auth server
+        isn't fatal
+        :return: bool, whether a usable session was restored
+        """
+        from mc_launcher_core.web import validate_token, refresh_token
+
+        stored = self.session_store.get(self.username)
+        if stored is None:
+            return False
+
+        if self.session_store.is_trusted(stored):
+            logger.debug("Using cached session for: {}".format(self.username))
+            self._load_stored(stored)
+            return True
+
+        try:
+            valid = validate_token(stored.access_token, stored.client_token, self.authserver)
+        except Exception as ex:
+            if not can_log_in:
+                raise
+            logger.warning("Failed to validate session for: {} ({!r}), logging in with the password".format(self.username, ex))
+            return False
+
+        if valid:
+            logger.debug("Cached session for: {} is still valid".format(self.username))
+            stored.validated_at = time.time()
+            self.session_store.put(stored)
+        else:
+            logger.info("Cached session for: {} is invalid, refreshing...".format(self.username))
+            try:
+                res = refresh_token(stored.access_token, stored.client_token, True, self.authserver)
+            except InvalidLoginError:
+                logger.info("Failed to refresh session for: {}".format(self.username))
+                self.session_store.remove(self.username)
+                return False
+            except Exception as ex:
+                if not can_log_in:
+                    raise
+                logger.warning("Failed to refresh session for: {} ({!r}), logging in with the password".format(self.username, ex))
+                return False
+
+            stored = make_stored_session(self.username, res, stored.client_token)
+            self.session_store.put(stored)
+
+        self._load_stored(stored)
+        return True
+
+    def _load_stored(self, stored):
+        """
+        :param stored: StoredSession
+        :return: None
+        """
+        self.client_token = stored.client_token
+        self.access_token = stored.access_token
+        self.selected_user = make_minecraft_user_profile(stored.selected_profile)
+        self.user_id = stored.user_id
+        self.available_users = [make_minecraft_user_profile(user) for user in stored.available_profiles]
 
     def _authenticate(self, password, client_token):
         """
@@ -50,20 +150,18 @@ class MinecraftSession:
         :param client_token: string / None
         :return: None
         """
-        res = authenticate_user(self.username, password, True, client_token)
+        from mc_launcher_core.web import authenticate_user
 
-        if client_token is not None:
-            self.client_token = client_token
-        else:
-            self.client_token = res["clientToken"]
+        res = authenticate_user(self.username, password, True, client_token, self.authserver)
 
-        self.access_token = res["accessToken"]
+        stored = make_stored_session(self.username, res, client_token)
+        if client_token is not None:
+            stored.client_token = client_token
 
-        self.selected_user = make_minecraft_user_profile(res["selectedProfile"])
-        self.user_id = res["user"]["id"]
+        self._load_stored(stored)
 
-        for user in res["availableProfiles"]:
-            self.available_users.append(make_minecraft_user_profile(user))
+        if self.session_store is not None:
+            self.session_store.put(stored)
 
     def get_session_id(self):
         return "token:{}:{}".format(self.access_token, self.selected_user.id)
@@ -71,16 +169,32 @@ class MinecraftSession:
     def select_user(self):
         raise NotImplementedError()
 
-    def launch(self, bindir, gamedir, assetsdir, javapath, memory, libcache):
+    def launch(self, bindir, gamedir, assetsdir, javapath, memory, libcache, prewarm=False, prewarm_assets=None, placement=None, logdir=None):
         """
         Launch Minecraft
         :param bindir: string, absolute path to the bin directory containing minecraft.jar, modloader.jar (if any), minecraft.json, and natives/
         :param gamedir: string, absolute path to game directory
         :param assetsdir: string, absolute path to the assets directory (this can be shared across Minecraft versions)
         :param javapath: string, absolute path to Java executable
-        :return: None (atm) TODO: return stream of Minecraft output
+        :param prewarm: bool, whether to pull the class path, natives and hot assets into the page cache while the command
+        is built (see mc_launcher_core.prewarm), the report is kept in self.prewarm_report
+        :param prewarm_assets: list<string> / None, asset name patterns to prewarm, defaults to DEFAULT_HOT_ASSETS
+        :param placement: Placement / None, CPUs / limits to run it with (see mc_launcher_core.placement)
+        :param logdir: string / None, where the game's log events and launch metrics are kept (see mc_launcher_core.gamelog), defaults to <gamedir>/launcher_logs
+        :return: LaunchMetrics, phase timings, event counts, exit code and any crash report
         """
-        from pprint import pprint as pp
+        from mc_launcher_core.gamelog import run_game
+        from mc_launcher_core.launch import build_commands
+        from mc_launcher_core.profiles import resolve_profile
+        from mc_launcher_core.placement import get_host_resources, place_commands
+
+        prewarm_task = None
+        if prewarm:
+            from mc_launcher_core.prewarm import DEFAULT_HOT_ASSETS, get_prewarm_paths, start_prewarm
+            prewarm_task = start_prewarm(get_prewarm_paths(
+                bindir, libcache, assetsdir, DEFAULT_HOT_ASSETS if prewarm_assets is None else prewarm_assets
+            ))
+
         commands = build_commands(
             bindir=bindir,
             gamedir=gamedir,
@@ -88,13 +202,21 @@ class MinecraftSession:
             javapath=javapath,
             session=self,
             memory=memory,
-            libcache=libcache
+            libcache=libcache,
+            host=get_host_resources(placement),
+            logging_config=True
         )
+        commands = place_commands(commands, placement)
+
+        if prewarm_task is not None:
+            self.prewarm_report = prewarm_task.wait()
 
         print(commands)
 
-        proc = subprocess.Popen(commands, shell=False)
-        proc.communicate()
+        return run_game(
+            commands, logdir or os.path.join(gamedir, "launcher_logs"),
+            details=dict(version=resolve_profile(bindir)["id"], bindir=bindir, gamedir=gamedir)
+        )
 
 
 if __name__ == "__main__":
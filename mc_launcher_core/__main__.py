@@ -0,0 +1,4 @@
+import sys
+from mc_launcher_core.cli import main
+
+sys.exit(main())
@@ -0,0 +1,309 @@
+"""
+Offline bundles: a whole install (bin directory, libraries, asset index and objects) packed into a single file, for
+provisioning machines that can't reach the internet
+
+A bundle is a pack file:
+    header      8 byte magic, then the offset and size of the index (little endian uint64s)
+    blobs       file contents, each stored once no matter how many files share it
+    index       JSON, {"format": 1, "mcversion": ..., "blobs": {sha1: [offset, size]}, "files": [[root, path, sha1]]}
+root is one of "bin", "lib" or "assets", and path is "/" separated and relative to it. Files are copied in and out of
+the pack with sendfile() where the OS supports it, and blobs are hashed straight out of an mmap of the pack
+"""
+import os
+import json
+import mmap
+import struct
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from mc_launcher_core.exceptions import HashMatchError, InvalidBundleError
+from mc_launcher_core.models import load_libraries_from_file
+from mc_launcher_core.web.util import get_sha1_hash, get_tmp_path
+
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_MAGIC = b"MCLBNDL1"
+BUNDLE_FORMAT = 1
+_HEADER = struct.Struct("<8sQQ")
+
+BIN = "bin"
+LIB = "lib"
+ASSETS = "assets"
+
+# generated per-machine, not worth shipping
+BIN_EXCLUDE = (".classpath_cache.json", "classpath.jar", "classpath.jar.key", ".merged_profile.json")
+
+
+def _copy_range(src_fd, offset, count, dst_fd):
+    """
+    Copies count bytes from src_fd at offset to dst_fd's current position, without going through Python if possible
+    :param src_fd: int
+    :param offset: int
+    :param count: int
+    :param dst_fd: int
+    :return: None
+    """
+    sendfile = getattr(os, "sendfile", None)
+
+    while count > 0:
+        sent = 0
+        if sendfile is not None:
+            try:
+                sent = sendfile(dst_fd, src_fd, offset, count)
+            except OSError:
+                # e.g. not supported between these file types
+                sendfile = None
+
+        if sendfile is None:
+            data = os.pread(src_fd, min(count, 1024 * 1024), offset)
+            sent = os.write(dst_fd, data) if data else 0
+
+        if sent == 0:
+            raise EOFError("Unexpected end of file copying {} bytes at offset {}".format(count, offset))
+
+        offset += sent
+        count -= sent
+
+
+def _walk_files(root):
+    """
+    :param root: string
+    :return: list<string>, "/" separated paths of all files under root
+    """
+    paths = []
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            relpath = os.path.relpath(os.path.join(dirpath, filename), root)
+            paths.append(relpath.replace(os.sep, "/"))
+
+    return sorted(paths)
+
+
+def _join(root, path):
+    return os.path.join(root, *path.split("/"))
+
+
+def collect_install_files(bindir, libdir, assetsdir, mcversion):
+    """
+    Lists the files making up an install
+    :param bindir: string
+    :param libdir: string
+    :param assetsdir: string
+    :param mcversion: string, used to find the asset index
+    :return: list<tuple<root, path, sha1 / None>>, sha1 is given when it's already known (assets)
+    """
+    files = [(BIN, path, None) for path in _walk_files(bindir) if path not in BIN_EXCLUDE]
+
+    library_paths = set()
+    for filename in ("minecraft.json", "modloader.json"):
+        if os.path.isfile(os.path.join(bindir, filename)):
+            for lib in load_libraries_from_file(os.path.join(bindir, filename)):
+                if lib.artifact is not None:
+                    library_paths.add(lib.artifact.path)
+
+    for path in sorted(library_paths):
+        if os.path.isfile(_join(libdir, path)):
+            files.append((LIB, path, None))
+        else:
+            logger.warning("Library: {} isn't installed, leaving it out of the bundle".format(path))
+
+    index_path = "indexes/{}.json".format(mcversion)
+    files.append((ASSETS, index_path, None))
+
+    with open(_join(assetsdir, index_path)) as f:
+        objects = json.load(f)["objects"]
+
+    object_paths = set()
+    for name, asset in sorted(objects.items()):
+        # names often share an object, list it once
+        object_path = "objects/{}/{}".format(asset["hash"][:2], asset["hash"])
+        if object_path not in object_paths:
+            object_paths.add(object_path)
+            files.append((ASSETS, object_path, asset["hash"]))
+
+        # the legacy copies cost nothing, they're the same blobs
+        legacy_path = "virtual/legacy/" + name
+        if os.path.isfile(_join(assetsdir, legacy_path)):
+            files.append((ASSETS, legacy_path, asset["hash"]))
+
+    return files
+
+
+def _hash_file(path):
+    with open(path, 'rb') as f:
+        return get_sha1_hash(f)
+
+
+def export_bundle(bundle_path, bindir, libdir, assetsdir, mcversion, workers=None):
+    """
+    Packs an install into a bundle, storing each distinct file once
+    :param bundle_path: string, where to write the bundle
+    :param bindir: string
+    :param libdir: string
+    :param assetsdir: string
+    :param mcversion: string
+    :param workers: int / None, threads used for hashing
+    :return: dict, the bundle's index
+    """
+    roots = {BIN: bindir, LIB: libdir, ASSETS: assetsdir}
+    files = collect_install_files(bindir, libdir, assetsdir, mcversion)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        hashes = list(pool.map(
+            lambda f: f[2] if f[2] is not None else _hash_file(_join(roots[f[0]], f[1])),
+            files
+        ))
+
+    index = dict(format=BUNDLE_FORMAT, mcversion=mcversion, blobs=dict(), files=[])
+    blobs = index["blobs"]
+
+    tmp_path = "{}.{}.tmp".format(bundle_path, os.getpid())
+    try:
+        with open(tmp_path, 'wb') as out:
+            out.write(_HEADER.pack(BUNDLE_MAGIC, 0, 0))
+            out.flush()
+            offset = _HEADER.size
+
+            for (root, path, _), sha1 in zip(files, hashes):
+                index["files"].append([root, path, sha1])
+                if sha1 in blobs:
+                    continue
+
+                with open(_join(roots[root], path), 'rb') as f:
+                    size = os.fstat(f.fileno()).st_size
+                    os.lseek(out.fileno(), offset, os.SEEK_SET)
+                    _copy_range(f.fileno(), 0, size, out.fileno())
+
+                blobs[sha1] = [offset, size]
+                offset += size
+
+            index_data = json.dumps(index, separators=(",", ":")).encode("utf-8")
+            out.seek(offset)
+            out.write(index_data)
+            out.seek(0)
+            out.write(_HEADER.pack(BUNDLE_MAGIC, offset, len(index_data)))
+
+        os.replace(tmp_path, bundle_path)
+    except BaseException:
+        if os.path.isfile(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    logger.info("Exported {} files ({} distinct) into bundle: {}".format(len(files), len(blobs), bundle_path))
+
+    return index
+
+
+def read_bundle_index(bundle_path):
+    """
+    :param bundle_path: string
+    :return: dict, the bundle's index
+    """
+    with open(bundle_path, 'rb') as f:
+        header = f.read(_HEADER.size)
+        if len(header) != _HEADER.size:
+            raise InvalidBundleError(bundle_path, "File is too small to be a bundle")
+
+        magic, offset, size = _HEADER.unpack(header)
+        if magic != BUNDLE_MAGIC:
+            raise InvalidBundleError(bundle_path, "Not a bundle (bad magic)")
+
+        f.seek(offset)
+        data = f.read(size)
+
+    try:
+        index = json.loads(data.decode("utf-8"))
+    except ValueError:
+        raise InvalidBundleError(bundle_path, "Bundle index is corrupt")
+
+    if index.get("format") != BUNDLE_FORMAT:
+        raise InvalidBundleError(bundle_path, "Unsupported bundle format: {}".format(index.get("format")))
+
+    return index
+
+
+def verify_bundle(bundle_path, index=None, workers=None):
+    """
+    Checks the hash of every blob in the bundle, in parallel
+    :param bundle_path: string
+    :param index: dict / None, the bundle's index if it's already been read
+    :param workers: int / None, threads used for hashing
+    :return: list<string>, sha1s of the blobs that don't match (empty if the bundle is fine)
+    """
+    if index is None:
+        index = read_bundle_index(bundle_path)
+
+    with open(bundle_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        view = memoryview(mm)
+        try:
+            def check(item):
+                sha1, (offset, size) = item
+                # hashlib releases the GIL for big buffers, so this runs in parallel
+                return sha1 if hashlib.sha1(view[offset:offset + size]).hexdigest() != sha1 else None
+
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                bad = [sha1 for sha1 in pool.map(check, index["blobs"].items()) if sha1 is not None]
+        finally:
+            view.release()
+
+    return bad
+
+
+def import_bundle(bundle_path, bindir, libdir, assetsdir, workers=None, verify=True):
+    """
+    Lays a bundle's files out into bindir, libdir and assetsdir. Files already there with the right hash (or, without
+    verify, the right size) are kept
+    :param bundle_path: string
+    :param bindir: string
+    :param libdir: string
+    :param assetsdir: string
+    :param workers: int / None, threads used for hashing and copying
+    :param verify: bool, whether to check every blob's hash first (raises HashMatchError if any don't match), and the
+    hash of files already there
+    :return: dict, the bundle's index
+    """
+    roots = {BIN: bindir, LIB: libdir, ASSETS: assetsdir}
+    index = read_bundle_index(bundle_path)
+
+    if verify:
+        bad = verify_bundle(bundle_path, index, workers)
+        if bad:
+            raise HashMatchError(bundle_path, "bundle", "{} blobs in the bundle are corrupt, e.g. {}".format(len(bad), bad[0]))
+
+    # each destination once, bundles from older exports can list an asset object once per name
+    files = dict()
+    for root, path, sha1 in index["files"]:
+        if root not in roots or path.startswith("/") or ".." in path.split("/"):
+            raise InvalidBundleError(bundle_path, "Bad path in bundle: {}/{}".format(root, path))
+        files.setdefault((root, path), sha1)
+
+    with open(bundle_path, 'rb') as f:
+        src_fd = f.fileno()
+
+        def place(entry):
+            (root, path), sha1 = entry
+            offset, size = index["blobs"][sha1]
+            dst = _join(roots[root], path)
+
+            if os.path.isfile(dst) and os.path.getsize(dst) == size and (not verify or _hash_file(dst) == sha1):
+                return
+
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            tmp = get_tmp_path(dst)
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                _copy_range(src_fd, offset, size, fd)
+            except BaseException:
+                os.close(fd)
+                os.remove(tmp)
+                raise
+            os.close(fd)
+            os.replace(tmp, dst)
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(place, files.items()))
+
+    logger.info("Imported {} files from bundle: {}".format(len(files), bundle_path))
+
+    return index
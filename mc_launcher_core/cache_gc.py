@@ -0,0 +1,346 @@
+"""
+Garbage collection for the caches shared between installs: the library cache (libdir / libcache) and asset objects
+(<assetsdir>/objects)
+
+Installs are registered in a CacheRegistry. The live set is every library and asset object referenced by a registered
+install's merged profile (see mc_launcher_core.profiles) and asset index (or, for a dedicated server, the libraries
+unpacked from its bundle), anything else in the caches is garbage.
+Launches record when each install was last used, so a disk quota can evict the least recently used installs. An evicted
+install is marked (see profiles.EVICTED_FILENAME) so launching it fails clearly until it's reinstalled.
+
+Installs hold the registry's cache lock shared while they write to the caches and collection holds it exclusively, so a
+collection never deletes files an install in progress is about to reference. Files newer than a grace period are kept
+too, for installs that don't use a registry at all
+"""
+import os
+import json
+import time
+import logging
+import threading
+import contextlib
+from collections import Counter
+from mc_launcher_core.profiles import get_profile_path, load_profile_libraries, EVICTED_FILENAME
+from mc_launcher_core.server import SERVER_JAR_FILENAME, load_server_launch
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+logger = logging.getLogger(__name__)
+
+REGISTRY_FILENAME = ".mc_launcher_core_registry.json"
+DEFAULT_GRACE = 3600  # seconds
+
+
+class GCReport:
+    """
+    What a collection found (and, unless it was a dry run, deleted)
+    """
+    def __init__(self):
+        self.live_files = 0
+        self.live_bytes = 0
+        self.garbage = []  # list<tuple<path, size>>
+        self.kept_in_grace = 0
+        self.evicted = []  # list<bindir>
+        self.deleted_bytes = 0
+        self.total_bytes = 0  # cache size after the collection
+
+    @property
+    def reclaimable_bytes(self):
+        return sum(size for _, size in self.garbage)
+
+    def to_dict(self):
+        return dict(
+            live_files=self.live_files,
+            live_bytes=self.live_bytes,
+            garbage_files=len(self.garbage),
+            reclaimable_bytes=self.reclaimable_bytes,
+            kept_in_grace=self.kept_in_grace,
+            evicted=self.evicted,
+            deleted_bytes=self.deleted_bytes,
+            total_bytes=self.total_bytes
+        )
+
+
+class CacheRegistry:
+    """
+    The installs using a libdir and assetsdir, and when each was last used
+    """
+    def __init__(self, libdir, assetsdir, path=None):
+        """
+        :param libdir: string
+        :param assetsdir: string
+        :param path: string / None, registry file, defaults to <assetsdir>/.mc_launcher_core_registry.json
+        """
+        self.libdir = os.path.abspath(libdir)
+        self.assetsdir = os.path.abspath(assetsdir)
+        self.path = path or os.path.join(self.assetsdir, REGISTRY_FILENAME)
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def _flock(self, suffix, operation):
+        if fcntl is None:
+            yield
+            return
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd = os.open(self.path + suffix, os.O_CREAT | os.O_RDWR, 0o644)
+        try:
+            fcntl.flock(fd, operation)
+            yield
+        finally:
+            os.close(fd)
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """
+        Locks the registry file against other threads and processes
+        """
+        with self._lock, self._flock(".lock", fcntl.LOCK_EX if fcntl else None):
+            yield
+
+    def using(self):
+        """
+        Holds the cache lock shared, installs writing to the caches should be inside this
+        :return: context manager
+        """
+        return self._flock(".cache.lock", fcntl.LOCK_SH if fcntl else None)
+
+    def collecting(self):
+        """
+        Holds the cache lock exclusively, waiting for installs in progress to finish
+        :return: context manager
+        """
+        return self._flock(".cache.lock", fcntl.LOCK_EX if fcntl else None)
+
+    def _read(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return dict(installs=dict())
+        except ValueError:
+            logger.warning("Cache registry at: {} is corrupt, ignoring it".format(self.path))
+            return dict(installs=dict())
+
+    def _write(self, data):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = "{}.{}.tmp".format(self.path, os.getpid())
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    def register(self, bindir, mcversion, pinned=False):
+        """
+        :param bindir: string
+        :param mcversion: string, names the asset index (<assetsdir>/indexes/<mcversion>.json)
+        :param pinned: bool, pinned installs are never evicted to meet a quota
+        :return: None
+        """
+        bindir = os.path.abspath(bindir)
+        now = time.time()
+
+        with self._locked():
+            data = self._read()
+            install = data["installs"].setdefault(bindir, dict(registered_at=now, last_used=now))
+            install.update(mcversion=mcversion, pinned=pinned or install.get("pinned", False))
+            self._write(data)
+
+        # (re)installed, so no longer evicted
+        try:
+            os.remove(os.path.join(bindir, EVICTED_FILENAME))
+        except FileNotFoundError:
+            pass
+
+    def unregister(self, bindir):
+        """
+        :param bindir: string
+        :return: None
+        """
+        with self._locked():
+            data = self._read()
+            if data["installs"].pop(os.path.abspath(bindir), None) is not None:
+                self._write(data)
+
+    def touch(self, bindir):
+        """
+        Records that an install was used (launched), does nothing if it isn't registered
+        :param bindir: string
+        :return: None
+        """
+        bindir = os.path.abspath(bindir)
+
+        with self._locked():
+            data = self._read()
+            install = data["installs"].get(bindir)
+            if install is not None:
+                install["last_used"] = time.time()
+                self._write(data)
+
+    def installs(self):
+        """
+        :return: dict<bindir: dict<mcversion, registered_at, last_used, pinned>>
+        """
+        with self._locked():
+            return self._read()["installs"]
+
+    def get_references(self, bindir, mcversion):
+        """
+        Lists the cache files an install uses
+        :param bindir: string
+        :param mcversion: string
+        :return: set<string>, absolute paths, None if the install no longer exists
+        """
+        if not os.path.isfile(get_profile_path(bindir)):
+            return None
+
+        refs = set()
+
+        if os.path.isfile(os.path.join(bindir, SERVER_JAR_FILENAME)):
+            # a dedicated server, only the libraries unpacked from its bundle (if it is one) are in the caches
+            launch = load_server_launch(bindir)
+            for path in (launch["libraries"] if launch is not None else []):
+                refs.add(os.path.join(self.libdir, *path.split("/")))
+            return refs
+
+        for lib in load_profile_libraries(bindir):
+            for artifact in (lib.artifact, lib.native.artifact if lib.native else None):
+                if artifact is not None:
+                    refs.add(os.path.join(self.libdir, *artifact.path.split("/")))
+
+        try:
+            with open(os.path.join(self.assetsdir, "indexes", "{}.json".format(mcversion))) as f:
+                objects = json.load(f)["objects"]
+        except FileNotFoundError:
+            objects = dict()
+
+        for asset in objects.values():
+            refs.add(os.path.join(self.assetsdir, "objects", asset["hash"][:2], asset["hash"]))
+
+        return refs
+
+    def _mark_evicted(self, bindir):
+        """
+        Marks an install as evicted, launching / verifying it then reports that it needs reinstalling
+        :param bindir: string
+        :return: None
+        """
+        try:
+            with open(os.path.join(bindir, EVICTED_FILENAME), 'w') as f:
+                json.dump(dict(evicted_at=time.time(), libdir=self.libdir, assetsdir=self.assetsdir), f)
+        except OSError as ex:
+            logger.warning("Couldn't mark evicted install: {} ({})".format(bindir, ex))
+
+    def scan(self):
+        """
+        Lists every file in the caches
+        :return: dict<path: os.stat_result>
+        """
+        files = dict()
+        for root in (self.libdir, os.path.join(self.assetsdir, "objects")):
+            for dirpath, _, filenames in os.walk(root):
+                for filename in filenames:
+                    path = os.path.join(dirpath, filename)
+                    try:
+                        files[path] = os.stat(path)
+                    except FileNotFoundError:
+                        pass
+        return files
+
+    def _delete(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return
+
+        # tidy up emptied directories, up to the cache roots
+        roots = (self.libdir, os.path.join(self.assetsdir, "objects"))
+        directory = os.path.dirname(path)
+        while directory not in roots and directory.startswith(roots):
+            try:
+                os.rmdir(directory)
+            except OSError:
+                break
+            directory = os.path.dirname(directory)
+
+    def collect(self, quota=None, grace=DEFAULT_GRACE, dry_run=False):
+        """
+        Deletes cache files no registered install uses, then, if the caches are still bigger than quota, unregisters
+        the least recently used (unpinned) installs and deletes the files only they used until they fit. Evicted installs
+        are marked, build_commands raises InstallEvictedError and verify reports them until they're reinstalled
+        Installs whose bindir no longer exists are unregistered
+        :param quota: int / None, bytes
+        :param grace: float, seconds, unreferenced files modified more recently than this are kept
+        :param dry_run: bool, only report what would be deleted
+        :return: GCReport
+        """
+        report = GCReport()
+
+        with self.collecting():
+            installs = self.installs()
+
+            refs = dict()  # bindir -> set<path>
+            for bindir, install in installs.items():
+                install_refs = self.get_references(bindir, install["mcversion"])
+                if install_refs is None:
+                    logger.info("Install no longer exists, unregistering: {}".format(bindir))
+                    if not dry_run:
+                        self.unregister(bindir)
+                    continue
+                refs[bindir] = install_refs
+
+            counts = Counter(path for install_refs in refs.values() for path in install_refs)
+            files = self.scan()
+            now = time.time()
+
+            for path, st in files.items():
+                if counts[path]:
+                    report.live_files += 1
+                    report.live_bytes += st.st_size
+                elif now - st.st_mtime < grace:
+                    report.kept_in_grace += 1
+                else:
+                    report.garbage.append((path, st.st_size))
+
+            total = sum(st.st_size for st in files.values()) - report.reclaimable_bytes
+
+            if quota is not None and total > quota:
+                evictable = sorted(
+                    (b for b in refs if not installs[b].get("pinned")),
+                    key=lambda b: installs[b]["last_used"]
+                )
+
+                for bindir in evictable:
+                    if total <= quota:
+                        break
+
+                    logger.info("Evicting least recently used install: {}".format(bindir))
+                    report.evicted.append(bindir)
+
+                    for path in refs.pop(bindir):
+                        counts[path] -= 1
+                        if counts[path] == 0 and path in files:
+                            report.garbage.append((path, files[path].st_size))
+                            report.live_files -= 1
+                            report.live_bytes -= files[path].st_size
+                            total -= files[path].st_size
+
+                    if not dry_run:
+                        self.unregister(bindir)
+                        self._mark_evicted(bindir)
+
+                if total > quota:
+                    logger.warning("Caches are still {} bytes over quota, the remaining installs are pinned".format(total - quota))
+
+            report.total_bytes = total
+
+            if not dry_run:
+                for path, size in report.garbage:
+                    self._delete(path)
+                    report.deleted_bytes += size
+
+        logger.info("Cache collection: {}".format(report.to_dict()))
+
+        return report
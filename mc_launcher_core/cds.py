@@ -0,0 +1,117 @@
+"""
+AppCDS (Application Class Data Sharing) archives, used to cut JVM startup / class loading time
+
+The first launch with a new (Java runtime, class path) pair is a training run which dumps the loaded classes into an
+archive when the game exits, later launches map that archive in instead of loading the classes from the jars
+"""
+import os
+import glob
+import hashlib
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+CDS_MIN_JAVA = "13"  # -XX:ArchiveClassesAtExit (dynamic archiving) was added in 13
+CDS_AUTO_CREATE_MIN_JAVA = "19"  # -XX:+AutoCreateSharedArchive
+
+
+def _stat_key(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return "missing"
+    return "{}:{}".format(st.st_size, st.st_mtime_ns)
+
+
+def get_archive_key(javapath, classpath):
+    """
+    Gets the key identifying an archive for this runtime and class path. This changes whenever the Java binary,
+    the class path, or any of the jars on it change
+    :param javapath: string
+    :param classpath: string, os.pathsep separated
+    :return: string
+    """
+    h = hashlib.sha1()
+
+    realpath = os.path.realpath(javapath)
+    h.update(realpath.encode())
+    h.update(_stat_key(realpath).encode())
+
+    for entry in classpath.split(os.pathsep):
+        h.update(b"\0")
+        h.update(entry.encode())
+        h.update(_stat_key(entry).encode())
+
+    return h.hexdigest()
+
+
+def get_archive_group(bindir):
+    """
+    Gets the prefix shared by all archives made for this bindir, used to clean up stale archives
+    :param bindir: string
+    :return: string
+    """
+    return hashlib.sha1(os.path.abspath(bindir).encode()).hexdigest()[:12]
+
+
+def get_archive_path(cdsdir, bindir, javapath, classpath):
+    """
+    :param cdsdir: string, directory archives are kept in
+    :param bindir: string
+    :param javapath: string
+    :param classpath: string
+    :return: string
+    """
+    return os.path.join(
+        cdsdir,
+        "{}-{}.jsa".format(get_archive_group(bindir), get_archive_key(javapath, classpath))
+    )
+
+
+def remove_stale_archives(cdsdir, bindir, keep):
+    """
+    Removes the archives for bindir other than keep (their runtime / class path has changed)
+    :param cdsdir: string
+    :param bindir: string
+    :param keep: string, path to the current archive
+    :return: None
+    """
+    for path in glob.glob(os.path.join(cdsdir, "{}-*.jsa".format(get_archive_group(bindir)))):
+        if os.path.abspath(path) != os.path.abspath(keep):
+            logger.debug("Removing stale CDS archive: {}".format(path))
+            try:
+                os.remove(path)
+            except OSError as ex:
+                logger.warning("Failed to remove stale CDS archive: {} ({})".format(path, ex))
+
+
+def build_cds_args(cdsdir, bindir, javapath, java_version, classpath):
+    """
+    Gets the JVM arguments to use (or create) the AppCDS archive for this launch
+    :param cdsdir: string, directory archives are kept in
+    :param bindir: string
+    :param javapath: string
+    :param java_version: JavaVersion
+    :param classpath: string
+    :return: list<string>, empty if this Java doesn't support dynamic archives
+    """
+    if not java_version.version_is_atleast(CDS_MIN_JAVA):
+        logger.info("Java {} doesn't support dynamic CDS archives, skipping".format(java_version.version))
+        return []
+
+    os.makedirs(cdsdir, exist_ok=True)
+    archive_path = get_archive_path(cdsdir, bindir, javapath, classpath)
+    remove_stale_archives(cdsdir, bindir, archive_path)
+
+    if java_version.version_is_atleast(CDS_AUTO_CREATE_MIN_JAVA):
+        # the JVM validates / (re)creates the archive by itself
+        return ["-XX:+AutoCreateSharedArchive", "-XX:SharedArchiveFile={}".format(archive_path)]
+
+    if os.path.isfile(archive_path) and os.path.getsize(archive_path) > 0:
+        logger.debug("Using CDS archive: {}".format(archive_path))
+        # -Xshare:auto so that a bad / partially written archive is ignored rather than failing the launch
+        return ["-XX:SharedArchiveFile={}".format(archive_path), "-Xshare:auto"]
+
+    logger.info("No CDS archive yet, this launch will create one at: {}".format(archive_path))
+    return ["-XX:ArchiveClassesAtExit={}".format(archive_path)]
@@ -0,0 +1,565 @@
+"""
+Command line interface: mc-launcher-core (or python -m mc_launcher_core)
+
+    mc-launcher-core versions [--type release]
+    mc-launcher-core install 1.12.2 [--mirror http://10.0.0.5:8750/] [--forge]
+    mc-launcher-core verify 1.12.2
+    mc-launcher-core forge-install 1.12.2
+    mc-launcher-core launch 1.12.2 --username someone --java /usr/bin/java [--dry-run]
+    mc-launcher-core logs [--grep 'Exception'] [--level ERROR] [--metrics]
+    mc-launcher-core server-install 1.20.1
+    mc-launcher-core server-launch 1.20.1 --gamedir servers/a --port 25566 --accept-eula
+    mc-launcher-core gc [--quota 20G] [--dry-run]
+    mc-launcher-core modpack pack.json --gamedir instances/a --gamedir instances/b
+    mc-launcher-core daemon
+
+Pass --json for machine-readable output. If --socket is given (or MC_LAUNCHER_CORE_SOCKET is set) and a daemon is
+listening there, commands run in the daemon (with its warm caches) instead of in this process
+"""
+import os
+import sys
+import json
+import logging
+import argparse
+from mc_launcher_core.daemon import SOCKET_ENV_VAR, get_default_socket_path, send_request
+
+
+logger = logging.getLogger(__name__)
+
+ROOT_ENV_VAR = "MC_LAUNCHER_CORE_ROOT"
+PASSWORD_ENV_VAR = "MC_LAUNCHER_CORE_PASSWORD"
+
+
+def get_default_root():
+    """
+    :return: string, MC_LAUNCHER_CORE_ROOT or ~/.mc_launcher_core
+    """
+    return os.environ.get(ROOT_ENV_VAR) or os.path.join(os.path.expanduser("~"), ".mc_launcher_core")
+
+
+def get_install_dirs(options):
+    """
+    Works out an install's directories, each can be given explicitly or defaults to a layout under root
+    :param options: dict
+    :return: tuple<bindir, assetsdir, libdir, nativesdir>
+    """
+    root = options.get("root") or get_default_root()
+    bindir = options.get("bindir") or os.path.join(root, "versions", options["version"])
+
+    return (
+        bindir,
+        options.get("assetsdir") or os.path.join(root, "assets"),
+        options.get("libdir") or os.path.join(root, "libraries"),
+        options.get("nativesdir") or os.path.join(bindir, "natives")
+    )
+
+
+def _get_registry(options):
+    from mc_launcher_core.cache_gc import CacheRegistry
+
+    root = options.get("root") or get_default_root()
+    return CacheRegistry(
+        options.get("libdir") or os.path.join(root, "libraries"),
+        options.get("assetsdir") or os.path.join(root, "assets")
+    )
+
+
+def parse_size(s):
+    """
+    :param s: string, bytes, optionally with a K / M / G / T suffix, e.g. "20G"
+    :return: int
+    """
+    units = dict(K=1024, M=1024 ** 2, G=1024 ** 3, T=1024 ** 4)
+    s = s.strip().upper().rstrip("B")
+    if s and s[-1] in units:
+        return int(float(s[:-1]) * units[s[-1]])
+    return int(s)
+
+
+def _get_endpoints(options):
+    if not options.get("mirrors"):
+        return None
+
+    from mc_launcher_core.web.endpoints import Endpoints
+    return Endpoints.with_mirrors(options["mirrors"])
+
+
+def _get_placement(options):
+    """
+    :return: Placement / None
+    """
+    keys = ("cpus", "nice", "ionice", "memory_limit", "cpu_limit", "cgroup")
+    if all(options.get(k) is None for k in keys):
+        return None
+
+    from mc_launcher_core.placement import Placement, parse_cpu_list
+
+    ionice = options.get("ionice")
+    return Placement(
+        cpus=parse_cpu_list(options["cpus"]) if options.get("cpus") else None,
+        memory_max=options.get("memory_limit"),
+        cpu_max=options.get("cpu_limit"),
+        nice=options.get("nice"),
+        ionice=(ionice.split(":")[0], int(ionice.split(":")[1]) if ":" in ionice else 4) if ionice else None,
+        cgroup=options.get("cgroup")
+    )
+
+
+def command_versions(options):
+    from mc_launcher_core.web import get_available_minecraft_versions
+
+    manifest = get_available_minecraft_versions()
+    return dict(
+        latest=manifest["latest"],
+        versions=[
+            dict(id=v["id"], type=v["type"])
+            for v in manifest["versions"]
+            if options.get("type") is None or v["type"] == options["type"]
+        ]
+    )
+
+
+def command_install(options):
+    from mc_launcher_core.web.install_pipeline import run_install_pipeline
+
+    bindir, assetsdir, libdir, nativesdir = get_install_dirs(options)
+    report = run_install_pipeline(
+        bindir, assetsdir, libdir, nativesdir, options["version"],
+        forge=options.get("forge", False),
+        raise_on_hash_mismatch=options.get("raise_on_hash_mismatch", False),
+        endpoints=_get_endpoints(options),
+        workers=options.get("workers") or 4,
+        registry=_get_registry(options)
+    )
+
+    return dict(
+        version=options["version"], bindir=bindir, assetsdir=assetsdir, libdir=libdir, nativesdir=nativesdir,
+        timings=report.to_dict()
+    )
+
+
+def command_verify(options):
+    from mc_launcher_core.verify import verify_install
+
+    bindir, assetsdir, libdir, _ = get_install_dirs(options)
+    checked, problems = verify_install(bindir, libdir, assetsdir, options["version"], options.get("workers"))
+
+    return dict(version=options["version"], checked=checked, problems=[p.to_dict() for p in problems])
+
+
+def command_forge_install(options):
+    import shutil
+    import tempfile
+    from mc_launcher_core.web import save_minecraft_libs
+    from mc_launcher_core.profiles import resolve_profile
+    from mc_launcher_core.forge_utils import install_forge
+    from mc_launcher_core.forge_utils.web import download_forge_installer
+
+    bindir, _, libdir, nativesdir = get_install_dirs(options)
+    tempdir = tempfile.mkdtemp(prefix="mc_launcher_core_forge_")
+    try:
+        installer = download_forge_installer(options["version"], tempdir)
+        install_forge(installer, libdir, bindir, remove_installer=True)
+    finally:
+        shutil.rmtree(tempdir, ignore_errors=True)
+
+    save_minecraft_libs(libdir, nativesdir, resolve_profile(bindir)["libraries"], endpoints=_get_endpoints(options))
+
+    return dict(version=options["version"], bindir=bindir, libdir=libdir)
+
+
+def command_launch(options):
+    """
+    Builds the launch command (the client runs it, so Minecraft is its child rather than the daemon's)
+    """
+    from mc_launcher_core import MinecraftSession
+    from mc_launcher_core.launch import build_commands
+    from mc_launcher_core.session_store import SessionStore
+    from mc_launcher_core.exceptions import InvalidLoginError
+    from mc_launcher_core.placement import get_host_resources, place_commands
+
+    bindir, assetsdir, libdir, _ = get_install_dirs(options)
+    placement = _get_placement(options)
+    gamedir = options.get("gamedir") or os.path.join(os.path.dirname(assetsdir), "game")
+
+    root = options.get("root") or get_default_root()
+    java_runtimes_dir = options.get("runtimesdir") or os.path.join(root, "runtimes")
+
+    prewarm_task = None
+    if options.get("prewarm"):
+        # runs while logging in / building the command
+        from mc_launcher_core.prewarm import DEFAULT_HOT_ASSETS, get_prewarm_paths, start_prewarm
+        prewarm_task = start_prewarm(get_prewarm_paths(bindir, libdir, assetsdir, options.get("prewarm_assets") or DEFAULT_HOT_ASSETS))
+
+    try:
+        session = MinecraftSession(options["username"], options.get("password"), session_store=SessionStore())
+    except InvalidLoginError:
+        raise InvalidLoginError("Login failed for: {} (no valid stored session, set ${} to log in)".format(options["username"], PASSWORD_ENV_VAR))
+
+    commands = build_commands(
+        bindir, gamedir, assetsdir, options.get("java"), session, options.get("memory", 2048), libdir,
+        jvm_profile=options.get("jvm_profile"),
+        classpath_jar=options.get("classpath_jar", False),
+        registry=_get_registry(options),
+        java_runtimes_dir=None if options.get("system_java") else java_runtimes_dir,
+        host=get_host_resources(placement),
+        logging_config=not options.get("raw_output")
+    )
+
+    result = dict(
+        version=options["version"],
+        gamedir=gamedir,
+        commands=place_commands(commands, placement),
+        logdir=None if options.get("raw_output") else options.get("logdir") or os.path.join(root, "logs")
+    )
+    if prewarm_task is not None:
+        report = prewarm_task.wait()
+        result["prewarm"] = report.to_dict() if report is not None else None
+
+    return result
+
+
+def get_server_dirs(options):
+    """
+    :param options: dict
+    :return: tuple<serverdir, libdir>
+    """
+    root = options.get("root") or get_default_root()
+    return (
+        options.get("serverdir") or os.path.join(root, "servers", options["version"]),
+        options.get("libdir") or os.path.join(root, "libraries")
+    )
+
+
+def command_server_install(options):
+    from mc_launcher_core.web import download_minecraft_server
+
+    serverdir, libdir = get_server_dirs(options)
+    download_minecraft_server(serverdir, options["version"], libdir, endpoints=_get_endpoints(options), registry=_get_registry(options))
+
+    return dict(version=options["version"], serverdir=serverdir, libdir=libdir)
+
+
+def command_server_launch(options):
+    """
+    Builds the server command (the client runs it, like launch)
+    """
+    from mc_launcher_core.server import build_server_commands, accept_eula
+    from mc_launcher_core.placement import get_host_resources, place_commands
+
+    serverdir, libdir = get_server_dirs(options)
+    placement = _get_placement(options)
+    root = options.get("root") or get_default_root()
+    gamedir = options.get("gamedir") or os.path.join(root, "server-instances", options["version"])
+
+    os.makedirs(gamedir, exist_ok=True)
+    if options.get("accept_eula"):
+        accept_eula(gamedir)
+
+    commands = build_server_commands(
+        serverdir, options.get("java"), options.get("memory", 2048), libdir,
+        jvm_profile=options.get("jvm_profile"),
+        port=options.get("port"),
+        java_runtimes_dir=None if options.get("system_java") else options.get("runtimesdir") or os.path.join(root, "runtimes"),
+        registry=_get_registry(options),
+        host=get_host_resources(placement)
+    )
+
+    return dict(version=options["version"], gamedir=gamedir, commands=place_commands(commands, placement))
+
+
+def command_logs(options):
+    """
+    Searches the game logs launch kept, or lists launches' metrics
+    """
+    import time
+    from mc_launcher_core.gamelog import GameLogStore
+
+    store = GameLogStore(options.get("logdir") or os.path.join(options.get("root") or get_default_root(), "logs"))
+    limit = options.get("limit") or 100
+
+    if options.get("metrics"):
+        launches = [m for m in store.load_metrics() if options.get("launch") in (None, m["launch_id"])]
+        return dict(launches=launches[-limit:])
+
+    since = time.time() * 1000 - options["since"] * 1000 if options.get("since") is not None else None
+    events = []
+    for event in store.search(options.get("grep"), options.get("level"), options.get("launch"), since):
+        events.append(event)
+        if len(events) > limit:
+            events.pop(0)
+
+    return dict(events=events)
+
+
+def command_gc(options):
+    report = _get_registry(options).collect(
+        options.get("quota"),
+        options.get("grace", 3600),
+        options.get("dry_run", False)
+    )
+    return report.to_dict()
+
+
+def command_modpack(options):
+    from mc_launcher_core.modpack import install_modpack
+
+    root = options.get("root") or get_default_root()
+    return install_modpack(
+        os.path.abspath(options["manifest"]),
+        options.get("gamedirs") or [os.path.join(root, "game")],
+        options.get("storedir") or os.path.join(root, "modpacks"),
+        workers=options.get("workers") or 8,
+        verify=options.get("verify", False)
+    )
+
+
+COMMANDS = {
+    "versions": command_versions,
+    "install": command_install,
+    "verify": command_verify,
+    "forge-install": command_forge_install,
+    "launch": command_launch,
+    "server-install": command_server_install,
+    "server-launch": command_server_launch,
+    "gc": command_gc,
+    "logs": command_logs,
+    "modpack": command_modpack,
+}
+
+
+def run_command(command, options, socket_path=None):
+    """
+    Runs a command in the daemon at socket_path if one is listening, otherwise in this process
+    :param command: string
+    :param options: dict
+    :param socket_path: string / None
+    :return: result of the command
+    """
+    if socket_path:
+        try:
+            response = send_request(socket_path, command, options)
+        except OSError as ex:
+            logger.debug("Daemon not reachable at: {} ({!r}), running locally".format(socket_path, ex))
+        else:
+            if not response["ok"]:
+                raise RuntimeError("{}: {}".format(response.get("type"), response.get("error")))
+            return response["result"]
+
+    return COMMANDS[command](options)
+
+
+def _print_human(command, result):
+    if command == "versions":
+        for v in result["versions"]:
+            print("{}\t{}".format(v["id"], v["type"]))
+    elif command == "verify":
+        for problem in result["problems"]:
+            print("{}: {}".format(problem["kind"], problem["path"]))
+        print("Checked {} files, {} problems".format(result["checked"], len(result["problems"])))
+    elif command in ("launch", "server-launch"):
+        import shlex
+        print(" ".join(shlex.quote(x) for x in result["commands"]))
+    elif command == "install":
+        timings = result["timings"]
+        for name, task in timings["tasks"].items():
+            print("{}\t{}\t{:.2f}s".format(name, task["status"], task["seconds"]))
+        print("install {}: done in {:.2f}s (tasks took {:.2f}s, critical path {:.2f}s: {})".format(
+            result["version"], timings["wall_seconds"], timings["task_seconds"], timings["critical_path_seconds"],
+            " -> ".join(timings["critical_path"])
+        ))
+    elif command == "modpack":
+        print("{} {}: downloaded {} files ({} bytes)".format(result["name"], result["version"], result["downloaded"], result["downloaded_bytes"]))
+        for gamedir, changes in result["instances"].items():
+            print("{}: {added} added, {updated} updated, {removed} removed, {unchanged} unchanged".format(gamedir, **changes))
+            for path in changes["conflicts"]:
+                print("{}: not replaced, changed locally: {}".format(gamedir, path))
+    elif command == "logs":
+        from mc_launcher_core.gamelog import LogEvent
+        for event in result.get("events", []):
+            print("{} {}".format(event["launch"][:8], LogEvent(**{k: v for k, v in event.items() if k != "launch"}).format()))
+        for m in result.get("launches", []):
+            print("{}\t{}\texit {}\t{}{}".format(
+                m["launch_id"][:8], m["details"].get("version"), m["exit_code"],
+                " ".join("{}={:.2f}s".format(k, v) for k, v in m["phases"].items()),
+                "\tcrashed: {}".format(m["crash"]["description"] or m["crash"]["path"]) if m["crash"] else ""
+            ))
+    elif command == "gc":
+        for bindir in result["evicted"]:
+            print("evicted: {}".format(bindir))
+        print("{} live files ({} bytes), {} unreferenced files ({} bytes) {}".format(
+            result["live_files"], result["live_bytes"], result["garbage_files"], result["reclaimable_bytes"],
+            "deleted" if result["deleted_bytes"] else "reclaimable"
+        ))
+    else:
+        print("{} {}: done".format(command, result.get("version", "")))
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(prog="mc-launcher-core", description="Install, verify and launch Minecraft")
+    parser.add_argument("--json", action="store_true", help="machine-readable output")
+    parser.add_argument("--socket", default=os.environ.get(SOCKET_ENV_VAR), help="daemon socket to run commands in, if one is listening")
+    parser.add_argument("-v", "--verbose", action="count", default=0)
+
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_install_args(p):
+        p.add_argument("version", help="Minecraft version, e.g. 1.12.2")
+        p.add_argument("--root", help="base directory, defaults to ${} or ~/.mc_launcher_core".format(ROOT_ENV_VAR))
+        p.add_argument("--bindir")
+        p.add_argument("--assetsdir")
+        p.add_argument("--libdir")
+        p.add_argument("--nativesdir")
+
+    def add_placement_args(p):
+        p.add_argument("--cpus", help="CPUs to pin to, e.g. 0-3,8")
+        p.add_argument("--nice", type=int, help="niceness to add, 0-19")
+        p.add_argument("--ionice", help="IO class[:level], e.g. best-effort:7, idle")
+        p.add_argument("--cgroup", help="cgroup v2 directory to create and run in (must be in a delegated subtree)")
+        p.add_argument("--memory-limit", type=parse_size, help="cgroup memory limit, e.g. 6G (needs --cgroup)")
+        p.add_argument("--cpu-limit", type=float, help="cgroup CPU time limit in cores, e.g. 2.5 (needs --cgroup)")
+
+    p = subparsers.add_parser("versions", help="list available Minecraft versions")
+    p.add_argument("--type", help="only list versions of this type, e.g. release, snapshot")
+
+    p = subparsers.add_parser("install", help="download a Minecraft version (resumes an interrupted install)")
+    add_install_args(p)
+    p.add_argument("--mirror", dest="mirrors", action="append", help="mirror base URL to try first (repeatable)")
+    p.add_argument("--raise-on-hash-mismatch", action="store_true")
+    p.add_argument("--forge", action="store_true", help="install Forge too")
+    p.add_argument("--workers", type=int, help="install steps run at once")
+
+    p = subparsers.add_parser("verify", help="check an install's files exist and have the right hashes")
+    add_install_args(p)
+    p.add_argument("--workers", type=int)
+
+    p = subparsers.add_parser("forge-install", help="install Forge into an installed version")
+    add_install_args(p)
+    p.add_argument("--mirror", dest="mirrors", action="append", help="mirror base URL to try first (repeatable)")
+
+    p = subparsers.add_parser("launch", help="launch an installed version")
+    add_install_args(p)
+    p.add_argument("--username", required=True)
+    p.add_argument("--java", help="Java executable, Mojang's runtime for the version is installed and used if not given")
+    p.add_argument("--runtimesdir", help="where Java runtimes are installed, defaults to <root>/runtimes")
+    p.add_argument("--system-java", action="store_true", help="without --java, use an installed Java instead of Mojang's runtime")
+    p.add_argument("--gamedir")
+    p.add_argument("--memory", type=int, default=2048, help="megabytes")
+    p.add_argument("--jvm-profile", help="GC profile, e.g. g1, zgc, aikar")
+    p.add_argument("--classpath-jar", action="store_true")
+    p.add_argument("--prewarm", action="store_true", help="read the class path, natives and hot assets into the page cache first")
+    p.add_argument("--prewarm-asset", dest="prewarm_assets", action="append", help="asset name pattern to prewarm (repeatable), e.g. 'minecraft/sounds/music/*'")
+    add_placement_args(p)
+    p.add_argument("--logdir", help="where game log events and launch metrics are kept, defaults to <root>/logs")
+    p.add_argument("--raw-output", action="store_true", help="don't apply the version's log config, pass the game's output through as is")
+    p.add_argument("--dry-run", action="store_true", help="print the command instead of running it")
+
+    def add_server_args(p):
+        p.add_argument("version", help="Minecraft version, e.g. 1.20.1")
+        p.add_argument("--root", help="base directory, defaults to ${} or ~/.mc_launcher_core".format(ROOT_ENV_VAR))
+        p.add_argument("--serverdir", help="defaults to <root>/servers/<version>")
+        p.add_argument("--libdir")
+
+    p = subparsers.add_parser("server-install", help="download a dedicated server, sharing the library cache")
+    add_server_args(p)
+    p.add_argument("--mirror", dest="mirrors", action="append", help="mirror base URL to try first (repeatable)")
+
+    p = subparsers.add_parser("server-launch", help="launch an installed dedicated server")
+    add_server_args(p)
+    p.add_argument("--gamedir", help="the instance's working directory, defaults to <root>/server-instances/<version>")
+    p.add_argument("--java", help="Java executable, Mojang's runtime for the version is installed and used if not given")
+    p.add_argument("--runtimesdir", help="where Java runtimes are installed, defaults to <root>/runtimes")
+    p.add_argument("--system-java", action="store_true", help="without --java, use an installed Java instead of Mojang's runtime")
+    p.add_argument("--memory", type=int, default=2048, help="megabytes")
+    p.add_argument("--jvm-profile", help="GC profile, e.g. g1, zgc, aikar")
+    p.add_argument("--port", type=int)
+    p.add_argument("--accept-eula", action="store_true", help="accept the Minecraft EULA (https://aka.ms/MinecraftEULA) for this instance")
+    add_placement_args(p)
+    p.add_argument("--dry-run", action="store_true", help="print the command instead of running it")
+
+    p = subparsers.add_parser("gc", help="delete library / asset files no registered install uses")
+    p.add_argument("--root", help="base directory, defaults to ${} or ~/.mc_launcher_core".format(ROOT_ENV_VAR))
+    p.add_argument("--assetsdir")
+    p.add_argument("--libdir")
+    p.add_argument("--quota", type=parse_size, help="evict least recently used installs until the caches fit, e.g. 20G")
+    p.add_argument("--grace", type=float, default=3600, help="seconds, newer unreferenced files are kept")
+    p.add_argument("--dry-run", action="store_true", help="only report what would be deleted")
+
+    p = subparsers.add_parser("logs", help="search game logs, or list launches' startup timings and crashes")
+    p.add_argument("--root", help="base directory, defaults to ${} or ~/.mc_launcher_core".format(ROOT_ENV_VAR))
+    p.add_argument("--logdir", help="defaults to <root>/logs")
+    p.add_argument("--grep", help="regex to search messages for")
+    p.add_argument("--level", action="append", help="only events at this level (repeatable), e.g. ERROR")
+    p.add_argument("--launch", help="only this launch's events")
+    p.add_argument("--since", type=float, help="only events from the last this many seconds")
+    p.add_argument("--metrics", action="store_true", help="list launches' metrics instead of events")
+    p.add_argument("--limit", type=int, help="at most this many (the latest), default 100")
+
+    p = subparsers.add_parser("modpack", help="install / update a modpack in one or more game directories")
+    p.add_argument("manifest", help="pack manifest (JSON)")
+    p.add_argument("--root", help="base directory, defaults to ${} or ~/.mc_launcher_core".format(ROOT_ENV_VAR))
+    p.add_argument("--gamedir", dest="gamedirs", action="append", help="instance game directory (repeatable), defaults to <root>/game")
+    p.add_argument("--storedir", help="shared content-addressed store, defaults to <root>/modpacks")
+    p.add_argument("--workers", type=int)
+    p.add_argument("--verify", action="store_true", help="re-check files the pack's last install says are unchanged")
+
+    p = subparsers.add_parser("daemon", help="serve commands over a Unix socket, keeping caches warm")
+    p.add_argument("--manifest-ttl", type=float, default=600, help="seconds before cached manifests are refreshed")
+
+    return parser
+
+
+def main(argv=None):
+    args = make_parser().parse_args(argv)
+
+    logging.basicConfig(
+        level=[logging.WARNING, logging.INFO, logging.DEBUG][min(args.verbose, 2)],
+        stream=sys.stderr
+    )
+
+    if args.command == "daemon":
+        from mc_launcher_core.daemon import Daemon
+        Daemon(COMMANDS, args.socket or get_default_socket_path(), args.manifest_ttl).serve_forever()
+        return 0
+
+    options = {k: v for k, v in vars(args).items() if k not in ("json", "socket", "verbose", "command")}
+    launching = args.command in ("launch", "server-launch")
+    if launching:
+        del options["dry_run"]  # the client runs (or prints) the command
+    if args.command == "launch":
+        options["password"] = os.environ.get(PASSWORD_ENV_VAR)
+
+    try:
+        result = run_command(args.command, options, args.socket)
+    except Exception as ex:
+        if args.json:
+            print(json.dumps(dict(ok=False, error=str(ex) or repr(ex), type=type(ex).__name__)))
+        else:
+            print("error: {}".format(str(ex) or repr(ex)), file=sys.stderr)
+        return 1
+
+    if args.json:
+        print(json.dumps(dict(ok=True, result=result)))
+    elif not launching or args.dry_run:
+        _print_human(args.command, result)
+
+    if launching and not args.dry_run:
+        cwd = result["gamedir"] if os.path.isdir(result["gamedir"]) else None
+        if result.get("logdir") is None:
+            import subprocess
+            return subprocess.call(result["commands"], cwd=cwd)
+
+        from mc_launcher_core.gamelog import run_game
+        metrics = run_game(result["commands"], result["logdir"], cwd, details=dict(version=result["version"], gamedir=result["gamedir"]))
+        if args.json:
+            print(json.dumps(dict(ok=True, result=dict(metrics=metrics.to_dict()))))
+        return metrics.exit_code
+
+    if args.command == "verify" and result["problems"]:
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
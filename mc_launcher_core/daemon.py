@@ -0,0 +1,165 @@
+"""
+A long-running process that runs CLI commands for short-lived clients over a Unix socket, so the version manifest,
+parsed version JSONs, Java runtime registry and transfer policy (retry budget, circuit breakers) stay warm between
+invocations instead of being rebuilt by every process
+
+Protocol: the client connects, sends one JSON line {"command": name, "options": {...}} and reads one JSON line back,
+either {"ok": true, "result": ...} or {"ok": false, "error": message, "type": exception class name}
+"""
+import os
+import json
+import time
+import socket
+import logging
+import threading
+import socketserver
+
+
+logger = logging.getLogger(__name__)
+
+SOCKET_ENV_VAR = "MC_LAUNCHER_CORE_SOCKET"
+
+
+def get_default_socket_path():
+    """
+    :return: string, <XDG_RUNTIME_DIR or ~/.cache>/mc_launcher_core/daemon.sock
+    """
+    base = (
+        os.environ.get("XDG_RUNTIME_DIR")
+        or os.environ.get("XDG_CACHE_HOME")
+        or os.path.join(os.path.expanduser("~"), ".cache")
+    )
+    return os.path.join(base, "mc_launcher_core", "daemon.sock")
+
+
+class _DaemonRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+
+        try:
+            request = json.loads(line.decode("utf-8"))
+            result = self.server.daemon.dispatch(request["command"], request.get("options") or dict())
+            response = dict(ok=True, result=result)
+        except Exception as ex:
+            logger.exception("Request failed")
+            response = dict(ok=False, error=str(ex) or repr(ex), type=type(ex).__name__)
+
+        self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class Daemon:
+    """
+    Serves commands over a Unix socket
+    """
+    def __init__(self, commands, socket_path=None, manifest_ttl=600):
+        """
+        :param commands: dict<name: callable(options dict) -> JSON serialisable result>
+        :param socket_path: string / None, defaults to get_default_socket_path()
+        :param manifest_ttl: float, seconds before the cached version manifest / Forge promotions are fetched again
+        """
+        self.commands = commands
+        self.socket_path = socket_path or get_default_socket_path()
+        self.manifest_ttl = manifest_ttl
+
+        self._manifest_fetched_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._server = None
+
+    def _expire_caches(self):
+        import mc_launcher_core.web as web
+        import mc_launcher_core.forge_utils.web as forge_web
+
+        with self._lock:
+            if time.monotonic() - self._manifest_fetched_at > self.manifest_ttl:
+                logger.debug("Expiring cached manifests")
+                web._minecraft_versions_maybe = None
+                forge_web._forge_promotions_maybe = None
+                self._manifest_fetched_at = time.monotonic()
+
+    def dispatch(self, command, options):
+        """
+        :param command: string
+        :param options: dict
+        :return: the command's result
+        """
+        func = self.commands.get(command)
+        if func is None:
+            raise ValueError("Unknown command: {}".format(command))
+
+        self._expire_caches()
+        logger.info("Running: {}".format(command))
+        return func(options)
+
+    def serve_forever(self):
+        """
+        Binds the socket (replacing a stale one) and serves until shutdown() is called
+        :return: None
+        """
+        os.makedirs(os.path.dirname(self.socket_path), exist_ok=True)
+
+        if os.path.exists(self.socket_path):
+            if is_daemon_running(self.socket_path):
+                raise OSError("A daemon is already listening on: {}".format(self.socket_path))
+            os.remove(self.socket_path)
+
+        old_umask = os.umask(0o077)  # only this user may connect
+        try:
+            self._server = _UnixServer(self.socket_path, _DaemonRequestHandler)
+        finally:
+            os.umask(old_umask)
+        self._server.daemon = self
+
+        logger.info("Daemon listening on: {}".format(self.socket_path))
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+    def shutdown(self):
+        if self._server is not None:
+            self._server.shutdown()
+
+
+def is_daemon_running(socket_path):
+    """
+    :param socket_path: string
+    :return: bool
+    """
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.connect(socket_path)
+        return True
+    except OSError:
+        return False
+
+
+def send_request(socket_path, command, options, timeout=None):
+    """
+    Runs a command on the daemon
+    :param socket_path: string
+    :param command: string
+    :param options: dict
+    :param timeout: float / None, seconds
+    :return: dict, the response ({"ok": ..., "result" / "error": ...})
+    :raises OSError: if the daemon can't be reached
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.settimeout(timeout)
+        s.connect(socket_path)
+        s.sendall(json.dumps(dict(command=command, options=options)).encode("utf-8") + b"\n")
+
+        with s.makefile("rb") as f:
+            line = f.readline()
+
+    if not line:
+        raise ConnectionResetError("The daemon closed the connection without responding")
+
+    return json.loads(line.decode("utf-8"))
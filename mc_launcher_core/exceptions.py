@@ -40,3 +40,84 @@ class HashMatchError(Exception):
         self.library = lib
         self.type = type
         super().__init__(self, *args)
+
+
+class JavaProbeError(Exception):
+    """
+    When a Java executable can't be run or its version can't be determined
+    """
+    def __init__(self, java_path, *args):
+        self.java_path = java_path
+        super().__init__(self, *args)
+
+
+class RateLimitedError(Exception):
+    """
+    When a server responds with 429 Too Many Requests
+    """
+    def __init__(self, retry_after=None, *args):
+        self.retry_after = retry_after  # seconds to wait before trying again, None if the server didn't say
+        super().__init__(self, *args)
+
+
+class CircuitOpenError(Exception):
+    """
+    When downloads from a host are being refused because it has failed too many times recently
+    """
+    def __init__(self, host, *args):
+        self.host = host
+        super().__init__(self, *args)
+
+
+class DownloadInterruptedError(Exception):
+    """
+    When a download fails part-way through into a stream that can't be rewound to retry it
+    """
+    def __init__(self, url, *args):
+        self.url = url
+        super().__init__(self, *args)
+
+
+class DownloadCancelledError(Exception):
+    """
+    When a queued download is dropped without running, e.g. because its scheduler was shut down
+    """
+    def __init__(self, description, *args):
+        self.description = description
+        super().__init__(self, *args)
+
+
+class InvalidBundleError(Exception):
+    """
+    When a file isn't a valid install bundle (bad header / index)
+    """
+    def __init__(self, bundle_path, *args):
+        self.bundle_path = bundle_path
+        super().__init__(self, *args)
+
+
+class JavaRuntimeNotFoundError(Exception):
+    """
+    When no Java runtime suitable for a version is installed / available to download
+    """
+    def __init__(self, component, *args):
+        self.component = component
+        super().__init__(self, *args)
+
+
+class InvalidModpackError(Exception):
+    """
+    When a modpack manifest is malformed (missing fields, unsafe paths)
+    """
+    def __init__(self, manifest_path, *args):
+        self.manifest_path = manifest_path
+        super().__init__(self, *args)
+
+
+class InstallEvictedError(Exception):
+    """
+    When an install was evicted from the shared caches to meet a quota, its libraries and assets are gone until it's reinstalled
+    """
+    def __init__(self, bindir, *args):
+        self.bindir = bindir
+        super().__init__(self, *args)
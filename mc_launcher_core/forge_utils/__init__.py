@@ -45,29 +45,34 @@ def convert_old_style_lib(lib, existence_guaranteed=False):
 
 def merge_forge_library_requirements(forgejson, bindir):
     """
-    merges Forge libraries into the new format for minecraft.json - DOESN'T ACTUALLY INSTALL ANYTHING
+    Writes Forge's profile into bindir as modloader.json, which inherits from the vanilla minecraft.json (see
+    mc_launcher_core.profiles) - DOESN'T ACTUALLY INSTALL ANYTHING. minecraft.json isn't modified
     :param forgejson: dict, install_profile.json from forge installer jar
     :param bindir: string
     :return: None
     """
-    print(forgejson)
+    version_info = forgejson["versionInfo"]
 
-    with open(os.path.join(bindir, "minecraft.json")) as f:
-        mcjson = json.load(f)
-
-    for lib in forgejson["versionInfo"]["libraries"]:
+    libraries = []
+    for lib in version_info["libraries"]:
         if lib.get("clientreq") in (True, None):
             if not lib["name"].startswith("net.minecraftforge:forge"):
-                mcjson["libraries"].append(convert_old_style_lib(lib))
+                libraries.append(convert_old_style_lib(lib))
             else:
                 # special Forge things...
-                mcjson["libraries"].append(convert_old_style_lib(lib, existence_guaranteed=True))
+                libraries.append(convert_old_style_lib(lib, existence_guaranteed=True))
 
-    mcjson["mainClass"] = forgejson["versionInfo"]["mainClass"]
-    mcjson["minecraftArguments"] = forgejson["versionInfo"]["minecraftArguments"]
+    modloader_json = dict(
+        id=version_info["id"],
+        inheritsFrom=version_info.get("inheritsFrom") or forgejson["install"]["minecraft"],
+        type=version_info.get("type", "release"),
+        mainClass=version_info["mainClass"],
+        minecraftArguments=version_info["minecraftArguments"],
+        libraries=libraries
+    )
 
-    with open(os.path.join(bindir, "minecraft.json"), 'w') as f:
-        json.dump(mcjson, f)
+    with open(os.path.join(bindir, "modloader.json"), 'w') as f:
+        json.dump(modloader_json, f)
 
 
 def install_forge(p, libsdir, bindir, remove_installer=False):
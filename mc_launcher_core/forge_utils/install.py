@@ -1,5 +1,4 @@
 import logging
-import zipfile
 import os.path
 import json
 from mc_launcher_core.web.util import get_download_url_path_for_minecraft_lib
@@ -16,6 +15,7 @@ def install_forge_from_jar(installerjar_path, libsdir, remove_installer=False):
     :param remove_installer: bool, whether to remove the installer file after installation is complete
     :return: dict forge install_profile.json parsed data
     """
+    import zipfile
     with zipfile.ZipFile(installerjar_path) as f:
         d = json.loads(f.read("install_profile.json").decode())
 
@@ -8,6 +8,7 @@ import os
 import json
 import urllib.request, urllib.error
 import logging
+from mc_launcher_core.web.transfer import get_default_policy
 from mc_launcher_core.web.util import chunked_file_download
 
 logger = logging.getLogger(__name__)
@@ -28,7 +29,7 @@ def _get_forge_promotions():
     else:
         logger.info("Attempting to fetch forge promotions...")
         try:
-            response = urllib.request.urlopen(FORGE_PROMOTION_URL)
+            response = urllib.request.urlopen(FORGE_PROMOTION_URL, timeout=get_default_policy().read_timeout)
         except urllib.error.URLError as ex:
             logger.error("Failed to fetch Forge promotions, URLError: {} occurred".format(ex))
             raise
@@ -54,11 +55,12 @@ def _get_forge_version_url(mcversion, forgeversion, forge_homepage):
     return forge_homepage + "{}-{}/".format(mcversion, forgeversion) + "forge-{}-{}-installer.jar".format(mcversion, forgeversion)
 
 
-def download_forge_installer(mcversion, tempdir):
+def download_forge_installer(mcversion, tempdir, policy=None):
     """
     Downloads the appropriate Forge installer for mcversion into tempdir
     :param mcversion: string, e.g. "1.7.10"
     :param tempdir: string, path to temporary storage directory (remember to clear this after forge has been installed)
+    :param policy: TransferPolicy / None, retry / timeout policy for the download
     :return: string, path to installer
     """
     if _forge_promotions_maybe is None:
@@ -95,7 +97,8 @@ def download_forge_installer(mcversion, tempdir):
 
     chunked_file_download(
         forge_url,
-        forge_save_path
+        forge_save_path,
+        policy=policy
     )
 
     return forge_save_path
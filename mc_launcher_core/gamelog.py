@@ -0,0 +1,590 @@
+"""
+Structured game logs: the version JSON's logging.client config (see web.install.save_logging_config) makes log4j write
+each event to the console as XML:
+
+    <log4j:Event logger="net.minecraft.client.Minecraft" timestamp="1500000000000" level="INFO" thread="Client thread">
+      <log4j:Message><![CDATA[Setting user: Player]]></log4j:Message>
+    </log4j:Event>
+
+run_game() reads that from a pipe a line at a time (only the event being read is buffered), echoes it as plain text,
+and appends it to a log store in logdir:
+
+    events-<n>.jsonl.gz    a segment, JSON lines in blocks, each block its own gzip member (so `zcat` reads it whole)
+    events-<n>.idx         a JSON line per block: its offset and length in the segment, first / last timestamps,
+                           level counts and launch ids, so a search only decompresses the blocks that can match
+    metrics.jsonl          a LaunchMetrics line per launch
+
+Segments rotate once they're segment_bytes (compressed) and only the newest keep_segments are kept. Several launches can
+share a logdir, blocks are appended under a file lock.
+
+The metrics are what startup regressions are traced with: when the first log event came after spawning the JVM
+(jvm_start), how long mod loading took (mod_loading, for Forge / Fabric) and when the main menu was reached
+(main_menu), plus event counts, the exit code and any crash report
+"""
+import os
+import re
+import json
+import time
+import gzip
+import uuid
+import logging
+import threading
+import contextlib
+from xml.etree import ElementTree
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+logger = logging.getLogger(__name__)
+
+LOG4J_NAMESPACE = "http://jakarta.apache.org/log4j/"
+EVENT_START = "<log4j:Event"
+EVENT_END = "</log4j:Event>"
+MAX_EVENT_BYTES = 1024 * 1024  # an unterminated event longer than this is passed through as plain lines
+
+PLAIN_LEVEL = "STDOUT"  # level of output that isn't a log4j event (the JVM's own errors, old versions, System.out)
+
+DEFAULT_SEGMENT_BYTES = 16 * 1024 * 1024
+DEFAULT_KEEP_SEGMENTS = 32
+DEFAULT_BLOCK_EVENTS = 512
+FLUSH_SECONDS = 5.0  # buffered events are written out at least this often, even if the game goes quiet
+
+METRICS_FILENAME = "metrics.jsonl"
+LOCK_FILENAME = ".lock"
+_SEGMENT_RE = re.compile(r"^events-(\d+)\.jsonl\.gz$")
+
+# marker -> regex matched against event messages, the first match of each is recorded
+PHASE_MARKERS = (
+    ("mod_loading_started", re.compile(r"^(Forge Mod Loader version |ModLauncher running|Forge mod loading, version )")),
+    ("mod_loading_done", re.compile(r"^(Forge Mod Loader has successfully loaded \d+ mods?|Mod loading complete)")),
+    # Fabric runs the mods' initialisers at the start of the client's constructor, the first thing the game logs
+    # after them is its LWJGL version (which Forge logs before it has loaded mods, hence separate markers)
+    ("fabric_loading_started", re.compile(r"^Loading Minecraft \S+ with Fabric Loader")),
+    ("fabric_loading_done", re.compile(r"^Backend library: LWJGL version")),
+    ("main_menu", re.compile(r"^Sound engine started")),
+)
+# started / done marker pairs the mod_loading phase is timed between
+MOD_LOADING_MARKERS = (("mod_loading_started", "mod_loading_done"), ("fabric_loading_started", "fabric_loading_done"))
+
+_CRASH_SAVED_RE = re.compile(r"(?:#@!@# Game crashed! Crash report saved to: #@!@# |This crash report has been saved to: )(.+)$")
+_CRASH_DESCRIPTION_RE = re.compile(r"^Description: (.*)$", re.MULTILINE)
+
+
+class LogEvent:
+    """
+    A log4j event (or a line of other output)
+    """
+    def __init__(self, timestamp, level, message, logger=None, thread=None, throwable=None):
+        self.timestamp = timestamp  # int, milliseconds since the epoch
+        self.level = level
+        self.message = message
+        self.logger = logger
+        self.thread = thread
+        self.throwable = throwable
+
+    def format(self):
+        """
+        :return: string, as Minecraft's latest.log has it
+        """
+        line = "[{}] [{}/{}]: {}".format(
+            time.strftime("%H:%M:%S", time.localtime(self.timestamp / 1000)), self.thread or "-", self.level, self.message
+        )
+        return line if self.throwable is None else "{}\n{}".format(line, self.throwable.rstrip("\n"))
+
+    def to_dict(self):
+        return dict(
+            timestamp=self.timestamp, level=self.level, message=self.message, logger=self.logger, thread=self.thread,
+            throwable=self.throwable
+        )
+
+    def __repr__(self):
+        return "LogEvent({})".format(self.to_dict())
+
+
+def _plain_event(line):
+    return LogEvent(int(time.time() * 1000), PLAIN_LEVEL, line)
+
+
+def parse_event(text):
+    """
+    :param text: string, a whole <log4j:Event> element
+    :return: LogEvent
+    :raises: ValueError if it isn't one
+    """
+    try:
+        root = ElementTree.fromstring('<events xmlns:log4j="{}">{}</events>'.format(LOG4J_NAMESPACE, text))
+    except ElementTree.ParseError as ex:
+        raise ValueError("Invalid log4j event: {}".format(ex))
+
+    event = root.find("{%s}Event" % LOG4J_NAMESPACE)
+    if event is None:
+        raise ValueError("No log4j event in: {!r}".format(text[:100]))
+
+    message = event.findtext("{%s}Message" % LOG4J_NAMESPACE)
+    return LogEvent(
+        int(event.get("timestamp") or time.time() * 1000),
+        event.get("level"),
+        message.rstrip("\n") if message is not None else "",
+        event.get("logger"),
+        event.get("thread"),
+        event.findtext("{%s}Throwable" % LOG4J_NAMESPACE)
+    )
+
+
+class Log4jEventParser:
+    """
+    Turns console output into LogEvents a line at a time, see feed_line
+    """
+    def __init__(self):
+        self._pending = None  # list<string>, lines of the event being read
+        self._pending_size = 0
+
+    def _flush_plain(self):
+        events = [_plain_event(x) for x in self._pending]
+        self._pending = None
+        return events
+
+    def feed_line(self, line):
+        """
+        :param line: string, one line of output (line ending included or not)
+        :return: list<LogEvent>, the events it completes
+        """
+        line = line.rstrip("\r\n")
+
+        if self._pending is None:
+            if not line.strip():  # XMLLayout separates events with blank lines
+                return []
+            if not line.lstrip().startswith(EVENT_START):
+                return [_plain_event(line)]
+            self._pending = []
+            self._pending_size = 0
+
+        self._pending.append(line)
+        self._pending_size += len(line)
+
+        if EVENT_END in line:
+            text = "\n".join(self._pending)
+            try:
+                event = parse_event(text)
+            except ValueError as ex:
+                logger.debug("Passing through unparsable event: {}".format(ex))
+                return self._flush_plain()
+            self._pending = None
+            return [event]
+
+        if self._pending_size > MAX_EVENT_BYTES:
+            return self._flush_plain()
+
+        return []
+
+    def close(self):
+        """
+        :return: list<LogEvent>, an unterminated event's lines
+        """
+        return self._flush_plain() if self._pending is not None else []
+
+
+class GameLogStore:
+    """
+    A directory of compressed, indexed log segments, see the module docstring
+    """
+    def __init__(self, logdir, segment_bytes=DEFAULT_SEGMENT_BYTES, keep_segments=DEFAULT_KEEP_SEGMENTS):
+        """
+        :param logdir: string
+        :param segment_bytes: int, compressed size a segment is rotated at
+        :param keep_segments: int, segments kept, the oldest are deleted
+        """
+        self.logdir = logdir
+        self.segment_bytes = segment_bytes
+        self.keep_segments = keep_segments
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """
+        Locks the store against other threads and processes
+        """
+        with self._lock:
+            os.makedirs(self.logdir, exist_ok=True)
+            if fcntl is None:
+                yield
+                return
+
+            fd = os.open(os.path.join(self.logdir, LOCK_FILENAME), os.O_CREAT | os.O_RDWR, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                yield
+            finally:
+                os.close(fd)
+
+    def segments(self):
+        """
+        :return: list<int>, segment numbers, oldest first
+        """
+        try:
+            names = os.listdir(self.logdir)
+        except FileNotFoundError:
+            return []
+
+        return sorted(int(m.group(1)) for m in map(_SEGMENT_RE.match, names) if m is not None)
+
+    def segment_path(self, n):
+        return os.path.join(self.logdir, "events-{:08d}.jsonl.gz".format(n))
+
+    def index_path(self, n):
+        return os.path.join(self.logdir, "events-{:08d}.idx".format(n))
+
+    def append_block(self, records):
+        """
+        Compresses and appends a block of records
+        :param records: list<dict>, each with a timestamp, level and launch
+        :return: None
+        """
+        if not records:
+            return
+
+        data = gzip.compress("".join(json.dumps(r) + "\n" for r in records).encode("utf-8"))
+        levels = dict()
+        for r in records:
+            levels[r["level"]] = levels.get(r["level"], 0) + 1
+
+        with self._locked():
+            segments = self.segments()
+            n = segments[-1] if segments else 0
+            path = self.segment_path(n)
+            if os.path.exists(path) and os.path.getsize(path) >= self.segment_bytes:
+                n += 1
+                path = self.segment_path(n)
+                segments.append(n)
+
+            with open(path, 'ab') as f:
+                offset = f.tell()
+                f.write(data)
+
+            entry = dict(
+                offset=offset,
+                length=len(data),
+                first=min(r["timestamp"] for r in records),
+                last=max(r["timestamp"] for r in records),
+                count=len(records),
+                levels=levels,
+                launches=sorted(set(r["launch"] for r in records))
+            )
+            with open(self.index_path(n), 'a') as f:
+                f.write(json.dumps(entry) + "\n")
+
+            for old in segments[:-self.keep_segments]:
+                logger.debug("Deleting old log segment: {}".format(self.segment_path(old)))
+                for p in (self.segment_path(old), self.index_path(old)):
+                    with contextlib.suppress(FileNotFoundError):
+                        os.remove(p)
+
+    def append_metrics(self, metrics):
+        """
+        :param metrics: LaunchMetrics
+        :return: None
+        """
+        with self._locked():
+            with open(os.path.join(self.logdir, METRICS_FILENAME), 'a') as f:
+                f.write(json.dumps(metrics.to_dict()) + "\n")
+
+    def load_metrics(self):
+        """
+        :return: generator<dict>, LaunchMetrics.to_dict() of each launch, oldest first
+        """
+        try:
+            f = open(os.path.join(self.logdir, METRICS_FILENAME))
+        except FileNotFoundError:
+            return
+
+        with f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:  # a line cut short by a crash
+                    continue
+
+    def search(self, pattern=None, level=None, launch=None, since=None, until=None):
+        """
+        Finds events, only decompressing the blocks whose index entry can match
+        :param pattern: string / None, regex searched for in the message (and throwable)
+        :param level: string / list<string> / None
+        :param launch: string / None, a launch id
+        :param since: int / None, milliseconds since the epoch
+        :param until: int / None
+        :return: generator<dict>, the events' records, in the order they were written
+        """
+        regex = re.compile(pattern) if pattern is not None else None
+        levels = {level} if isinstance(level, str) else set(level) if level is not None else None
+
+        for n in self.segments():
+            try:
+                with open(self.index_path(n)) as f:
+                    entries = [json.loads(line) for line in f if line.strip()]
+            except FileNotFoundError:  # rotated away
+                continue
+
+            try:
+                segment = open(self.segment_path(n), 'rb')
+            except FileNotFoundError:
+                continue
+
+            with segment:
+                for entry in entries:
+                    if since is not None and entry["last"] < since or until is not None and entry["first"] > until:
+                        continue
+                    if levels is not None and not levels & set(entry["levels"]):
+                        continue
+                    if launch is not None and launch not in entry["launches"]:
+                        continue
+
+                    segment.seek(entry["offset"])
+                    for line in gzip.decompress(segment.read(entry["length"])).decode("utf-8").splitlines():
+                        r = json.loads(line)
+                        if levels is not None and r["level"] not in levels:
+                            continue
+                        if launch is not None and r["launch"] != launch:
+                            continue
+                        if since is not None and r["timestamp"] < since or until is not None and r["timestamp"] > until:
+                            continue
+                        if regex is not None and not (regex.search(r["message"]) or r.get("throwable") and regex.search(r["throwable"])):
+                            continue
+                        yield r
+
+
+class GameLogWriter:
+    """
+    Buffers a launch's events into blocks for a GameLogStore. A block is written once it's full, and a background
+    thread writes out whatever is buffered every flush_seconds, so the events before a pause or a hang are readable
+    while the game is still running. close() it when the launch is over
+    """
+    def __init__(self, store, launch_id, block_events=DEFAULT_BLOCK_EVENTS, flush_seconds=FLUSH_SECONDS):
+        """
+        :param store: GameLogStore
+        :param launch_id: string
+        :param block_events: int, events per block
+        :param flush_seconds: float / None, longest an event is buffered for, None to only write full blocks
+        """
+        self.store = store
+        self.launch_id = launch_id
+        self.block_events = block_events
+        self.flush_seconds = flush_seconds
+        self._records = []
+        self._lock = threading.Lock()  # held while writing a block, so blocks are appended in order
+        self._closed = threading.Event()
+
+        self._flusher = None
+        if flush_seconds is not None:
+            self._flusher = threading.Thread(target=self._flush_periodically, name="gamelog-flush", daemon=True)
+            self._flusher.start()
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self.flush_seconds):
+            try:
+                self.flush()
+            except Exception as ex:
+                logger.warning("Failed to write buffered log events: {!r}".format(ex))
+
+    def write(self, event):
+        """
+        :param event: LogEvent
+        :return: None
+        """
+        record = event.to_dict()
+        record["launch"] = self.launch_id
+
+        with self._lock:
+            self._records.append(record)
+            full = len(self._records) >= self.block_events
+
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            records, self._records = self._records, []
+            self.store.append_block(records)
+
+    def close(self):
+        self._closed.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.flush()
+
+
+def read_crash_report(path):
+    """
+    :param path: string, a crash-reports/crash-*.txt
+    :return: dict<path, description, exception>
+    """
+    crash = dict(path=path, description=None, exception=None)
+    try:
+        with open(path, errors="replace") as f:
+            text = f.read()
+    except OSError as ex:
+        logger.warning("Failed to read crash report: {} ({})".format(path, ex))
+        return crash
+
+    m = _CRASH_DESCRIPTION_RE.search(text)
+    if m is not None:
+        crash["description"] = m.group(1).strip()
+        # the exception follows the description, after a blank line
+        rest = text[m.end():].lstrip("\r\n")
+        crash["exception"] = rest.splitlines()[0].strip() if rest else None
+
+    return crash
+
+
+class LaunchMetrics:
+    """
+    How a launch went: phase timings (seconds), event counts and any crash
+    """
+    def __init__(self, launch_id, spawned_at, details=None):
+        self.launch_id = launch_id
+        self.spawned_at = spawned_at  # float, seconds since the epoch
+        self.details = details or dict()  # e.g. version, gamedir
+        self.marks = dict()  # marker -> seconds after spawning
+        self.events = 0
+        self.levels = dict()  # level -> count
+        self.last_error = None
+        self.crash = None  # dict<path, description, exception> / None
+        self.exit_code = None
+        self.wall_seconds = None
+
+    @property
+    def phases(self):
+        """
+        :return: dict<string, float>, jvm_start: spawn to the first log event, mod_loading: between the mod loading
+        markers, main_menu: spawn to the main menu. Phases whose markers weren't seen are left out
+        """
+        phases = dict()
+        if "first_event" in self.marks:
+            phases["jvm_start"] = self.marks["first_event"]
+        for started, done in MOD_LOADING_MARKERS:
+            if started in self.marks and done in self.marks:
+                phases["mod_loading"] = self.marks[done] - self.marks[started]
+                break
+        if "main_menu" in self.marks:
+            phases["main_menu"] = self.marks["main_menu"]
+        return phases
+
+    def observe(self, event, phase_markers=PHASE_MARKERS):
+        """
+        Updates the metrics with an event
+        :param event: LogEvent
+        :param phase_markers: list<tuple<marker, regex>>
+        :return: None
+        """
+        self.events += 1
+        self.levels[event.level] = self.levels.get(event.level, 0) + 1
+        at = event.timestamp / 1000 - self.spawned_at
+
+        if event.level != PLAIN_LEVEL:
+            self.marks.setdefault("first_event", at)
+
+        for marker, regex in phase_markers:
+            if marker not in self.marks and regex.search(event.message):
+                self.marks[marker] = at
+
+        if event.level in ("ERROR", "FATAL"):
+            self.last_error = event.message
+
+        m = _CRASH_SAVED_RE.search(event.message)
+        if m is not None:
+            self.crash = read_crash_report(m.group(1).strip())
+
+    def to_dict(self):
+        return dict(
+            launch_id=self.launch_id,
+            spawned_at=self.spawned_at,
+            details=self.details,
+            phases=self.phases,
+            marks=self.marks,
+            events=self.events,
+            levels=self.levels,
+            last_error=self.last_error,
+            crash=self.crash,
+            exit_code=self.exit_code,
+            wall_seconds=self.wall_seconds
+        )
+
+    def __repr__(self):
+        return "LaunchMetrics({})".format(self.to_dict())
+
+
+def echo_event(event):
+    """
+    The default echo for run_game: prints events as Minecraft's latest.log has them
+    """
+    print(event.message if event.level == PLAIN_LEVEL else event.format(), flush=True)
+
+
+def ingest_game_output(stream, writer, metrics, echo=echo_event, phase_markers=PHASE_MARKERS):
+    """
+    Reads a game's output until it closes
+    :param stream: binary file, e.g. Popen.stdout
+    :param writer: GameLogWriter / None
+    :param metrics: LaunchMetrics, updated as events arrive
+    :param echo: callable(LogEvent) / None
+    :param phase_markers: list<tuple<marker, regex>>
+    :return: None
+    """
+    parser = Log4jEventParser()
+
+    def handle(events):
+        for event in events:
+            metrics.observe(event, phase_markers)
+            if writer is not None:
+                writer.write(event)
+            if echo is not None:
+                echo(event)
+
+    for line in iter(stream.readline, b""):
+        handle(parser.feed_line(line.decode("utf-8", errors="replace")))
+    handle(parser.close())
+
+    if writer is not None:
+        writer.flush()
+
+
+def run_game(commands, logdir, cwd=None, launch_id=None, details=None, echo=echo_event, store=None):
+    """
+    Runs a launch command, logging its output to logdir and recording its metrics there
+    :param commands: list<string>, see launch.build_commands
+    :param logdir: string
+    :param cwd: string / None
+    :param launch_id: string / None, defaults to a random id
+    :param details: dict / None, saved with the metrics, e.g. the version
+    :param echo: callable(LogEvent) / None, what's done with each event as well as logging it, defaults to printing it
+    :param store: GameLogStore / None, defaults to one with the default sizes in logdir
+    :return: LaunchMetrics
+    """
+    import subprocess
+
+    store = store or GameLogStore(logdir)
+    metrics = LaunchMetrics(launch_id or uuid.uuid4().hex, time.time(), details)
+    writer = GameLogWriter(store, metrics.launch_id)
+
+    logger.info("Launching: {} (logging to: {})".format(metrics.launch_id, logdir))
+    proc = subprocess.Popen(commands, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+
+    try:
+        ingest_game_output(proc.stdout, writer, metrics, echo)
+    finally:
+        proc.stdout.close()
+        metrics.exit_code = proc.wait()
+        metrics.wall_seconds = time.time() - metrics.spawned_at
+        writer.close()
+        store.append_metrics(metrics)
+
+    if metrics.exit_code != 0:
+        logger.warning("Launch: {} exited with: {}{}".format(
+            metrics.launch_id, metrics.exit_code,
+            ", crash report: {}".format(metrics.crash["path"]) if metrics.crash is not None else ""
+        ))
+    logger.info("Launch: {} phases: {}".format(metrics.launch_id, metrics.phases))
+
+    return metrics
@@ -1,19 +1,314 @@
 """
 Java utilities
 """
+import os
+import re
+import glob
+import json
+import shutil
+import logging
+import threading
 import subprocess
+from mc_launcher_core.exceptions import JavaProbeError
+
+
+logger = logging.getLogger(__name__)
+
+# places where JDKs / JREs are usually installed on Linux
+JAVA_SEARCH_GLOBS = (
+    "/usr/lib/jvm/*/bin/java",
+    "/usr/lib64/jvm/*/bin/java",
+    "/usr/java/*/bin/java",
+    "/opt/java/*/bin/java",
+    "/opt/jdk*/bin/java",
+    "/opt/*/jdk*/bin/java",
+)
+
+JAVA_PROBE_TIMEOUT = 30  # seconds
+
+LEGACY_COMPONENT = "jre-legacy"  # versions from before "javaVersion" was added run on Java 8
+LEGACY_MAJOR_VERSION = 8
+
+_default_registry = None
+
+
+def _default_cache_path():
+    return os.path.join(
+        os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+        "mc_launcher_core",
+        "java_runtimes.json"
+    )
 
 
 class JavaVersion:
+    """
+    A Java version, e.g. "1.8.0_181" or "17.0.2". Old-style "1.x" versions are treated as feature version x
+    """
     def __init__(self, version):
         self.version = version
+        self.parts = self._parse(version)
+
+    @staticmethod
+    def _parse(version):
+        parts = [int(x) for x in re.findall(r"\d+", version)]
+        if len(parts) > 1 and parts[0] == 1:
+            # "1.8.0_181" -> (8, 0, 181)
+            parts = parts[1:]
+
+        return tuple(parts)
+
+    @property
+    def major(self):
+        return self.parts[0] if self.parts else 0
 
     def version_is_atleast(self, v):
-        for this, that in zip(self.version.split('.'), v.split('.')):
-            if int(this) > int(that):
-                return True
+        """
+        Whether this version is at least v
+        :param v: string, e.g. "1.8", "17"
+        :return: bool
+        """
+        that = self._parse(v)
+        length = max(len(self.parts), len(that))
+
+        return self.parts + (0,) * (length - len(self.parts)) >= that + (0,) * (length - len(that))
+
+    def __repr__(self):
+        return "JavaVersion({!r})".format(self.version)
+
+
+class JavaRuntime:
+    """
+    A probed Java runtime
+    """
+    def __init__(self, path, version, vendor=None, arch=None, home=None):
+        self.path = path
+        self.version = JavaVersion(version)
+        self.vendor = vendor
+        self.arch = arch
+        self.home = home
+
+    def to_dict(self):
+        return dict(
+            path=self.path,
+            version=self.version.version,
+            vendor=self.vendor,
+            arch=self.arch,
+            home=self.home
+        )
+
+    def __repr__(self):
+        return "JavaRuntime(path={!r}, version={!r}, vendor={!r}, arch={!r})".format(
+            self.path, self.version.version, self.vendor, self.arch
+        )
+
+
+def parse_java_properties(output):
+    """
+    Parses the output of `java -XshowSettings:properties -version`
+    :param output: string
+    :return: dict<string: string>
+    """
+    properties = dict()
+    last_key = None
+
+    for line in output.splitlines():
+        if " = " in line:
+            key, _, value = line.strip().partition(" = ")
+            properties[key] = value
+            last_key = key
+        elif last_key is not None and line.startswith("        "):
+            # continuation of a multi-valued property (e.g. java.library.path)
+            properties[last_key] += os.pathsep + line.strip()
+        else:
+            last_key = None
+
+    if "java.version" not in properties:
+        # older Javas don't support -XshowSettings, but still print the version banner
+        match = re.search(r'version "([^"]+)"', output)
+        if match:
+            properties["java.version"] = match.group(1)
+
+    return properties
+
+
+def probe_java(path):
+    """
+    Runs the Java executable at path to find out what it is
+    :param path: string
+    :return: JavaRuntime
+    """
+    logger.debug("Probing Java at: {}".format(path))
+    try:
+        p = subprocess.run(
+            [path, "-XshowSettings:properties", "-version"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            timeout=JAVA_PROBE_TIMEOUT
+        )
+    except (OSError, subprocess.TimeoutExpired) as ex:
+        raise JavaProbeError(path, "Failed to run Java at: '{}' ({})".format(path, ex))
+
+    properties = parse_java_properties(p.stdout.decode(errors="replace"))
+
+    if "java.version" not in properties:
+        raise JavaProbeError(path, "Couldn't determine the version of Java at: '{}'".format(path))
+
+    return JavaRuntime(
+        path,
+        properties["java.version"],
+        properties.get("java.vendor"),
+        properties.get("os.arch"),
+        properties.get("java.home")
+    )
+
+
+class JavaRegistry:
+    """
+    Finds and probes Java runtimes. Probe results are cached on disk keyed by binary path and mtime,
+    so each runtime is only ever spawned once
+    """
+    def __init__(self, cache_path=None):
+        self.cache_path = cache_path or _default_cache_path()
+        self._lock = threading.Lock()
+        self._cache = None  # realpath -> dict<mtime_ns, size, runtime>
+
+    def _load(self):
+        if self._cache is None:
+            try:
+                with open(self.cache_path) as f:
+                    self._cache = json.load(f)
+            except (OSError, ValueError):
+                self._cache = dict()
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        tmp_path = "{}.{}.tmp".format(self.cache_path, os.getpid())
+        with open(tmp_path, 'w') as f:
+            json.dump(self._cache, f)
+        os.replace(tmp_path, self.cache_path)
+
+    def get(self, path):
+        """
+        Gets the runtime for the Java executable at path, probing it only if it's changed since it was last seen
+        :param path: string
+        :return: JavaRuntime
+        """
+        realpath = os.path.realpath(path)
+        try:
+            st = os.stat(realpath)
+        except OSError:
+            raise JavaProbeError(path, "Java executable: '{}' doesn't exist".format(path))
+
+        with self._lock:
+            self._load()
+            entry = self._cache.get(realpath)
+
+            if entry is not None and entry["mtime_ns"] == st.st_mtime_ns and entry["size"] == st.st_size:
+                d = entry["runtime"]
+                return JavaRuntime(path, d["version"], d["vendor"], d["arch"], d["home"])
+
+        runtime = probe_java(path)
+
+        with self._lock:
+            self._cache[realpath] = dict(
+                mtime_ns=st.st_mtime_ns,
+                size=st.st_size,
+                runtime=runtime.to_dict()
+            )
+            try:
+                self._save()
+            except OSError as ex:
+                logger.warning("Failed to save Java runtime cache to: {} ({})".format(self.cache_path, ex))
+
+        return runtime
+
+    def candidate_paths(self):
+        """
+        Gets the paths of Java executables in the usual places (JAVA_HOME, PATH, and the standard Linux JDK locations)
+        :return: list<string>
+        """
+        candidates = []
+
+        java_home = os.environ.get("JAVA_HOME")
+        if java_home:
+            candidates.append(os.path.join(java_home, "bin", "java"))
+
+        on_path = shutil.which("java")
+        if on_path:
+            candidates.append(on_path)
+
+        for pattern in JAVA_SEARCH_GLOBS:
+            candidates.extend(sorted(glob.glob(pattern)))
+
+        seen = set()
+        out = []
+        for path in candidates:
+            realpath = os.path.realpath(path)
+            if realpath not in seen and os.path.isfile(realpath) and os.access(realpath, os.X_OK):
+                seen.add(realpath)
+                out.append(path)
+
+        return out
+
+    def discover(self):
+        """
+        Finds and probes all of the Java runtimes installed on this machine
+        :return: list<JavaRuntime>
+        """
+        runtimes = []
+        for path in self.candidate_paths():
+            try:
+                runtimes.append(self.get(path))
+            except JavaProbeError as ex:
+                logger.warning("Ignoring Java at: {} ({})".format(path, ex))
+
+        return runtimes
+
+    def find(self, min_version=None, max_version=None, arch=None):
+        """
+        Finds the newest runtime between min_version and max_version (inclusive of the feature version)
+        :param min_version: string / None, e.g. "1.8"
+        :param max_version: string / None, e.g. "16"
+        :param arch: string / None, e.g. "amd64"
+        :return: JavaRuntime / None
+        """
+        best = None
+        for runtime in self.discover():
+            if min_version is not None and not runtime.version.version_is_atleast(min_version):
+                continue
+            if max_version is not None and runtime.version.major > JavaVersion(max_version).major:
+                continue
+            if arch is not None and runtime.arch != arch:
+                continue
+            if best is None or runtime.version.parts > best.version.parts:
+                best = runtime
+
+        return best
+
+
+def get_default_registry():
+    """
+    Gets the process-wide JavaRegistry
+    :return: JavaRegistry
+    """
+    global _default_registry
+    if _default_registry is None:
+        _default_registry = JavaRegistry()
+
+    return _default_registry
+
+
+def get_java_requirement(profile):
+    """
+    Gets the Java runtime a version needs
+    :param profile: dict, a (merged) version JSON
+    :return: tuple<string, int>, Mojang runtime component and major version, e.g. ("java-runtime-gamma", 17)
+    """
+    java_version = profile.get("javaVersion")
+    if not java_version:
+        return LEGACY_COMPONENT, LEGACY_MAJOR_VERSION
 
-        return False
+    return java_version.get("component", LEGACY_COMPONENT), int(java_version.get("majorVersion", LEGACY_MAJOR_VERSION))
 
 
 def unpack200(file, out, unpack200_exe):
@@ -38,3 +333,4 @@ def version_at(path):
     :param path: string
     :return: JavaVersion
     """
+    return get_default_registry().get(path).version
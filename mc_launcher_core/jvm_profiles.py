@@ -0,0 +1,328 @@
+"""
+JVM flag profiles (GC and heap tuning) for launching Minecraft, chosen by Java version and host resources
+"""
+import os
+import re
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+_profiles = dict()  # name -> JvmProfile, see register_profile()
+
+_GC_SELECTOR = re.compile(r"^-XX:\+Use\w*GC$")
+
+HOST_MEMORY_SHARE = 0.75  # at most this much of the host's memory is given to a heap that's pre-touched / committed up front
+
+
+class HostResources:
+    """
+    The resources available to the JVM on this host
+    """
+    def __init__(self, cpu_count=None, memory=None):
+        """
+        :param cpu_count: int / None, number of usable cores (detected if None)
+        :param memory: int / None, total physical memory in megabytes (detected if None)
+        """
+        self.cpu_count = cpu_count if cpu_count is not None else _detect_cpu_count()
+        self.memory = memory if memory is not None else _detect_memory()
+
+    def __repr__(self):
+        return "HostResources(cpu_count={!r}, memory={!r})".format(self.cpu_count, self.memory)
+
+
+def _detect_cpu_count():
+    try:
+        return len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        return os.cpu_count() or 1
+
+
+def _detect_memory():
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // (1024 * 1024)
+    except (AttributeError, ValueError, OSError):
+        return 0
+
+
+class JvmProfile:
+    """
+    A set of GC / tuning flags. Subclasses override gc_flags(), this base profile adds none (the JVM's defaults)
+    """
+    name = None
+    min_java = "1.6"  # minimum Java version this profile works on
+
+    def is_supported(self, java_version):
+        """
+        :param java_version: JavaVersion
+        :return: bool
+        """
+        return java_version.version_is_atleast(self.min_java)
+
+    def gc_flags(self, java_version, memory, host):
+        """
+        :param java_version: JavaVersion
+        :param memory: int, max heap in megabytes
+        :param host: HostResources
+        :return: list<string>
+        """
+        return []
+
+
+class LegacyProfile(JvmProfile):
+    """
+    CMS with PermGen sizing, for Java 7 and older
+    """
+    name = "legacy"
+
+    def is_supported(self, java_version):
+        # CMS was removed in Java 14
+        return not java_version.version_is_atleast("14")
+
+    def gc_flags(self, java_version, memory, host):
+        flags = ["-XX:+UseConcMarkSweepGC"]
+
+        if not java_version.version_is_atleast("9"):
+            # removed in Java 9, the JVM won't start with it
+            flags.append("-XX:+CMSIncrementalMode")
+
+        if not java_version.version_is_atleast("1.8"):
+            # PermGen was removed in Java 8, see technic code page
+            perm_size = 128
+            if memory >= (1024*6):
+                perm_size = 512
+            elif memory >= 2048:
+                perm_size = 256
+            flags.append("-XX:MaxPermSize={}m".format(perm_size))
+
+        return flags
+
+
+class G1Profile(JvmProfile):
+    """
+    G1 with a realistic pause target
+    """
+    name = "g1"
+    min_java = "1.7"
+
+    def gc_flags(self, java_version, memory, host):
+        flags = [
+            "-XX:+UseG1GC",
+            "-XX:MaxGCPauseMillis=50",
+            "-XX:G1HeapRegionSize={}M".format(16 if memory >= 4096 else 8),
+        ]
+
+        if host.cpu_count > 1:
+            flags.append("-XX:ParallelGCThreads={}".format(host.cpu_count))
+            flags.append("-XX:ConcGCThreads={}".format(max(1, host.cpu_count // 4)))
+
+        return flags
+
+
+class AikarProfile(JvmProfile):
+    """
+    G1 tuned for Minecraft's allocation pattern, see: https://docs.papermc.io/paper/aikars-flags
+    """
+    name = "aikar"
+    min_java = "1.8"
+
+    def gc_flags(self, java_version, memory, host):
+        large = memory >= 12288
+
+        return [
+            "-XX:+UseG1GC",
+            "-XX:+ParallelRefProcEnabled",
+            "-XX:MaxGCPauseMillis=200",
+            "-XX:+UnlockExperimentalVMOptions",
+            "-XX:+DisableExplicitGC",
+            "-XX:+AlwaysPreTouch",
+            "-XX:G1NewSizePercent={}".format(40 if large else 30),
+            "-XX:G1MaxNewSizePercent={}".format(50 if large else 40),
+            "-XX:G1HeapRegionSize={}M".format(16 if large else 8),
+            "-XX:G1ReservePercent={}".format(15 if large else 20),
+            "-XX:G1HeapWastePercent=5",
+            "-XX:G1MixedGCCountTarget=4",
+            "-XX:InitiatingHeapOccupancyPercent={}".format(20 if large else 15),
+            "-XX:G1MixedGCLiveThresholdPercent=90",
+            "-XX:G1RSetUpdatingPauseTimePercent=5",
+            "-XX:SurvivorRatio=32",
+            "-XX:+PerfDisableSharedMem",
+            "-XX:MaxTenuringThreshold=1",
+        ]
+
+
+class ZGCProfile(JvmProfile):
+    """
+    ZGC, generational where available (Java 21+)
+    """
+    name = "zgc"
+    min_java = "15"
+
+    def gc_flags(self, java_version, memory, host):
+        flags = ["-XX:+UseZGC"]
+
+        if java_version.version_is_atleast("21") and not java_version.version_is_atleast("23"):
+            # generational is the default (and only) mode from 23 onwards
+            flags.append("-XX:+ZGenerational")
+
+        flags.append("-XX:+AlwaysPreTouch")
+        flags.append("-XX:ConcGCThreads={}".format(max(1, host.cpu_count // 4)))
+
+        return flags
+
+
+class ShenandoahProfile(JvmProfile):
+    """
+    Shenandoah, only available in some vendors' builds
+    """
+    name = "shenandoah"
+    min_java = "12"
+
+    def gc_flags(self, java_version, memory, host):
+        return [
+            "-XX:+UseShenandoahGC",
+            "-XX:ShenandoahGCHeuristics=adaptive",
+            "-XX:+AlwaysPreTouch",
+        ]
+
+
+def register_profile(profile):
+    """
+    Register a JvmProfile so it can be selected by name
+    :param profile: JvmProfile
+    :return: None
+    """
+    _profiles[profile.name] = profile
+
+
+def get_profile(name):
+    """
+    :param name: string
+    :return: JvmProfile
+    """
+    try:
+        return _profiles[name]
+    except KeyError:
+        raise ValueError("Unknown JVM profile: '{}', available profiles: {}".format(name, sorted(_profiles)))
+
+
+for _profile in (LegacyProfile(), G1Profile(), AikarProfile(), ZGCProfile(), ShenandoahProfile()):
+    register_profile(_profile)
+
+
+def heap_fits(memory, host):
+    """
+    Whether a heap fits comfortably in the host's memory (unknown memory is assumed to be enough)
+    :param memory: int, megabytes
+    :param host: HostResources
+    :return: bool
+    """
+    return not host.memory or memory <= host.memory * HOST_MEMORY_SHARE
+
+
+def choose_profile(java_version, memory, host=None):
+    """
+    Picks the most suitable profile for this Java version and host: its cores and memory. The profiles that pre-touch
+    the whole heap (zgc, aikar) are only picked when the heap fits in the host's memory
+    :param java_version: JavaVersion
+    :param memory: int, max heap in megabytes
+    :param host: HostResources / None
+    :return: JvmProfile
+    """
+    if host is None:
+        host = HostResources()
+
+    if not java_version.version_is_atleast("1.8"):
+        return get_profile("legacy")
+
+    if not heap_fits(memory, host):
+        return get_profile("g1")
+
+    if java_version.version_is_atleast("21") and memory >= 8192 and host.cpu_count >= 4:
+        return get_profile("zgc")
+
+    if memory >= 4096 and host.cpu_count >= 4:
+        return get_profile("aikar")
+
+    return get_profile("g1")
+
+
+def _flag_key(flag):
+    """
+    Gets the key used to detect when two flags set the same option
+    :param flag: string
+    :return: string
+    """
+    if flag.startswith("-XX:"):
+        name = flag[4:]
+        if name[:1] in "+-":
+            return "XX:" + name[1:]
+        return "XX:" + name.split("=", 1)[0]
+    if flag.startswith("-D"):
+        return "D:" + flag[2:].split("=", 1)[0]
+    for prefix in ("-Xms", "-Xmx", "-Xss", "-Xmn"):
+        if flag.startswith(prefix):
+            return prefix
+    return flag
+
+
+def merge_flags(base, overrides):
+    """
+    Merges overrides into base, with overrides winning when both set the same option
+    If overrides select a garbage collector, base's collector selection is dropped
+    :param base: list<string>
+    :param overrides: list<string>
+    :return: list<string>
+    """
+    override_keys = {_flag_key(x) for x in overrides}
+
+    if any(_GC_SELECTOR.match(x) for x in overrides):
+        base = [x for x in base if not _GC_SELECTOR.match(x)]
+
+    return [x for x in base if _flag_key(x) not in override_keys] + list(overrides)
+
+
+def build_jvm_args(java_version, memory, profile=None, min_memory=None, extra_args=None, host=None):
+    """
+    Builds the heap and GC arguments for a launch
+    :param java_version: JavaVersion
+    :param memory: int, max heap in megabytes (-Xmx)
+    :param profile: JvmProfile / string / None, the profile (or its name) to use, chosen automatically if None
+    :param min_memory: int / None, initial heap in megabytes (-Xms), defaults to memory
+    :param extra_args: list<string> / None, user JVM args, these override anything set by the profile
+    :param host: HostResources / None
+    :return: list<string>
+    """
+    if host is None:
+        host = HostResources()
+
+    if profile is None:
+        profile = choose_profile(java_version, memory, host)
+    elif isinstance(profile, str):
+        profile = get_profile(profile)
+
+    if not profile.is_supported(java_version):
+        logger.warning("JVM profile: {} isn't supported on Java {}, falling back".format(profile.name, java_version.version))
+        profile = choose_profile(java_version, memory, host)
+
+    logger.debug("Using JVM profile: {} for Java {} on {}".format(profile.name, java_version.version, host))
+
+    min_memory = min_memory if min_memory is not None else memory
+    fits = heap_fits(memory, host)
+    if not fits:
+        # the heap is only committed as it's used, rather than all up front
+        logger.warning("Max heap: {}m is more than {:.0%} of this host's {}m of memory".format(memory, HOST_MEMORY_SHARE, host.memory))
+        min_memory = min(min_memory, int(host.memory * HOST_MEMORY_SHARE) // 2)
+
+    args = [
+        "-Xms{}m".format(min_memory),
+        "-Xmx{}m".format(memory)
+    ]
+    extra_args = extra_args or []
+    if any(_GC_SELECTOR.match(x) for x in extra_args):
+        # the user picked their own collector, the profile's flags are specific to its collector
+        logger.debug("Collector selected in extra args, ignoring GC flags from profile: {}".format(profile.name))
+    else:
+        args.extend(x for x in profile.gc_flags(java_version, memory, host) if fits or x != "-XX:+AlwaysPreTouch")
+
+    return merge_flags(args, extra_args)
@@ -2,37 +2,98 @@
 Thanks to code from: https://github.com/TechnicPack/MinecraftCore/blob/master/src/main/java/net/technicpack/minecraftcore/launch/MinecraftLauncher.java#L86
 """
 import json
+import hashlib
 import logging
 import os.path
+import pathlib
 import platform
 import subprocess
 import mc_launcher_core
-from mc_launcher_core.javautils import version_at
-from mc_launcher_core.exceptions import LibraryMissingError, MinecraftNotFoundError
-from mc_launcher_core.util import get_required_libraries_paths, get_url_filename, get_minecraft_launch_details, java_esque_string_substitutor
+from mc_launcher_core.javautils import version_at, get_java_requirement, get_default_registry
+from mc_launcher_core.jvm_profiles import build_jvm_args
+from mc_launcher_core.cds import build_cds_args
+from mc_launcher_core.models import dedupe_libraries
+from mc_launcher_core.profiles import resolve_profile, resolve_profile_with_key, load_profile_libraries, is_evicted
+from mc_launcher_core.exceptions import LibraryMissingError, MinecraftNotFoundError, JavaRuntimeNotFoundError, InstallEvictedError
+from mc_launcher_core.util import get_minecraft_launch_details, java_esque_string_substitutor, get_logging_config_path
 
 
 logger = logging.getLogger(__name__)
 
 
-def generate_class_path(bindir, libcache):
+CLASSPATH_CACHE_FILENAME = ".classpath_cache.json"
+CLASSPATH_JAR_FILENAME = "classpath.jar"
+
+
+def _get_class_path_cache_key(bindir, libcache):
     """
-    Generates the class path based off the contents of minecraft.json
+    Gets the key the class path cache is valid for, based on the hashes of the profiles bindir's profile is merged from
     :param bindir: string
-    :param libcache: string, path to place where all libraries are kept (shared across minecrafts)
+    :param libcache: string
     :return: string
     """
+    key, profile = resolve_profile_with_key(bindir)
+
+    h = hashlib.sha1()
+    h.update(key.encode())
+    h.update(profile["fu_client_jar"].encode())
+
+    h.update(os.path.abspath(libcache).encode())
+    h.update(b"modloader" if os.path.isfile(os.path.join(bindir, "modloader.jar")) else b"vanilla")
+
+    return h.hexdigest()
+
+
+def _load_cached_class_path(bindir, key):
+    try:
+        with open(os.path.join(bindir, CLASSPATH_CACHE_FILENAME)) as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if cached.get("key") != key:
+        return None
+
+    return cached["classpath"]
+
+
+def _save_cached_class_path(bindir, key, cp):
+    path = os.path.join(bindir, CLASSPATH_CACHE_FILENAME)
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+    try:
+        with open(tmp_path, 'w') as f:
+            json.dump(dict(key=key, classpath=cp), f)
+        os.replace(tmp_path, path)
+    except OSError as ex:
+        logger.warning("Failed to save class path cache: {}".format(ex))
+
+
+def get_class_path_entries(bindir, libcache, use_cache=True):
+    """
+    Gets the class path entries based off bindir's merged profile. Libraries with the same Maven
+    group:artifact are deduplicated (the highest version wins). The result is cached in bindir keyed on the hashes of
+    the profiles, so the libraries are only checked for existence the first time
+    :param bindir: string
+    :param libcache: string, path to place where all libraries are kept (shared across minecrafts)
+    :param use_cache: bool, whether to use / update the class path cache
+    :return: list<string>
+    """
     logger.debug("Generating class path...")
-    minecraft_path = os.path.join(bindir, "minecraft.jar")
+    minecraft_path = resolve_profile(bindir)["fu_client_jar"]
     modloader_path = os.path.join(bindir, 'modloader.jar')
 
-    cp = []
-
     # add Minecraft jar
     if not os.path.isfile(minecraft_path):
         raise MinecraftNotFoundError(minecraft_path)
 
-    cp.append(minecraft_path)
+    key = _get_class_path_cache_key(bindir, libcache)
+    if use_cache:
+        cp = _load_cached_class_path(bindir, key)
+        if cp is not None:
+            logger.debug("Using cached class path")
+            return cp
+
+    cp = [minecraft_path]
 
     # add the modloader
     logger.debug("Checking if modloader.jar exists...")
@@ -43,9 +104,14 @@ def generate_class_path(bindir, libcache):
     else:
         logger.warning("Failed to find modloader.jar, if this launch supposed to be Vanilla?")
 
-    for lib in get_required_libraries_paths(bindir):
-        logger.debug("Processing library at path: {}".format(lib))
-        filepath = os.path.join(libcache, *lib.split("/"))
+    libraries = dedupe_libraries(load_profile_libraries(bindir))
+
+    for lib in libraries:
+        if lib.artifact is None:
+            continue
+
+        logger.debug("Processing library at path: {}".format(lib.artifact.path))
+        filepath = os.path.join(libcache, *lib.artifact.path.split("/"))
 
         if not os.path.isfile(filepath):
             raise LibraryMissingError(filepath, "Required Library at path: '{}' wasn't found".format(filepath))
@@ -54,22 +120,148 @@ def generate_class_path(bindir, libcache):
 
     logger.debug("done!")
 
+    if use_cache:
+        _save_cached_class_path(bindir, key, cp)
+
+    return cp
+
+
+def write_class_path_jar(path, entries):
+    """
+    Writes a manifest-only jar whose Class-Path is entries, so the command line only needs the one jar
+    :param path: string, where to save the jar
+    :param entries: list<string>, absolute paths
+    :return: None
+    """
+    class_path = " ".join(pathlib.Path(os.path.abspath(x)).as_uri() for x in entries)
+
+    lines = ["Manifest-Version: 1.0", "Created-By: mc_launcher_core"]
+
+    # manifest lines can't be longer than 72 bytes, continuation lines start with a space
+    header = ("Class-Path: " + class_path).encode()
+    lines.append(header[:72].decode())
+    for i in range(72, len(header), 71):
+        lines.append(" " + header[i:i+71].decode())
+
+    manifest = "\r\n".join(lines) + "\r\n\r\n"
+
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+    import zipfile
+    with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_STORED) as z:
+        z.writestr("META-INF/MANIFEST.MF", manifest)
+    os.replace(tmp_path, path)
+
+
+def generate_class_path(bindir, libcache, classpath_jar=False):
+    """
+    Generates the class path based off bindir's merged profile
+    :param bindir: string
+    :param libcache: string, path to place where all libraries are kept (shared across minecrafts)
+    :param classpath_jar: bool, whether to return a single manifest-only jar (saved in bindir) referencing the whole class path
+    :return: string
+    """
+    cp = get_class_path_entries(bindir, libcache)
+
+    if classpath_jar:
+        jar_path = os.path.join(bindir, CLASSPATH_JAR_FILENAME)
+        stamp_path = jar_path + ".key"
+        key = _get_class_path_cache_key(bindir, libcache)
+
+        try:
+            with open(stamp_path) as f:
+                up_to_date = f.read() == key and os.path.isfile(jar_path)
+        except OSError:
+            up_to_date = False
+
+        if not up_to_date:
+            logger.debug("Writing class path jar: {}".format(jar_path))
+            write_class_path_jar(jar_path, cp)
+            with open(stamp_path, 'w') as f:
+                f.write(key)
+
+        return jar_path
+
     return os.path.pathsep.join(cp)  # type: str
 
 
-def build_commands(bindir, gamedir, assetsdir, javapath, session, memory, libcache):
-    # type: (str, str, str, str, mc_launcher_core.MinecraftSession, int, str) -> list
+def get_logging_args(bindir, assetsdir):
+    """
+    Gets the JVM argument applying the log4j config bindir's profile names (see web.install.save_logging_config)
+    :param bindir: string
+    :param assetsdir: string
+    :return: list<string>, empty if the version doesn't have one or it isn't installed
+    """
+    profile = resolve_profile(bindir)
+    path = get_logging_config_path(assetsdir, profile)
+
+    if path is None:
+        return []
+    if not os.path.isfile(path):
+        logger.warning("Log config: {} isn't installed, the game won't log structured events".format(path))
+        return []
+
+    return [java_esque_string_substitutor(profile["logging"]["client"]["argument"], path=os.path.abspath(path))]
+
+
+def find_java_for_install(bindir, java_runtimes_dir=None, policy=None):
+    """
+    Picks the Java to launch bindir with. With java_runtimes_dir, that's the Mojang runtime its version JSON asks for
+    (installed there if it isn't already), otherwise (or if there isn't one for this platform) the newest Java found on
+    this machine with the major version it needs (or newer, for versions that need Java 9+)
+    :param bindir: string
+    :param java_runtimes_dir: string / None
+    :param policy: TransferPolicy / None, for downloading the runtime
+    :return: string, path to the Java executable
+    """
+    component, major = get_java_requirement(resolve_profile(bindir))
+
+    if java_runtimes_dir is not None:
+        from mc_launcher_core.web.java_runtime import install_java_runtime
+        try:
+            return install_java_runtime(java_runtimes_dir, component, policy=policy)
+        except JavaRuntimeNotFoundError as ex:
+            logger.warning("{}, looking for an installed Java instead".format(ex.args[-1]))
+
+    registry = get_default_registry()
+    runtime = registry.find(str(major), str(major))
+    if runtime is None and major > 8:
+        runtime = registry.find(str(major))
+
+    if runtime is None:
+        raise JavaRuntimeNotFoundError(component, "No Java {} runtime found for: {}".format(major, bindir))
+
+    return runtime.path
+
+
+def build_commands(bindir, gamedir, assetsdir, javapath, session, memory, libcache, jvm_profile=None, jvm_args=None, min_memory=None, cds_dir=None, classpath_jar=False, registry=None, java_runtimes_dir=None, host=None, logging_config=False):
+    # type: (str, str, str, str, mc_launcher_core.MinecraftSession, int, str, object, list, int, str, bool, object, str, object, bool) -> list
     """
     :param bindir: string, absolute path to the bin directory containing minecraft.jar, modloader.jar (if any), minecraft.json, and natives/
     :param gamedir: string, absolute path to game directory
     :param assetsdir: string, absolute path to the assets directory (this can be shared across Minecraft versions)
-    :param javapath string, absolute path to Java executable
+    :param javapath string / None, absolute path to Java executable, None to pick one for the version (see find_java_for_install)
     :param session: MinecraftSession, the current session
     :param memory: int, amount of memory to dedicate to this launch (in megabytes)
     :param libcache: string, path to place where all libraries are kept (shared across minecrafts)
+    :param jvm_profile: JvmProfile / string / None, GC profile (or its name, e.g. "g1", "zgc", "aikar"), chosen from the Java version and host if None
+    :param jvm_args: list<string> / None, extra JVM arguments, these override the profile's flags
+    :param min_memory: int / None, initial heap size in megabytes, defaults to memory
+    :param cds_dir: string / None, directory to keep AppCDS archives in (Java 13+), the first launch for a class path creates the archive and later launches use it. Disabled if None
+    :param classpath_jar: bool, whether to pass the class path as a single manifest-only jar (keeps the command line short)
+    :param registry: CacheRegistry / None, records this launch as the install's last use (least recently used installs are evicted first to meet a cache quota)
+    :param java_runtimes_dir: string / None, where to install Mojang's Java runtimes when javapath is None
+    :param host: HostResources / None, what the JVM flags are sized for, defaults to the whole host (see placement.get_host_resources)
+    :param logging_config: bool, whether to apply the version's log4j config, the game then logs XML events to the console (see gamelog.run_game)
     :return:
     """
     logger.info("Building launch commands...")
+    if is_evicted(bindir):
+        raise InstallEvictedError(bindir)
+
+    if javapath is None:
+        javapath = find_java_for_install(bindir, java_runtimes_dir)
+        logger.info("Using Java: {}".format(javapath))
+
     j = version_at(javapath)
     commands = list()
 
@@ -81,33 +273,23 @@ def build_commands(bindir, gamedir, assetsdir, javapath, session, memory, libcac
         #commands.append("-Xdock:icon")
         raise NotImplementedError("MacOS Build commands aren't quite ready yet")
 
-    # Java 1.8 fix, see technic code page
-    perm_size = 128
-    if memory >= (1024*6):
-        perm_size = 512
-    elif memory >= 2048:
-        perm_size = 256
+    commands.extend(build_jvm_args(j, memory, jvm_profile, min_memory, jvm_args, host))
 
-    commands.append("-Xms{}m".format(memory))
-    commands.append("-Xmx{}m".format(memory))
+    commands.append("-Djava.library.path={}".format(resolve_profile(bindir)["fu_natives_dir"]))
 
-    #if j.version_is_atleast("1.8"):
-    #    commands.append("-XX:MaxPermSize={}m".format(perm_size))
+    commands.append("-Dminecraft.applet.TargetDirectory={}".format(os.path.abspath(gamedir)))
+    commands.append("-Djava.net.preferIPv4Stack=true")
 
-    if memory >= 4096:
-        if j.version_is_atleast("1.7"):
-            commands.append("-XX:+UseG1GC")
-            commands.append("-XX:MaxGCPauseMillis=4")
-        else:
-            commands.append("-XX:+UseConcMarkSweepGC")
+    if logging_config:
+        commands.extend(get_logging_args(bindir, assetsdir))
 
-    commands.append("-Djava.library.path={}".format(os.path.join(bindir, "natives")))
+    classpath = generate_class_path(bindir, libcache, classpath_jar)
 
-    commands.append("-Dminecraft.applet.TargetDirectory={}".format(os.path.abspath(gamedir)))
-    commands.append("-Djava.net.preferIPv4Stack=true")
+    if cds_dir is not None:
+        commands.extend(build_cds_args(cds_dir, bindir, javapath, j, classpath))
 
     commands.append("-cp")
-    commands.append(generate_class_path(bindir, libcache))
+    commands.append(classpath)
 
     launch_details = get_minecraft_launch_details(bindir)
 
@@ -128,7 +310,7 @@ def build_commands(bindir, gamedir, assetsdir, javapath, session, memory, libcac
         game_assets=assetsdir,
         user_type='legacy' if session.selected_user.legacy else 'mojang',
         user_properties='{}',
-        assets_index_name=launch_details["version_id"],
+        assets_index_name=launch_details["assets_index"],
 
         version=launch_details["version_id"],
         version_type=launch_details["version_type"]
@@ -141,4 +323,7 @@ def build_commands(bindir, gamedir, assetsdir, javapath, session, memory, libcac
 
     #commands.append(java_esque_string_substitutor(launch_details["args"], **minecraft_args))
 
+    if registry is not None:
+        registry.touch(bindir)
+
     return commands
@@ -0,0 +1,175 @@
+"""
+A LAN mirror: serves a warm machine's assets, libraries and Minecraft jars over HTTP so other machines can install
+from it instead of from Mojang's servers
+
+The layout matches what web.endpoints.Endpoints.with_mirrors() expects:
+    /resources/<hash[:2]>/<hash>        from <assetsdir>/objects
+    /libraries/<maven path>             from libdir
+    /versions/<version>/<version>.jar   from the bindir registered for <version>
+    /versions/<version>/minecraft_server.<version>.jar
+                                        server.jar from the bindir registered for <version>, if it's a server directory
+Files are sent with sendfile() where the OS supports it
+"""
+import os
+import shutil
+import logging
+import posixpath
+import threading
+from http import HTTPStatus
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, unquote
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8750
+
+
+def safe_join(root, path):
+    """
+    Joins a URL path onto root, refusing anything that would escape it
+    :param root: string
+    :param path: string, "/" separated
+    :return: string / None, None if path is unsafe
+    """
+    parts = [x for x in posixpath.normpath("/" + path).split("/") if x]
+    if not parts or any(x in (".", "..") or os.sep in x or (os.altsep and os.altsep in x) for x in parts):
+        return None
+
+    return os.path.join(root, *parts)
+
+
+class _MirrorRequestHandler(BaseHTTPRequestHandler):
+    server_version = "mc_launcher_core-mirror"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logger.debug("{} - {}".format(self.address_string(), format % args))
+
+    def _resolve(self):
+        """
+        :return: string / None, path of the file the request is for
+        """
+        section, _, rest = unquote(urlsplit(self.path).path).lstrip("/").partition("/")
+        mirror = self.server.mirror
+
+        if section == "resources":
+            return safe_join(os.path.join(mirror.assetsdir, "objects"), rest)
+        if section == "libraries":
+            return safe_join(mirror.libdir, rest)
+        if section == "versions":
+            version, _, filename = rest.partition("/")
+            bindir = mirror.bindirs.get(version)
+            if bindir is not None and filename == "{}.jar".format(version):
+                return os.path.join(bindir, "minecraft.jar")
+            if bindir is not None and filename == "minecraft_server.{}.jar".format(version):
+                return os.path.join(bindir, "server.jar")
+
+        return None
+
+    def _send_file(self, head_only):
+        path = self._resolve()
+        if path is None or not os.path.isfile(path):
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+
+            self.send_response(HTTPStatus.OK)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(size))
+            self.end_headers()
+
+            if head_only:
+                return
+
+            self.wfile.flush()
+            try:
+                self.connection.sendfile(f)
+            except (AttributeError, OSError):
+                # e.g. a TLS wrapped socket
+                f.seek(0)
+                shutil.copyfileobj(f, self.wfile)
+
+    def do_GET(self):
+        self._send_file(False)
+
+    def do_HEAD(self):
+        self._send_file(True)
+
+
+class MirrorServer:
+    """
+    Serves an install's files to other machines, see the module docstring for the layout
+    """
+    def __init__(self, assetsdir, libdir, bindirs=None, host="0.0.0.0", port=DEFAULT_PORT):
+        """
+        :param assetsdir: string, path
+        :param libdir: string, path
+        :param bindirs: dict<mcversion: bindir> / None, versions whose minecraft.jar should be served
+        :param host: string, address to listen on
+        :param port: int, 0 to pick a free port
+        """
+        self.assetsdir = assetsdir
+        self.libdir = libdir
+        self.bindirs = dict(bindirs or dict())
+
+        self._httpd = ThreadingHTTPServer((host, port), _MirrorRequestHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.mirror = self
+        self._thread = None
+        self._serving = False
+
+    @property
+    def address(self):
+        """
+        :return: tuple<host, port>, where the server is listening
+        """
+        return self._httpd.server_address[:2]
+
+    @property
+    def url(self):
+        """
+        :return: string, base URL to give to Endpoints.with_mirrors()
+        """
+        host, port = self.address
+        return "http://{}:{}/".format(host, port)
+
+    def add_version(self, mcversion, bindir):
+        """
+        :param mcversion: string
+        :param bindir: string, path to the bin directory holding minecraft.jar (or server directory holding server.jar)
+        :return: None
+        """
+        self.bindirs[mcversion] = bindir
+
+    def serve_forever(self):
+        """
+        Serves requests on this thread until shutdown() is called
+        :return: None
+        """
+        logger.info("Serving mirror on: {}".format(self.url))
+        self._serving = True
+        self._httpd.serve_forever()
+
+    def start(self):
+        """
+        Serves requests on a background thread
+        :return: None
+        """
+        self._thread = threading.Thread(target=self.serve_forever, name="mc-mirror", daemon=True)
+        self._thread.start()
+
+    def shutdown(self):
+        """
+        Stops serving and closes the socket
+        :return: None
+        """
+        if self._serving:
+            self._httpd.shutdown()
+            self._serving = False
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,304 @@
+"""
+Compact models of the library entries in minecraft.json
+
+The raw library dicts are parsed once per version JSON (with rules and natives already resolved for the host) into
+Library objects, which are then used by both class path generation and installation
+"""
+import os
+import re
+import json
+import logging
+import platform
+
+
+logger = logging.getLogger(__name__)
+
+_libraries_cache = dict()  # (path, mtime_ns, size, system, arch) -> list<Library>, see load_libraries_from_file()
+
+
+def get_download_url_path_for_minecraft_lib(descriptor):
+    """
+    Gets the URL path for a library based on it's name
+    :param descriptor: string, e.g. "com.typesafe.akka:akka-actor_2.11:2.3.3"
+    :return: string
+    """
+    ext = "jar"
+
+    pts = descriptor.split(":")
+    domain = pts[0]
+    name = pts[1]
+
+    last = len(pts) - 1
+    if "@" in pts[last]:
+        idx = pts[last].index("@")
+        ext = pts[last][idx+1:]
+        pts[last] = pts[last][0:idx+1]
+
+    version = pts[2]
+
+    classifier = None
+    if len(pts) > 3:
+        classifier = pts[3]
+
+    file = name + "-" + version
+
+    if classifier is not None:
+        file += "-" + classifier
+
+    file += "." + ext
+
+    path = domain.replace(".", "/") + "/" + name + "/" + version + "/" + file
+
+    return path
+
+
+class Artifact:
+    """
+    A single downloadable file belonging to a library
+    """
+    __slots__ = ("path", "url", "sha1", "size", "alt_url")
+
+    def __init__(self, path, url=None, sha1=None, size=None, alt_url=None):
+        self.path = path
+        self.url = url
+        self.sha1 = sha1
+        self.size = size
+        self.alt_url = alt_url
+
+    def __repr__(self):
+        return "Artifact(path={!r}, url={!r}, sha1={!r})".format(self.path, self.url, self.sha1)
+
+
+class NativeClassifier:
+    """
+    The natives classifier of a library that applies to this host
+    """
+    __slots__ = ("classifier", "artifact", "extract_exclude")
+
+    def __init__(self, classifier, artifact, extract_exclude=None):
+        self.classifier = classifier
+        self.artifact = artifact
+        self.extract_exclude = extract_exclude
+
+    @property
+    def do_extract(self):
+        return self.extract_exclude is not None
+
+    def __repr__(self):
+        return "NativeClassifier(classifier={!r}, artifact={!r})".format(self.classifier, self.artifact)
+
+
+class Library:
+    """
+    A library required by Minecraft on this host (rules have already been evaluated)
+    """
+    __slots__ = ("name", "artifact", "native", "xz_unpack", "xz_unpack_on_alt_url", "existence_guaranteed")
+
+    def __init__(self, name, artifact=None, native=None, xz_unpack=False, xz_unpack_on_alt_url=False, existence_guaranteed=False):
+        self.name = name
+        self.artifact = artifact
+        self.native = native
+        self.xz_unpack = xz_unpack
+        self.xz_unpack_on_alt_url = xz_unpack_on_alt_url
+        self.existence_guaranteed = existence_guaranteed
+
+    @property
+    def maven_key(self):
+        """
+        The Maven coordinate without its version, e.g. "org.ow2.asm:asm" or "org.lwjgl:lwjgl:natives-linux"
+        :return: string
+        """
+        pts = self.name.split("@", 1)[0].split(":")
+        return ":".join(pts[:2] + pts[3:])
+
+    @property
+    def version(self):
+        pts = self.name.split("@", 1)[0].split(":")
+        return pts[2] if len(pts) > 2 else ""
+
+    def __repr__(self):
+        return "Library(name={!r}, artifact={!r}, native={!r})".format(self.name, self.artifact, self.native)
+
+
+def get_host_system():
+    """
+    Gets the OS name of the host as used by minecraft.json rules, e.g. "windows", "linux", "osx"
+    :return: string
+    """
+    system = platform.system().lower()
+    if system == "darwin":
+        return "osx"
+    return system
+
+
+def get_host_arch():
+    """
+    Gets the ${arch} substitution for native classifiers
+    :return: string, "64" / "32"
+    """
+    return "64" if platform.machine().endswith('64') else "32"
+
+
+def rules_allow(rules, system):
+    """
+    Whether the rules list allows this library on <system>
+    :param rules: list / None
+    :param system: string, OS name as used by minecraft.json
+    :return: bool
+    """
+    if rules is None:
+        return True
+
+    action = "disallow"
+
+    for rule in rules:
+        if rule.get("os"):
+            if rule["os"].get("name") == system:
+                action = rule["action"]
+        else:
+            action = rule["action"]
+
+    return action == "allow"
+
+
+def _make_artifact(d):
+    """
+    Constructs an Artifact from the raw JSON artifact data
+    :param d: dict / None
+    :return: Artifact / None
+    """
+    if not d:
+        return None
+
+    return Artifact(d["path"], d.get("url"), d.get("sha1"), d.get("size"), d.get("fu_alt_url"))
+
+
+def make_library(lib, system=None, arch=None):
+    """
+    Constructs a Library from raw library JSON data
+    :param lib: dict, library JSON format
+    :param system: string, OS name to resolve rules and natives for (defaults to the host)
+    :param arch: string, "64" / "32" (defaults to the host)
+    :return: Library / None (if the library isn't required on this system)
+    """
+    if system is None:
+        system = get_host_system()
+    if arch is None:
+        arch = get_host_arch()
+
+    if not rules_allow(lib.get("rules"), system):
+        return None
+
+    extract = lib.get("extract") or dict()
+    downloads = lib.get("downloads")
+
+    if downloads is None:
+        # old-style library, only required when it's marked for the client
+        if lib.get("clientreq") is not True:
+            return None
+        return Library(lib["name"], Artifact(get_download_url_path_for_minecraft_lib(lib["name"])))
+
+    native = None
+    if lib.get("natives"):
+        classifier = lib["natives"].get(system)
+        if classifier is not None:
+            classifier = classifier.replace("${arch}", arch)
+            classifiers = downloads.get("classifiers") or dict()
+            if classifiers.get(classifier):
+                native = NativeClassifier(
+                    classifier,
+                    _make_artifact(classifiers[classifier]),
+                    extract.get("exclude", []) if lib.get("extract") else None
+                )
+
+    return Library(
+        lib["name"],
+        _make_artifact(downloads.get("artifact")),
+        native,
+        xz_unpack=bool(extract.get("fu_xz_unpack")),
+        xz_unpack_on_alt_url=bool(extract.get("fu_xz_unpack_on_alt_url")),
+        existence_guaranteed=bool(lib.get("fu_existence_guaranteed"))
+    )
+
+
+def load_libraries(libraries, system=None, arch=None):
+    """
+    Constructs the list of libraries required on this host
+    :param libraries: list<dict>, "libraries" from minecraft.json
+    :param system: string / None
+    :param arch: string / None
+    :return: list<Library>
+    """
+    out = []
+    for lib in libraries:
+        x = make_library(lib, system, arch)
+        if x is not None:
+            out.append(x)
+
+    return out
+
+
+def load_libraries_from_file(path, system=None, arch=None):
+    """
+    Loads the libraries required on this host from the version JSON at path. Parsed results are cached until the file changes
+    :param path: string, path to minecraft.json
+    :param system: string / None
+    :param arch: string / None
+    :return: list<Library>
+    """
+    if system is None:
+        system = get_host_system()
+    if arch is None:
+        arch = get_host_arch()
+
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_mtime_ns, st.st_size, system, arch)
+
+    try:
+        return _libraries_cache[key]
+    except KeyError:
+        pass
+
+    with open(path) as f:
+        libraries = load_libraries(json.load(f)["libraries"], system, arch)
+
+    _libraries_cache[key] = libraries
+    return libraries
+
+
+def _version_sort_key(version):
+    """
+    Natural sort key for a Maven version, e.g. "5.0.10" > "5.0.3" > "4.1"
+    :param version: string
+    :return: tuple
+    """
+    return tuple(
+        (1, int(x), "") if x.isdigit() else (0, 0, x)
+        for x in re.findall(r"\d+|[A-Za-z]+", version)
+    )
+
+
+def dedupe_libraries(libraries):
+    """
+    Removes duplicate libraries (same Maven group:artifact[:classifier]), the highest version wins.
+    The winner keeps the position of the first occurrence so class path ordering is preserved
+    :param libraries: list<Library>
+    :return: list<Library>
+    """
+    chosen = dict()  # maven_key -> index into out
+    out = []
+
+    for lib in libraries:
+        key = lib.maven_key
+        index = chosen.get(key)
+
+        if index is None:
+            chosen[key] = len(out)
+            out.append(lib)
+        elif _version_sort_key(lib.version) > _version_sort_key(out[index].version):
+            logger.debug("Library conflict: {} replaces {}".format(lib.name, out[index].name))
+            out[index] = lib
+        elif lib.name != out[index].name:
+            logger.debug("Library conflict: {} dropped in favour of {}".format(lib.name, out[index].name))
+
+    return out
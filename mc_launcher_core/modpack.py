@@ -0,0 +1,325 @@
+"""
+Installing modpacks (mods, configs, resource packs...) into instance game directories
+
+A pack manifest is JSON:
+    {
+        "name": "my-pack",
+        "version": "1.4.0",
+        "dependencies": {"minecraft": "1.12.2", "forge": "14.23.5.2860"},
+        "files": [
+            {
+                "path": "mods/jei.jar",
+                "hashes": {"sha1": "..."},
+                "downloads": ["https://cdn.example.com/jei.jar", "https://mirror.example.com/jei.jar"],
+                "fileSize": 1234,
+                "env": {"client": "required"}
+            }
+        ],
+        "overrides": "overrides"
+    }
+
+"overrides" names a directory (relative to the manifest) whose files are copied over the game directory as they are,
+e.g. config/. Files with env.client "unsupported" are skipped.
+
+Files are downloaded once, in parallel, into a content-addressed store (<storedir>/objects/<sha1[:2]>/<sha1>) and hard
+linked into each game directory. Overrides are copied instead, as the game edits configs in place. What was installed is
+recorded in <gamedir>/.modpack.json, so updating to a new version of the pack only adds, replaces and removes the files
+that changed
+"""
+import os
+import json
+import shutil
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from mc_launcher_core.exceptions import InvalidModpackError
+
+
+logger = logging.getLogger(__name__)
+
+STATE_FILENAME = ".modpack.json"
+
+
+class PackFile:
+    """
+    A file a pack puts in the game directory
+    """
+    __slots__ = ("path", "sha1", "size", "urls", "source")
+
+    def __init__(self, path, sha1, size=None, urls=(), source=None):
+        self.path = path  # "/" separated, relative to the game directory
+        self.sha1 = sha1
+        self.size = size
+        self.urls = list(urls)
+        self.source = source  # local file (overrides), None to download from urls
+
+    def __repr__(self):
+        return "PackFile(path={!r}, sha1={!r})".format(self.path, self.sha1)
+
+
+class Modpack:
+    """
+    A loaded pack manifest
+    """
+    def __init__(self, name, version, files, dependencies=None):
+        """
+        :param name: string
+        :param version: string
+        :param files: list<PackFile>
+        :param dependencies: dict / None, e.g. {"minecraft": "1.12.2", "forge": "14.23.5.2860"}
+        """
+        self.name = name
+        self.version = version
+        self.files = files
+        self.dependencies = dependencies or dict()
+
+    def get_target(self):
+        """
+        :return: dict<path: sha1>, the files the game directory should end up with
+        """
+        return {f.path: f.sha1 for f in self.files}
+
+
+def _check_path(manifest_path, path):
+    """
+    :return: string, path normalised, raises InvalidModpackError if it'd escape the game directory
+    """
+    normalised = posixpath.normpath(path)
+    if posixpath.isabs(normalised) or normalised.startswith("..") or "\\" in normalised or normalised == ".":
+        raise InvalidModpackError(manifest_path, "Unsafe path in modpack: {!r}".format(path))
+    return normalised
+
+
+def _hash_file(path):
+    from mc_launcher_core.web.util import get_sha1_hash
+    with open(path, 'rb') as f:
+        return get_sha1_hash(f)
+
+
+def load_modpack(manifest_path):
+    """
+    :param manifest_path: string
+    :return: Modpack
+    """
+    with open(manifest_path) as f:
+        try:
+            manifest = json.load(f)
+        except ValueError as ex:
+            raise InvalidModpackError(manifest_path, "Modpack manifest isn't valid JSON: {}".format(ex))
+
+    files = dict()
+    try:
+        for entry in manifest.get("files", []):
+            if entry.get("env", dict()).get("client") == "unsupported":
+                continue
+
+            path = _check_path(manifest_path, entry["path"])
+            files[path] = PackFile(path, entry["hashes"]["sha1"].lower(), entry.get("fileSize"), entry["downloads"])
+    except (KeyError, TypeError, AttributeError) as ex:
+        raise InvalidModpackError(manifest_path, "Modpack file entry is missing: {}".format(ex))
+
+    overrides_dir = os.path.join(os.path.dirname(os.path.abspath(manifest_path)), manifest.get("overrides", "overrides"))
+    if os.path.isdir(overrides_dir):
+        for dirpath, _, filenames in os.walk(overrides_dir):
+            for filename in filenames:
+                source = os.path.join(dirpath, filename)
+                path = _check_path(manifest_path, os.path.relpath(source, overrides_dir).replace(os.sep, "/"))
+                files[path] = PackFile(path, _hash_file(source), os.path.getsize(source), source=source)
+
+    return Modpack(
+        manifest.get("name", os.path.basename(manifest_path)),
+        manifest.get("version", ""),
+        sorted(files.values(), key=lambda f: f.path),
+        manifest.get("dependencies")
+    )
+
+
+def get_object_path(storedir, sha1):
+    return os.path.join(storedir, "objects", sha1[:2], sha1)
+
+
+def fetch_pack_files(pack, storedir, policy=None, workers=8):
+    """
+    Makes sure every file of pack is in the store, downloading (in parallel, each distinct file once) the missing ones.
+    Downloads are verified against their sha1 as they stream
+    :param pack: Modpack
+    :param storedir: string
+    :param policy: TransferPolicy / None
+    :param workers: int, downloads in flight at once
+    :return: tuple<int, int>, files and bytes downloaded
+    """
+    from mc_launcher_core.web.endpoints import download_from_first_available
+
+    missing = dict()  # sha1 -> PackFile
+    for f in pack.files:
+        if f.sha1 not in missing and not os.path.isfile(get_object_path(storedir, f.sha1)):
+            missing[f.sha1] = f
+
+    def fetch(f):
+        path = get_object_path(storedir, f.sha1)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = "{}.{}.tmp".format(path, os.getpid())
+
+        try:
+            if f.source is not None:
+                shutil.copyfile(f.source, tmp_path)
+            else:
+                logger.debug("Downloading: {}".format(f.path))
+                download_from_first_available(f.urls, tmp_path, policy, f.sha1)
+
+            if os.name == "posix":
+                os.chmod(tmp_path, 0o444)  # it's linked into every instance, editing one copy in place would edit them all
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        return 0 if f.source is not None else os.path.getsize(path)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        sizes = list(pool.map(fetch, missing.values()))
+
+    downloaded = sum(1 for f in missing.values() if f.source is None)
+    logger.info("Fetched {} files ({} bytes) for: {} {}".format(downloaded, sum(sizes), pack.name, pack.version))
+
+    return downloaded, sum(sizes)
+
+
+def _read_state(gamedir):
+    try:
+        with open(os.path.join(gamedir, STATE_FILENAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return dict(files=dict())
+
+
+def _link(object_path, path, copy=False):
+    """
+    Points path at object_path (a hard link, or a copy where links aren't possible), replacing what's there atomically
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+    if os.path.lexists(tmp_path):
+        os.remove(tmp_path)
+
+    try:
+        if copy:
+            shutil.copyfile(object_path, tmp_path)
+        else:
+            os.link(object_path, tmp_path)
+    except OSError:
+        shutil.copyfile(object_path, tmp_path)
+
+    os.replace(tmp_path, path)
+
+
+def _is_ours(path, sha1, storedir):
+    """
+    Whether the file at path is still the one the pack installed (not replaced / edited by the user)
+    """
+    try:
+        if os.path.samefile(path, get_object_path(storedir, sha1)):
+            return True
+    except OSError:
+        return False
+
+    return _hash_file(path) == sha1
+
+
+def apply_pack(pack, gamedir, storedir, verify=False):
+    """
+    Brings gamedir in line with pack (whose files must already be in the store, see fetch_pack_files), only touching
+    files that changed since the pack was last applied. Files the user has changed (or put there before the pack did) are
+    left alone and reported as conflicts, delete them to take the pack's version
+    :param pack: Modpack
+    :param gamedir: string
+    :param storedir: string
+    :param verify: bool, whether to check unchanged files are still intact instead of trusting the recorded state (files
+    that aren't are restored)
+    :return: dict<added, updated, removed, unchanged: int, conflicts: list<path>>
+    """
+    os.makedirs(gamedir, exist_ok=True)
+    previous = _read_state(gamedir)["files"]
+    target = pack.get_target()
+    counts = dict(added=0, updated=0, removed=0, unchanged=0, conflicts=[])
+
+    for path, sha1 in previous.items():
+        if path in target:
+            continue
+
+        filepath = os.path.join(gamedir, *path.split("/"))
+        if not os.path.lexists(filepath):
+            continue
+
+        if _is_ours(filepath, sha1, storedir):
+            os.remove(filepath)
+            counts["removed"] += 1
+        else:
+            logger.warning("Not removing: {}, it's been changed since the pack installed it".format(filepath))
+
+    for f in pack.files:
+        filepath = os.path.join(gamedir, *f.path.split("/"))
+
+        if previous.get(f.path) == f.sha1 and os.path.isfile(filepath) and (not verify or _is_ours(filepath, f.sha1, storedir)):
+            counts["unchanged"] += 1
+            continue
+
+        exists = os.path.lexists(filepath)
+        if exists and previous.get(f.path) != f.sha1:
+            if _is_ours(filepath, f.sha1, storedir):
+                # already what the pack wants
+                counts["unchanged"] += 1
+                continue
+
+            if f.path not in previous or not _is_ours(filepath, previous[f.path], storedir):
+                logger.warning("Not replacing: {}, it's been changed since the pack installed it (or wasn't installed by it)".format(filepath))
+                counts["conflicts"].append(f.path)
+                # still the pack's old version as far as later updates are concerned (or not the pack's at all)
+                if f.path in previous:
+                    target[f.path] = previous[f.path]
+                else:
+                    del target[f.path]
+                continue
+
+        counts["updated" if exists else "added"] += 1
+        _link(get_object_path(storedir, f.sha1), filepath, copy=f.source is not None)
+
+    tmp_path = os.path.join(gamedir, "{}.{}.tmp".format(STATE_FILENAME, os.getpid()))
+    with open(tmp_path, 'w') as f:
+        json.dump(dict(name=pack.name, version=pack.version, files=target), f)
+    os.replace(tmp_path, os.path.join(gamedir, STATE_FILENAME))
+
+    logger.info("Applied: {} {} to: {} ({})".format(pack.name, pack.version, gamedir, counts))
+
+    return counts
+
+
+def install_modpack(manifest_path, gamedirs, storedir, policy=None, workers=8, verify=False):
+    """
+    Installs (or updates to) a pack in one or more game directories. Files are downloaded once however many
+    directories there are
+    :param manifest_path: string
+    :param gamedirs: list<string> / string
+    :param storedir: string, content-addressed store shared by every instance
+    :param policy: TransferPolicy / None
+    :param workers: int, downloads / instances in flight at once
+    :param verify: bool, see apply_pack
+    :return: dict, what was downloaded and, per game directory, what changed
+    """
+    if isinstance(gamedirs, str):
+        gamedirs = [gamedirs]
+
+    pack = load_modpack(manifest_path)
+    downloaded, downloaded_bytes = fetch_pack_files(pack, storedir, policy, workers)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        changes = list(pool.map(lambda gamedir: apply_pack(pack, gamedir, storedir, verify), gamedirs))
+
+    return dict(
+        name=pack.name,
+        version=pack.version,
+        dependencies=pack.dependencies,
+        downloaded=downloaded,
+        downloaded_bytes=downloaded_bytes,
+        instances=dict(zip(gamedirs, changes))
+    )
@@ -0,0 +1,224 @@
+"""
+A task DAG executor: tasks declare the tasks they depend on, independent tasks run concurrently, and each completed task
+is checkpointed so a crashed run resumes where it left off
+
+Each task is called with a dict of its dependencies' results. Results are saved in the checkpoint, so they have to be
+JSON serialisable (or None). The report has per task timings and the critical path (the chain of dependent tasks that
+took longest), which is what the wall time should come down to
+"""
+import os
+import json
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+logger = logging.getLogger(__name__)
+
+DONE = "done"
+RESUMED = "resumed"  # completed by an earlier run, taken from the checkpoint
+FAILED = "failed"
+CANCELLED = "cancelled"  # not run, something failed first
+
+
+class TaskTiming:
+    """
+    When a task ran, relative to the start of the run
+    """
+    def __init__(self, status, started=None, finished=None):
+        self.status = status
+        self.started = started
+        self.finished = finished
+
+    @property
+    def seconds(self):
+        return self.finished - self.started if self.finished is not None else 0.0
+
+    def to_dict(self):
+        return dict(status=self.status, started=self.started, finished=self.finished, seconds=self.seconds)
+
+
+class PipelineReport:
+    """
+    How a run went
+    """
+    def __init__(self):
+        self.tasks = dict()  # name -> TaskTiming
+        self.results = dict()  # name -> result
+        self.wall_seconds = 0.0
+        self.critical_path = []  # list<name>
+        self.critical_path_seconds = 0.0
+
+    @property
+    def ok(self):
+        return all(t.status in (DONE, RESUMED) for t in self.tasks.values())
+
+    @property
+    def task_seconds(self):
+        """
+        :return: float, the time every task took added up (what running them one after another would take)
+        """
+        return sum(t.seconds for t in self.tasks.values())
+
+    def to_dict(self):
+        return dict(
+            tasks={name: t.to_dict() for name, t in self.tasks.items()},
+            wall_seconds=self.wall_seconds,
+            task_seconds=self.task_seconds,
+            critical_path=self.critical_path,
+            critical_path_seconds=self.critical_path_seconds
+        )
+
+
+class Pipeline:
+    """
+    Tasks and their dependencies
+    """
+    def __init__(self, checkpoint_path=None, key=None, workers=4):
+        """
+        :param checkpoint_path: string / None, where to save progress, None to not checkpoint
+        :param key: JSON serialisable / None, identifies what's being run, a checkpoint saved with a different key is ignored
+        :param workers: int, tasks run at once
+        """
+        self.checkpoint_path = checkpoint_path
+        self.key = key
+        self.workers = workers
+        self.tasks = dict()  # name -> tuple<func, tuple<deps>>
+        self.report = None  # PipelineReport of the last run
+
+    def add(self, name, func, deps=()):
+        """
+        :param name: string
+        :param func: callable(dict<dep name: result>) -> result
+        :param deps: list<string>, tasks that must complete first (they must already have been added)
+        :return: string, name
+        """
+        if name in self.tasks:
+            raise ValueError("Task: {} was added twice".format(name))
+        for dep in deps:
+            if dep not in self.tasks:
+                raise ValueError("Task: {} depends on unknown task: {}".format(name, dep))
+
+        self.tasks[name] = (func, tuple(deps))
+        return name
+
+    def _load_checkpoint(self):
+        if self.checkpoint_path is None:
+            return dict()
+
+        try:
+            with open(self.checkpoint_path) as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError):
+            return dict()
+
+        if checkpoint.get("key") != self.key:
+            logger.info("Ignoring checkpoint for a different run: {}".format(self.checkpoint_path))
+            return dict()
+
+        return {name: result for name, result in checkpoint["done"].items() if name in self.tasks}
+
+    def _save_checkpoint(self, done):
+        os.makedirs(os.path.dirname(os.path.abspath(self.checkpoint_path)), exist_ok=True)
+        tmp_path = "{}.{}.tmp".format(self.checkpoint_path, os.getpid())
+        with open(tmp_path, 'w') as f:
+            json.dump(dict(key=self.key, done=done), f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _find_critical_path(self, report):
+        """
+        The chain of dependent tasks with the longest total time
+        """
+        longest = dict()  # name -> tuple<seconds, path>
+        for name, (_, deps) in self.tasks.items():  # added in dependency order
+            before = max((longest[d] for d in deps), key=lambda x: x[0], default=(0.0, []))
+            longest[name] = (before[0] + report.tasks[name].seconds, before[1] + [name])
+
+        if longest:
+            report.critical_path_seconds, report.critical_path = max(longest.values(), key=lambda x: x[0])
+
+    def run(self):
+        """
+        Runs every task not already completed according to the checkpoint. The checkpoint is removed once
+        everything has completed. If a task fails, no new tasks are started, running ones are waited for and the
+        error is raised (self.report has the timings so far)
+        :return: PipelineReport
+        """
+        report = PipelineReport()
+        self.report = report
+
+        done = self._load_checkpoint()
+        for name, result in done.items():
+            report.tasks[name] = TaskTiming(RESUMED)
+            report.results[name] = result
+        if done:
+            logger.info("Resuming, already done: {}".format(sorted(done)))
+
+        lock = threading.Lock()
+        start = time.perf_counter()
+        running = dict()  # future -> name
+        error = None
+
+        def call(name):
+            func, deps = self.tasks[name]
+            timing = report.tasks[name]
+            timing.started = time.perf_counter() - start
+            logger.debug("Starting task: {}".format(name))
+
+            try:
+                result = func({d: report.results[d] for d in deps})
+            finally:
+                timing.finished = time.perf_counter() - start
+
+            with lock:
+                report.results[name] = result
+                done[name] = result
+                if self.checkpoint_path is not None:
+                    self._save_checkpoint(done)
+
+            logger.debug("Finished task: {} in {:.3f}s".format(name, timing.seconds))
+            return result
+
+        def ready():
+            return [
+                name for name, (_, deps) in self.tasks.items()
+                if name not in report.tasks and all(d in done for d in deps)
+            ]
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while True:
+                if error is None:
+                    for name in ready():
+                        report.tasks[name] = TaskTiming(None)
+                        running[pool.submit(call, name)] = name
+
+                if not running:
+                    break
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    if future.exception() is not None:
+                        report.tasks[name].status = FAILED
+                        logger.error("Task: {} failed ({!r})".format(name, future.exception()))
+                        error = error or future.exception()
+                    else:
+                        report.tasks[name].status = DONE
+
+        report.wall_seconds = time.perf_counter() - start
+        for name in self.tasks:
+            report.tasks.setdefault(name, TaskTiming(CANCELLED))
+        self._find_critical_path(report)
+
+        if error is not None:
+            raise error
+
+        if self.checkpoint_path is not None and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+        logger.info("Pipeline finished in {:.2f}s (tasks took {:.2f}s, critical path {:.2f}s: {})".format(
+            report.wall_seconds, report.task_seconds, report.critical_path_seconds, " -> ".join(report.critical_path)
+        ))
+
+        return report
@@ -0,0 +1,427 @@
+"""
+Resource placement for launched clients and servers (Linux): CPU affinity, cgroup v2 memory / CPU / cpuset limits, and
+nice / ionice priorities, so instances packed onto one host don't fight over cores, and one instance's GC storm
+doesn't stall its neighbours
+
+Placements are applied by a small wrapper that runs in the child before it execs Java:
+    python -m mc_launcher_core.placement --cpus 0-3 --nice 5 --ionice best-effort:7 --cgroup /sys/fs/cgroup/mc/a -- java ...
+so they also apply to commands handed to another process to run (e.g. the CLI's launch). The JVM sizes its GC and
+compiler threads from the CPUs it's allowed to run on, so limited instances also get fitting thread counts
+
+cgroup limits need a cgroup v2 subtree this user can write to, e.g. a systemd unit / slice with Delegate=yes. The
+cgroup is created (and its limits set) by place_commands, and is left behind for the caller to remove_cgroup once the
+instance has exited
+
+PlacementScheduler hands out cores to instances automatically: each instance gets cores on one NUMA node (so its memory
+stays local), whole physical cores first (so SMT siblings aren't shared with a neighbour), on the least loaded node
+"""
+import os
+import sys
+import glob
+import math
+import logging
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+IONICE_CLASSES = {"realtime": 1, "best-effort": 2, "idle": 3}
+CPU_MAX_PERIOD = 100000  # microseconds
+
+# ioprio_set has no Python binding, syscall numbers by machine
+_IOPRIO_SET_SYSCALLS = {"x86_64": 251, "i386": 289, "i686": 289, "aarch64": 30, "armv7l": 314, "ppc64le": 273, "s390x": 282}
+_IOPRIO_CLASS_SHIFT = 13
+_IOPRIO_WHO_PROCESS = 1
+
+
+def parse_cpu_list(s):
+    """
+    :param s: string, kernel CPU list format, e.g. "0-3,8,10-11"
+    :return: list<int>, sorted
+    """
+    cpus = set()
+    for part in s.strip().split(","):
+        if not part:
+            continue
+        start, _, end = part.partition("-")
+        cpus.update(range(int(start), int(end or start) + 1))
+    return sorted(cpus)
+
+
+def format_cpu_list(cpus):
+    """
+    :param cpus: iterable<int>
+    :return: string, e.g. "0-3,8"
+    """
+    ranges = []
+    for cpu in sorted(set(cpus)):
+        if ranges and cpu == ranges[-1][1] + 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ",".join(str(a) if a == b else "{}-{}".format(a, b) for a, b in ranges)
+
+
+def _read(path):
+    with open(path) as f:
+        return f.read().strip()
+
+
+def _usable_cpus():
+    try:
+        return set(os.sched_getaffinity(0))
+    except AttributeError:
+        return set(range(os.cpu_count() or 1))
+
+
+def read_numa_topology():
+    """
+    Gets the NUMA nodes and their CPUs (only the CPUs this process may use), one node with every usable CPU if the
+    host doesn't report NUMA nodes
+    :return: dict<node: list<int>>
+    """
+    usable = _usable_cpus()
+    nodes = dict()
+
+    for path in glob.glob("/sys/devices/system/node/node[0-9]*"):
+        try:
+            cpus = [c for c in parse_cpu_list(_read(os.path.join(path, "cpulist"))) if c in usable]
+        except OSError:
+            continue
+        if cpus:
+            nodes[int(os.path.basename(path)[4:])] = cpus
+
+    return nodes or {0: sorted(usable)}
+
+
+def _core_order(cpus):
+    """
+    Orders cpus so SMT siblings are next to each other, so consecutive CPUs make whole physical cores
+    """
+    ordered = []
+    for cpu in cpus:
+        if cpu in ordered:
+            continue
+        try:
+            siblings = parse_cpu_list(_read("/sys/devices/system/cpu/cpu{}/topology/thread_siblings_list".format(cpu)))
+        except OSError:
+            siblings = [cpu]
+        ordered.extend(c for c in [cpu] + siblings if c in cpus and c not in ordered)
+    return ordered
+
+
+class Placement:
+    """
+    Where and with what limits an instance runs. Everything is optional
+    """
+    def __init__(self, cpus=None, mems=None, memory_max=None, cpu_max=None, nice=None, ionice=None, cgroup=None):
+        """
+        :param cpus: list<int> / None, CPUs to pin to
+        :param mems: list<int> / None, NUMA nodes to allocate memory from (needs cgroup)
+        :param memory_max: int / None, bytes, the instance is OOM killed above this (needs cgroup)
+        :param cpu_max: float / None, CPU time limit in cores, e.g. 2.5 (needs cgroup)
+        :param nice: int / None, niceness to add, 0-19
+        :param ionice: tuple<string, int> / None, IO scheduling class ("realtime", "best-effort", "idle") and level (0-7)
+        :param cgroup: string / None, path of the cgroup v2 directory to create and run in, e.g. /sys/fs/cgroup/mc/a
+        """
+        self.cpus = sorted(cpus) if cpus is not None else None
+        self.mems = sorted(mems) if mems is not None else None
+        self.memory_max = memory_max
+        self.cpu_max = cpu_max
+        self.nice = nice
+        self.ionice = ionice
+        self.cgroup = cgroup
+
+        if self.cgroup is None and (mems is not None or memory_max is not None or cpu_max is not None):
+            raise ValueError("Memory, CPU time and NUMA memory limits need a cgroup")
+        if ionice is not None and ionice[0] not in IONICE_CLASSES:
+            raise ValueError("Unknown IO scheduling class: {}, expected one of: {}".format(ionice[0], sorted(IONICE_CLASSES)))
+
+    @property
+    def cpu_count(self):
+        """
+        :return: int / None, CPUs the instance can use
+        """
+        counts = []
+        if self.cpus:
+            counts.append(len(self.cpus))
+        if self.cpu_max:
+            counts.append(math.ceil(self.cpu_max))
+        return min(counts) if counts else None
+
+    def is_empty(self):
+        return all(x is None for x in (self.cpus, self.nice, self.ionice, self.cgroup))
+
+    def to_dict(self):
+        return dict(
+            cpus=self.cpus, mems=self.mems, memory_max=self.memory_max, cpu_max=self.cpu_max,
+            nice=self.nice, ionice=list(self.ionice) if self.ionice else None, cgroup=self.cgroup
+        )
+
+    def __repr__(self):
+        return "Placement({})".format({k: v for k, v in self.to_dict().items() if v is not None})
+
+
+def get_host_resources(placement, memory=None):
+    """
+    Gets the resources a placed instance has, for sizing its JVM flags (see jvm_profiles.build_jvm_args)
+    :param placement: Placement / None
+    :param memory: int / None, megabytes, defaults to the host's (or the placement's memory limit)
+    :return: HostResources / None (None for an unplaced instance, i.e. the whole host)
+    """
+    from mc_launcher_core.jvm_profiles import HostResources
+
+    if placement is None or (placement.cpu_count is None and placement.memory_max is None):
+        return None
+
+    if memory is None and placement.memory_max is not None:
+        memory = placement.memory_max // (1024 * 1024)
+
+    return HostResources(placement.cpu_count, memory)
+
+
+def create_cgroup(placement):
+    """
+    Creates placement's cgroup and sets its limits (enabling the controllers in its parent as needed)
+    :param placement: Placement, with cgroup set
+    :return: None
+    """
+    path = placement.cgroup
+    controllers = []
+    if placement.memory_max is not None:
+        controllers.append("memory")
+    if placement.cpu_max is not None:
+        controllers.append("cpu")
+    if placement.cpus is not None or placement.mems is not None:
+        controllers.append("cpuset")
+
+    parent = os.path.dirname(path.rstrip("/"))
+    if controllers:
+        enabled = _read(os.path.join(parent, "cgroup.subtree_control")).split()
+        missing = [c for c in controllers if c not in enabled]
+        if missing:
+            try:
+                with open(os.path.join(parent, "cgroup.subtree_control"), 'w') as f:
+                    f.write(" ".join("+" + c for c in missing))
+            except OSError as ex:
+                raise OSError(ex.errno, "Can't enable cgroup controllers: {} in: {} (is it delegated to this user?)".format(missing, parent))
+
+    os.makedirs(path, exist_ok=True)
+
+    settings = dict()
+    if placement.memory_max is not None:
+        settings["memory.max"] = str(placement.memory_max)
+        settings["memory.swap.max"] = "0"
+    if placement.cpu_max is not None:
+        settings["cpu.max"] = "{} {}".format(int(placement.cpu_max * CPU_MAX_PERIOD), CPU_MAX_PERIOD)
+    if placement.cpus is not None:
+        settings["cpuset.cpus"] = format_cpu_list(placement.cpus)
+    if placement.mems is not None:
+        settings["cpuset.mems"] = format_cpu_list(placement.mems)
+
+    for name, value in settings.items():
+        try:
+            with open(os.path.join(path, name), 'w') as f:
+                f.write(value)
+        except FileNotFoundError:
+            logger.warning("cgroup: {} has no: {}, not limiting it".format(path, name))
+
+    logger.info("Created cgroup: {} with: {}".format(path, settings))
+
+
+def remove_cgroup(path):
+    """
+    Removes a cgroup once every process in it has exited
+    :param path: string
+    :return: bool, whether it was removed
+    """
+    try:
+        os.rmdir(path)
+        return True
+    except FileNotFoundError:
+        return True
+    except OSError as ex:
+        logger.warning("Failed to remove cgroup: {} ({})".format(path, ex))
+        return False
+
+
+def place_commands(commands, placement):
+    """
+    Wraps a launch command so it runs with placement (creating its cgroup first)
+    :param commands: list<string>
+    :param placement: Placement / None
+    :return: list<string>
+    """
+    if placement is None or placement.is_empty():
+        return commands
+
+    if placement.cgroup is not None:
+        create_cgroup(placement)
+
+    wrapper = [sys.executable, "-m", "mc_launcher_core.placement"]
+    if placement.cpus is not None:
+        wrapper.extend(["--cpus", format_cpu_list(placement.cpus)])
+    if placement.nice is not None:
+        wrapper.extend(["--nice", str(placement.nice)])
+    if placement.ionice is not None:
+        wrapper.extend(["--ionice", "{}:{}".format(*placement.ionice)])
+    if placement.cgroup is not None:
+        wrapper.extend(["--cgroup", placement.cgroup])
+
+    return wrapper + ["--"] + list(commands)
+
+
+def set_ionice(class_name, level, pid=0):
+    """
+    :param class_name: string, see IONICE_CLASSES
+    :param level: int, 0 (highest) - 7
+    :param pid: int, 0 for this process
+    :return: None
+    """
+    import ctypes
+    import platform
+
+    number = _IOPRIO_SET_SYSCALLS.get(platform.machine())
+    if number is None:
+        raise OSError("ioprio_set isn't known for: {}".format(platform.machine()))
+
+    libc = ctypes.CDLL(None, use_errno=True)
+    if libc.syscall(number, _IOPRIO_WHO_PROCESS, pid, (IONICE_CLASSES[class_name] << _IOPRIO_CLASS_SHIFT) | level) != 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, os.strerror(errno))
+
+
+def apply_placement(cpus=None, nice=None, ionice=None, cgroup=None):
+    """
+    Applies a placement to this process (and so whatever it execs), see the wrapper in main()
+    :param cpus: list<int> / None
+    :param nice: int / None
+    :param ionice: tuple<string, int> / None
+    :param cgroup: string / None, an existing cgroup to move into
+    :return: None
+    """
+    if cgroup is not None:
+        with open(os.path.join(cgroup, "cgroup.procs"), 'w') as f:
+            f.write(str(os.getpid()))
+    if cpus is not None:
+        os.sched_setaffinity(0, cpus)
+    if nice:
+        os.nice(nice)
+    if ionice is not None:
+        try:
+            set_ionice(*ionice)
+        except OSError as ex:
+            logger.warning("Failed to set IO priority: {}".format(ex))
+
+
+class PlacementScheduler:
+    """
+    Assigns cores to instances, see the module docstring. Not shared between processes: place every instance on a host
+    from one scheduler
+    """
+    def __init__(self, topology=None, cgroup_parent=None):
+        """
+        :param topology: dict<node: list<cpu>> / None, defaults to read_numa_topology()
+        :param cgroup_parent: string / None, delegated cgroup v2 directory to create instances' cgroups in, needed for
+        memory / CPU time limits
+        """
+        self.topology = {node: _core_order(cpus) for node, cpus in (topology or read_numa_topology()).items()}
+        self.cgroup_parent = cgroup_parent
+        self.placements = dict()  # name -> Placement
+        self._lock = threading.Lock()
+
+    def _load(self):
+        """
+        :return: dict<cpu: int>, instances on each CPU
+        """
+        load = {cpu: 0 for cpus in self.topology.values() for cpu in cpus}
+        for placement in self.placements.values():
+            for cpu in placement.cpus:
+                load[cpu] += 1
+        return load
+
+    def allocate(self, name, cores, memory_max=None, cpu_max=None, nice=None, ionice=None):
+        """
+        Places an instance on the least loaded cores of one NUMA node (spilling over nodes only if it needs more cores
+        than a node has)
+        :param name: string, unique per instance
+        :param cores: int, CPUs to pin it to
+        :param memory_max: int / None, bytes (needs cgroup_parent)
+        :param cpu_max: float / None, cores of CPU time (needs cgroup_parent)
+        :param nice: int / None
+        :param ionice: tuple<string, int> / None
+        :return: Placement
+        """
+        with self._lock:
+            if name in self.placements:
+                raise ValueError("Instance: {} is already placed".format(name))
+
+            load = self._load()
+
+            def node_cost(node):
+                cpus = self.topology[node]
+                # the node whose `cores` least loaded CPUs are least loaded, then the emptiest node
+                return sorted(load[c] for c in cpus)[:cores], sum(load[c] for c in cpus), node
+
+            node = min(self.topology, key=node_cost)
+            if cores <= len(self.topology[node]):
+                candidates = self.topology[node]
+            else:
+                candidates = [c for n in sorted(self.topology, key=node_cost) for c in self.topology[n]]
+
+            # least loaded first, keeping SMT siblings together (candidates are in core order)
+            chosen = sorted(candidates, key=lambda c: load[c])[:cores]
+            nodes = sorted({n for n, cpus in self.topology.items() if set(cpus) & set(chosen)})
+
+            placement = Placement(
+                cpus=chosen,
+                mems=nodes if self.cgroup_parent is not None and len(self.topology) > 1 else None,
+                memory_max=memory_max,
+                cpu_max=cpu_max,
+                nice=nice,
+                ionice=ionice,
+                cgroup=os.path.join(self.cgroup_parent, name) if self.cgroup_parent is not None else None
+            )
+            self.placements[name] = placement
+
+        logger.info("Placed: {} on NUMA node(s): {}, CPUs: {}".format(name, nodes, format_cpu_list(chosen)))
+        return placement
+
+    def release(self, name):
+        """
+        Frees an instance's cores (and removes its cgroup), call once it has exited
+        :param name: string
+        :return: None
+        """
+        with self._lock:
+            placement = self.placements.pop(name, None)
+
+        if placement is not None and placement.cgroup is not None:
+            remove_cgroup(placement.cgroup)
+
+
+def main(argv=None):
+    """
+    The wrapper place_commands() runs: applies the placement to itself, then execs the command
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m mc_launcher_core.placement")
+    parser.add_argument("--cpus", type=parse_cpu_list)
+    parser.add_argument("--nice", type=int)
+    parser.add_argument("--ionice", type=lambda s: (s.split(":")[0], int(s.split(":")[1])))
+    parser.add_argument("--cgroup")
+    parser.add_argument("command", nargs=argparse.REMAINDER)
+    args = parser.parse_args(argv)
+
+    command = args.command[1:] if args.command[:1] == ["--"] else args.command
+    if not command:
+        parser.error("no command given")
+
+    apply_placement(args.cpus, args.nice, args.ionice, args.cgroup)
+    os.execvp(command[0], command)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING, stream=sys.stderr)
+    sys.exit(main())
@@ -0,0 +1,184 @@
+"""
+Page cache prewarming before a launch: the JVM reads the class path jars, natives and a few assets (sounds.json, the
+language file, the title screen's icons) while it starts, and on a freshly booted / autoscaled machine those reads all
+go to disk one at a time. Prewarming asks the kernel to read them ahead (posix_fadvise WILLNEED, or reading them where
+that isn't available) across a small thread pool, in the background, so it overlaps with logging in and building the
+launch command
+
+    task = start_prewarm(get_prewarm_paths(bindir, libcache, assetsdir))
+    session = MinecraftSession(...)    # auth overlaps with the prewarm
+    commands = build_commands(...)
+    report = task.wait()
+"""
+import os
+import json
+import time
+import fnmatch
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from mc_launcher_core.launch import get_class_path_entries
+from mc_launcher_core.profiles import resolve_profile
+
+
+logger = logging.getLogger(__name__)
+
+# asset names (fnmatch patterns) read while the game starts up to the main menu
+DEFAULT_HOT_ASSETS = (
+    "icons/*",
+    "minecraft/sounds.json",
+    "minecraft/lang/en_us.json",
+    "minecraft/lang/en_US.lang",
+    "minecraft/textures/gui/title/background/*",
+)
+
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+class PrewarmReport:
+    """
+    What a prewarm covered and how long it took
+    """
+    def __init__(self, files=0, bytes=0, missing=0, seconds=0.0, method=None):
+        self.files = files
+        self.bytes = bytes
+        self.missing = missing
+        self.seconds = seconds
+        self.method = method  # "fadvise" / "read"
+
+    def to_dict(self):
+        return dict(files=self.files, bytes=self.bytes, missing=self.missing, seconds=self.seconds, method=self.method)
+
+    def __repr__(self):
+        return "PrewarmReport({})".format(self.to_dict())
+
+
+def get_asset_paths(assetsdir, assets_index, patterns=DEFAULT_HOT_ASSETS):
+    """
+    :param assetsdir: string
+    :param assets_index: string, names <assetsdir>/indexes/<assets_index>.json
+    :param patterns: list<string>, fnmatch patterns of asset names
+    :return: list<string>, paths of the matching asset objects
+    """
+    try:
+        with open(os.path.join(assetsdir, "indexes", "{}.json".format(assets_index))) as f:
+            objects = json.load(f)["objects"]
+    except FileNotFoundError:
+        return []
+
+    return [
+        os.path.join(assetsdir, "objects", asset["hash"][:2], asset["hash"])
+        for name, asset in objects.items()
+        if any(fnmatch.fnmatchcase(name, pattern) for pattern in patterns)
+    ]
+
+
+def get_prewarm_paths(bindir, libcache, assetsdir=None, assets=DEFAULT_HOT_ASSETS):
+    """
+    Lists what a launch of bindir will read: its class path (see get_class_path_entries), natives and hot assets
+    :param bindir: string
+    :param libcache: string
+    :param assetsdir: string / None, None to skip assets
+    :param assets: list<string>, fnmatch patterns of asset names to include
+    :return: list<string>
+    """
+    paths = list(get_class_path_entries(bindir, libcache))
+
+    profile = resolve_profile(bindir)
+    nativesdir = profile["fu_natives_dir"]
+    if os.path.isdir(nativesdir):
+        paths.extend(os.path.join(nativesdir, x) for x in sorted(os.listdir(nativesdir)))
+
+    if assetsdir is not None and assets:
+        paths.extend(get_asset_paths(assetsdir, profile["fu_assets_index"], assets))
+
+    return paths
+
+
+def _warm_file(path, read):
+    """
+    :return: int, file size, -1 if it doesn't exist
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except (FileNotFoundError, IsADirectoryError):
+        return -1
+
+    try:
+        size = os.fstat(fd).st_size
+        if read:
+            while os.read(fd, READ_CHUNK_SIZE):
+                pass
+        else:
+            os.posix_fadvise(fd, 0, size, os.POSIX_FADV_WILLNEED)
+        return size
+    finally:
+        os.close(fd)
+
+
+def prewarm_files(paths, workers=4, read=False):
+    """
+    Pulls files into the page cache
+    :param paths: list<string>
+    :param workers: int, files in flight at once
+    :param read: bool, whether to read the files through rather than advise the kernel (which returns once the reads
+    are queued), always used where posix_fadvise isn't available
+    :return: PrewarmReport
+    """
+    read = read or not hasattr(os, "posix_fadvise")
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        sizes = list(pool.map(lambda path: _warm_file(path, read), paths))
+
+    report = PrewarmReport(
+        files=sum(1 for x in sizes if x >= 0),
+        bytes=sum(x for x in sizes if x > 0),
+        missing=sum(1 for x in sizes if x < 0),
+        seconds=time.perf_counter() - start,
+        method="read" if read else "fadvise"
+    )
+    logger.info("Prewarmed {} files ({} bytes) in {:.3f}s".format(report.files, report.bytes, report.seconds))
+
+    return report
+
+
+class PrewarmTask:
+    """
+    A prewarm running in the background, see start_prewarm
+    """
+    def __init__(self, paths, workers=4, read=False):
+        self.report = None
+        self.error = None
+        self._thread = threading.Thread(target=self._run, args=(paths, workers, read), name="prewarm", daemon=True)
+        self._thread.start()
+
+    def _run(self, paths, workers, read):
+        try:
+            self.report = prewarm_files(paths, workers, read)
+        except Exception as ex:
+            logger.warning("Prewarm failed: {!r}".format(ex))
+            self.error = ex
+
+    def done(self):
+        return not self._thread.is_alive()
+
+    def wait(self, timeout=None):
+        """
+        :param timeout: float / None, seconds
+        :return: PrewarmReport / None, None if it failed or is still running after timeout (the launch doesn't need it
+        to have finished)
+        """
+        self._thread.join(timeout)
+        return self.report
+
+
+def start_prewarm(paths, workers=4, read=False):
+    """
+    Starts prewarming paths in the background
+    :param paths: list<string>, see get_prewarm_paths
+    :param workers: int
+    :param read: bool, see prewarm_files
+    :return: PrewarmTask
+    """
+    return PrewarmTask(paths, workers, read)
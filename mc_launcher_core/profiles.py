@@ -0,0 +1,252 @@
+"""
+Layered version profiles: a child profile (e.g. a mod loader's modloader.json) inherits from a parent (the vanilla
+minecraft.json) and only lists what it adds or changes. resolve_profile() merges the chain into one profile. Vanilla
+files are never modified, so one vanilla install can back many loader variants
+
+Where a profile's parent is found, for a profile in bindir:
+    modloader.json -> minecraft.json in the same bindir, if there is one
+    otherwise, "inheritsFrom": <id> -> <versionsdir>/<id>/minecraft.json (versionsdir defaults to bindir's parent)
+
+Merging (child over parent): the child's libraries come first and replace the parent's with the same Maven
+group:artifact[:classifier], "arguments" lists are concatenated, any other key in the child overrides the parent's.
+The merged profile also gets:
+    fu_client_jar: the minecraft.jar of the nearest profile in the chain that has one
+    fu_natives_dir: the natives directory of the nearest profile in the chain that has one
+    fu_assets_index: the id of the root (vanilla) profile, which names its asset index
+
+Merged profiles are cached in memory and in <bindir>/.merged_profile.json, keyed by the hashes of every file in the chain
+"""
+import os
+import json
+import hashlib
+import logging
+from mc_launcher_core.exceptions import InvalidMinecraftVersionError
+from mc_launcher_core.models import load_libraries
+
+
+logger = logging.getLogger(__name__)
+
+MERGED_PROFILE_FILENAME = ".merged_profile.json"
+EVICTED_FILENAME = ".evicted"  # written into an install's bindir when cache collection evicts it
+MAX_DEPTH = 10
+
+_merged_cache = dict()  # tuple<bindir, versionsdir> -> tuple<key, profile, list<tuple<path, (mtime_ns, size)>>>
+_libraries_cache = dict()  # key -> list<Library>
+
+
+def get_profile_path(bindir):
+    """
+    :param bindir: string
+    :return: string, modloader.json if bindir has one, otherwise minecraft.json
+    """
+    modloader_path = os.path.join(bindir, "modloader.json")
+    return modloader_path if os.path.isfile(modloader_path) else os.path.join(bindir, "minecraft.json")
+
+
+def is_evicted(bindir):
+    """
+    :param bindir: string
+    :return: bool, whether cache collection evicted the install (see cache_gc.CacheRegistry.collect)
+    """
+    return os.path.isfile(os.path.join(bindir, EVICTED_FILENAME))
+
+
+def _library_key(lib):
+    pts = lib["name"].split("@", 1)[0].split(":")
+    return ":".join(pts[:2] + pts[3:])
+
+
+def merge_profiles(parent, child):
+    """
+    Merges a child profile over its parent
+    :param parent: dict
+    :param child: dict
+    :return: dict, a new profile (neither argument is modified)
+    """
+    merged = dict(parent)
+
+    for k, v in child.items():
+        if k == "libraries":
+            child_keys = set(_library_key(lib) for lib in v)
+            merged["libraries"] = list(v) + [lib for lib in parent.get("libraries", []) if _library_key(lib) not in child_keys]
+        elif k == "arguments":
+            merged["arguments"] = {
+                kind: parent.get("arguments", dict()).get(kind, []) + child["arguments"].get(kind, [])
+                for kind in set(parent.get("arguments", dict())) | set(child["arguments"])
+            }
+        else:
+            merged[k] = v
+
+    merged.pop("inheritsFrom", None)
+
+    return merged
+
+
+def _find_parent(path, data, versionsdir):
+    """
+    :param path: string, a profile
+    :param data: bytes, its contents
+    :param versionsdir: string / None
+    :return: string / None, the parent profile's path, None for a root profile
+    """
+    bindir = os.path.dirname(path)
+
+    if os.path.basename(path) == "modloader.json" and os.path.isfile(os.path.join(bindir, "minecraft.json")):
+        return os.path.join(bindir, "minecraft.json")
+
+    if b"inheritsFrom" not in data:  # saves parsing the (big) vanilla profiles
+        return None
+
+    parent_id = json.loads(data.decode("utf-8")).get("inheritsFrom")
+    if parent_id is None:
+        return None
+
+    parent_path = os.path.join(versionsdir or os.path.dirname(os.path.abspath(bindir)), parent_id, "minecraft.json")
+    if not os.path.isfile(parent_path):
+        raise InvalidMinecraftVersionError(parent_id, "Parent profile: {} of: {} wasn't found at: {}".format(parent_id, path, parent_path))
+
+    return parent_path
+
+
+def get_profile_chain(bindir, versionsdir=None):
+    """
+    :param bindir: string
+    :param versionsdir: string / None, where parents named by "inheritsFrom" are, defaults to bindir's parent directory
+    :return: list<tuple<path, bytes>>, the profiles and their contents, child first
+    """
+    chain = []
+    path = get_profile_path(bindir)
+
+    while path is not None:
+        if len(chain) >= MAX_DEPTH or any(p == path for p, _ in chain):
+            raise ValueError("Profile inheritance loop (or more than {} levels) at: {}".format(MAX_DEPTH, path))
+
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        chain.append((path, data))
+        path = _find_parent(path, data, versionsdir)
+
+    return chain
+
+
+def _file_stat(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _merge_chain(chain):
+    profiles = [json.loads(data.decode("utf-8")) for _, data in chain]
+
+    merged = profiles[-1]
+    for child in reversed(profiles[:-1]):
+        merged = merge_profiles(merged, child)
+
+    merged = dict(merged)
+    merged["fu_assets_index"] = profiles[-1]["id"]
+
+    return merged
+
+
+def _add_install_paths(profile, chain):
+    """
+    Adds fu_client_jar and fu_natives_dir, which depend on what's installed where rather than on the profiles
+    """
+    dirs = [os.path.dirname(os.path.abspath(path)) for path, _ in chain]
+
+    profile = dict(profile)
+    profile["fu_client_jar"] = next(
+        (os.path.join(d, "minecraft.jar") for d in dirs if os.path.isfile(os.path.join(d, "minecraft.jar"))),
+        os.path.join(dirs[-1], "minecraft.jar")
+    )
+    profile["fu_natives_dir"] = next(
+        (os.path.join(d, "natives") for d in dirs if os.path.isdir(os.path.join(d, "natives"))),
+        os.path.join(dirs[0], "natives")
+    )
+
+    return profile
+
+
+def resolve_profile_with_key(bindir, versionsdir=None, use_cache=True):
+    """
+    :return: tuple<string, dict>, the merged profile's cache key (changes whenever a file in its chain does) and the profile
+    """
+    memory_key = (os.path.abspath(bindir), versionsdir)
+    cached = _merged_cache.get(memory_key) if use_cache else None
+    if cached is not None:
+        key, profile, chain_stats = cached
+        if all(_file_stat(p) == st for p, st in chain_stats) and get_profile_path(bindir) == chain_stats[0][0]:
+            return key, profile
+
+    chain = get_profile_chain(bindir, versionsdir)
+
+    h = hashlib.sha1()
+    for path, data in chain:
+        h.update(os.path.abspath(path).encode())
+        h.update(hashlib.sha1(data).digest())
+    key = h.hexdigest()
+
+    # a lone profile is its own merged view, only layered ones are worth saving
+    cache_path = os.path.join(bindir, MERGED_PROFILE_FILENAME)
+    profile = None
+    if use_cache and len(chain) > 1:
+        try:
+            with open(cache_path) as f:
+                saved = json.load(f)
+            if saved.get("key") == key:
+                profile = saved["profile"]
+        except (OSError, ValueError):
+            pass
+
+    if profile is None:
+        profile = _merge_chain(chain)
+
+        if use_cache and len(chain) > 1:
+            logger.debug("Saving merged profile: {}".format(cache_path))
+            tmp_path = "{}.{}.tmp".format(cache_path, os.getpid())
+            try:
+                with open(tmp_path, 'w') as f:
+                    json.dump(dict(key=key, profile=profile), f)
+                os.replace(tmp_path, cache_path)
+            except OSError as ex:
+                logger.warning("Failed to save merged profile: {}".format(ex))
+
+    profile = _add_install_paths(profile, chain)
+
+    if use_cache:
+        _merged_cache[memory_key] = (key, profile, [(path, _file_stat(path)) for path, _ in chain])
+
+    return key, profile
+
+
+def resolve_profile(bindir, versionsdir=None, use_cache=True):
+    """
+    Gets the profile to launch / install bindir with, merged with its parents. The result is shared, don't modify it
+    :param bindir: string
+    :param versionsdir: string / None, where parents named by "inheritsFrom" are, defaults to bindir's parent directory
+    :param use_cache: bool
+    :return: dict
+    """
+    return resolve_profile_with_key(bindir, versionsdir, use_cache)[1]
+
+
+def load_profile_libraries(bindir, versionsdir=None):
+    """
+    Loads the libraries required on this host by bindir's merged profile. Parsed results are cached until the chain changes
+    :param bindir: string
+    :param versionsdir: string / None
+    :return: list<Library>
+    """
+    key, profile = resolve_profile_with_key(bindir, versionsdir)
+
+    try:
+        return _libraries_cache[key]
+    except KeyError:
+        pass
+
+    libraries = load_libraries(profile["libraries"])
+    _libraries_cache[key] = libraries
+    return libraries
@@ -0,0 +1,386 @@
+"""
+Dedicated servers: unpacking the server jar's libraries into the shared library cache, building server launch commands
+and supervising running servers
+
+A server directory (serverdir) holds one version's server, shared by any number of server instances, which each get
+their own game directory (world, server.properties, eula.txt) as their working directory:
+    minecraft.json          the version JSON (picks the Java runtime, like a client's)
+    server.jar              downloads.server, see mc_launcher_core.web.download_minecraft_server
+    server-<version>.jar    the server itself, unpacked from server.jar if it's a bundle (1.18+)
+    .server_launch.json     how to launch the unpacked server: main class and class path (Maven paths in libdir)
+
+Bundled servers unpack their libraries into ./libraries of the working directory on every start. Unpacking them once
+into libdir (where they're shared with clients and other servers) and launching the main class directly skips that
+"""
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+import subprocess
+from collections import deque
+from mc_launcher_core.exceptions import HashMatchError, MinecraftNotFoundError, LibraryMissingError, InstallEvictedError
+
+
+logger = logging.getLogger(__name__)
+
+SERVER_JAR_FILENAME = "server.jar"
+SERVER_LAUNCH_FILENAME = ".server_launch.json"
+
+# e.g. [12:00:00] [Server thread/INFO]: Done (3.456s)! For help, type "help"
+READY_PATTERN = re.compile(r"Done \((\d+(?:[.,]\d+)?)s\)!")
+
+
+def _read_list(z, name):
+    """
+    Reads one of a bundle's META-INF/*.list files
+    :return: list<tuple<sha256, id, path>>
+    """
+    entries = []
+    for line in z.read(name).decode("utf-8").splitlines():
+        if line.strip():
+            sha256, id, path = line.split("\t")
+            entries.append((sha256, id, path))
+    return entries
+
+
+def _extract_verified(z, name, path, sha256):
+    """
+    Extracts a bundle member to path (atomically), unless the file already there has the same hash
+    :return: bool, whether it was extracted
+    """
+    if os.path.isfile(path) and os.path.getsize(path) == z.getinfo(name).file_size:
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(64 * 1024), b""):
+                h.update(chunk)
+        if h.hexdigest() == sha256:
+            return False
+        logger.warning("Existing: {} doesn't match the bundle, extracting it again".format(path))
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+
+    h = hashlib.sha256()
+    try:
+        with z.open(name) as src, open(tmp_path, 'wb') as dst:
+            for chunk in iter(lambda: src.read(64 * 1024), b""):
+                h.update(chunk)
+                dst.write(chunk)
+
+        if h.hexdigest() != sha256:
+            raise HashMatchError(name, "server", "Bundled: {} has hash: {}, expected: {}".format(name, h.hexdigest(), sha256))
+
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return True
+
+
+def unpack_server_bundle(serverdir, libdir):
+    """
+    Unpacks a bundled server.jar: its libraries into libdir (at their Maven paths) and the server into serverdir, and
+    records how to launch it. Does nothing for older, self-contained server jars
+    :param serverdir: string
+    :param libdir: string
+    :return: bool, whether server.jar is a bundle
+    """
+    import zipfile
+
+    jar_path = os.path.join(serverdir, SERVER_JAR_FILENAME)
+    launch_path = os.path.join(serverdir, SERVER_LAUNCH_FILENAME)
+
+    with zipfile.ZipFile(jar_path) as z:
+        names = set(z.namelist())
+        if "META-INF/libraries.list" not in names or "META-INF/versions.list" not in names:
+            if os.path.exists(launch_path):
+                os.remove(launch_path)
+            return False
+
+        main_class = z.read("META-INF/main-class").decode("utf-8").strip()
+        extracted = 0
+
+        classpath = []
+        for sha256, _, path in _read_list(z, "META-INF/libraries.list"):
+            extracted += _extract_verified(z, "META-INF/libraries/" + path, os.path.join(libdir, *path.split("/")), sha256)
+            classpath.append(path)
+
+        server_jars = []
+        for sha256, _, path in _read_list(z, "META-INF/versions.list"):
+            filename = path.rsplit("/", 1)[-1]
+            extracted += _extract_verified(z, "META-INF/versions/" + path, os.path.join(serverdir, filename), sha256)
+            server_jars.append(filename)
+
+    logger.info("Unpacked {} files from server bundle: {}".format(extracted, jar_path))
+
+    tmp_path = "{}.{}.tmp".format(launch_path, os.getpid())
+    with open(tmp_path, 'w') as f:
+        json.dump(dict(main_class=main_class, server_jars=server_jars, libraries=classpath), f)
+    os.replace(tmp_path, launch_path)
+
+    return True
+
+
+def load_server_launch(serverdir):
+    """
+    :param serverdir: string
+    :return: dict<main_class, server_jars, libraries> / None, None if the server isn't an unpacked bundle
+    """
+    try:
+        with open(os.path.join(serverdir, SERVER_LAUNCH_FILENAME)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def build_server_commands(serverdir, javapath, memory, libdir, jvm_profile=None, jvm_args=None, min_memory=None, port=None, nogui=True, server_args=None, java_runtimes_dir=None, registry=None, host=None):
+    """
+    Builds the command to run a dedicated server, with the same Java selection and JVM flags as client launches. Run it
+    with the instance's game directory as the working directory (see launch_server)
+    :param serverdir: string, holding server.jar and minecraft.json
+    :param javapath: string / None, absolute path to Java executable, None to pick one for the version (see find_java_for_install)
+    :param memory: int, megabytes
+    :param libdir: string, where unpacked bundle libraries are
+    :param jvm_profile: JvmProfile / string / None
+    :param jvm_args: list<string> / None
+    :param min_memory: int / None, megabytes
+    :param port: int / None, port to listen on, defaults to server.properties'
+    :param nogui: bool
+    :param server_args: list<string> / None, extra server arguments, e.g. ["--world", "bench"]
+    :param java_runtimes_dir: string / None
+    :param registry: CacheRegistry / None, records this launch as the install's last use
+    :param host: HostResources / None, what the JVM flags are sized for, defaults to the whole host
+    :return: list<string>
+    """
+    from mc_launcher_core.javautils import version_at
+    from mc_launcher_core.jvm_profiles import build_jvm_args
+    from mc_launcher_core.launch import find_java_for_install
+    from mc_launcher_core.profiles import is_evicted
+
+    logger.info("Building server launch commands...")
+    if is_evicted(serverdir):
+        raise InstallEvictedError(serverdir)
+
+    jar_path = os.path.join(serverdir, SERVER_JAR_FILENAME)
+    if not os.path.isfile(jar_path):
+        raise MinecraftNotFoundError(jar_path)
+
+    if javapath is None:
+        javapath = find_java_for_install(serverdir, java_runtimes_dir)
+        logger.info("Using Java: {}".format(javapath))
+
+    commands = [javapath]
+    commands.extend(build_jvm_args(version_at(javapath), memory, jvm_profile, min_memory, jvm_args, host))
+
+    launch = load_server_launch(serverdir)
+    if launch is not None:
+        cp = [os.path.join(serverdir, x) for x in launch["server_jars"]]
+        cp.extend(os.path.join(libdir, *x.split("/")) for x in launch["libraries"])
+
+        for filepath in cp:
+            if not os.path.isfile(filepath):
+                raise LibraryMissingError(filepath, "Required server library at path: '{}' wasn't found".format(filepath))
+
+        commands.extend(["-cp", os.path.pathsep.join(cp), launch["main_class"]])
+    else:
+        commands.extend(["-jar", jar_path])
+
+    if nogui:
+        commands.append("nogui")
+    if port is not None:
+        commands.extend(["--port", str(port)])
+    commands.extend(server_args or [])
+
+    if registry is not None:
+        registry.touch(serverdir)
+
+    return commands
+
+
+class ServerProcess:
+    """
+    Handle on a running dedicated server: its console output is drained on a background thread (kept in a bounded
+    tail), commands can be sent to its console, and it can be waited on until ready or stopped gracefully
+    """
+    def __init__(self, commands, gamedir, on_line=None, tail=200):
+        """
+        :param commands: list<string>, see build_server_commands
+        :param gamedir: string, working directory
+        :param on_line: callable(string) / None, called (on the reader thread) with each console line
+        :param tail: int, console lines kept
+        """
+        self.commands = commands
+        self.gamedir = gamedir
+        self.on_line = on_line
+        self.output = deque(maxlen=tail)
+
+        self.started_at = None
+        self.ready_at = None  # time.monotonic() when the server finished starting
+        self.reported_startup_time = None  # seconds, as the server logs it
+
+        self._proc = None
+        self._ready = threading.Event()
+        self._reader = None
+
+    def start(self):
+        """
+        :return: ServerProcess, self
+        """
+        os.makedirs(self.gamedir, exist_ok=True)
+
+        logger.info("Starting server in: {}".format(self.gamedir))
+        self.started_at = time.monotonic()
+        self._proc = subprocess.Popen(
+            self.commands,
+            cwd=self.gamedir,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            shell=False
+        )
+
+        self._reader = threading.Thread(target=self._read_output, name="server-{}".format(self._proc.pid), daemon=True)
+        self._reader.start()
+
+        return self
+
+    def _read_output(self):
+        for raw in self._proc.stdout:
+            line = raw.decode("utf-8", "replace").rstrip("\r\n")
+            self.output.append(line)
+
+            if not self._ready.is_set():
+                m = READY_PATTERN.search(line)
+                if m is not None:
+                    self.ready_at = time.monotonic()
+                    self.reported_startup_time = float(m.group(1).replace(",", "."))
+                    self._ready.set()
+
+            if self.on_line is not None:
+                try:
+                    self.on_line(line)
+                except Exception:
+                    logger.exception("Server output callback failed")
+
+        self._ready.set()  # exited, wake up anything waiting for it to be ready
+
+    @property
+    def pid(self):
+        return self._proc.pid if self._proc is not None else None
+
+    @property
+    def returncode(self):
+        return self._proc.poll() if self._proc is not None else None
+
+    def is_running(self):
+        return self._proc is not None and self._proc.poll() is None
+
+    def is_ready(self):
+        return self.ready_at is not None and self.is_running()
+
+    def wait_until_ready(self, timeout=None):
+        """
+        :param timeout: float / None, seconds
+        :return: bool, whether the server is up (False if it exited or timeout passed first)
+        """
+        self._ready.wait(timeout)
+        return self.is_ready()
+
+    def send_command(self, command):
+        """
+        Types a command into the server's console, e.g. "say hi", "save-all"
+        :param command: string
+        :return: None
+        """
+        if not self.is_running():
+            raise RuntimeError("Server isn't running")
+
+        self._proc.stdin.write(command.encode("utf-8") + b"\n")
+        self._proc.stdin.flush()
+
+    def wait(self, timeout=None):
+        """
+        :param timeout: float / None, seconds
+        :return: int, exit code
+        """
+        returncode = self._proc.wait(timeout)
+        if self._reader is not None:
+            self._reader.join()
+        return returncode
+
+    def stop(self, timeout=30):
+        """
+        Stops the server with its "stop" command (saving the world), terminating then killing it if it takes longer
+        than timeout
+        :param timeout: float, seconds
+        :return: int / None, exit code (None if it was never started)
+        """
+        if self._proc is None:
+            return None
+
+        if self.is_running():
+            try:
+                self.send_command("stop")
+            except (OSError, RuntimeError):
+                pass
+
+            try:
+                return self.wait(timeout)
+            except subprocess.TimeoutExpired:
+                logger.warning("Server: {} didn't stop in {}s, terminating it".format(self.pid, timeout))
+                self._proc.terminate()
+
+            try:
+                return self.wait(10)
+            except subprocess.TimeoutExpired:
+                logger.warning("Killing server: {}".format(self.pid))
+                self._proc.kill()
+
+        return self.wait()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+def accept_eula(gamedir):
+    """
+    Writes eula.txt, servers don't start until the Minecraft EULA (https://aka.ms/MinecraftEULA) is accepted
+    :param gamedir: string
+    :return: None
+    """
+    os.makedirs(gamedir, exist_ok=True)
+    with open(os.path.join(gamedir, "eula.txt"), 'w') as f:
+        f.write("eula=true\n")
+
+
+def launch_server(serverdir, gamedir, javapath, memory, libdir, eula=False, on_line=None, placement=None, **kwargs):
+    """
+    Starts a dedicated server instance
+    :param serverdir: string, see build_server_commands
+    :param gamedir: string, this instance's working directory
+    :param javapath: string / None
+    :param memory: int, megabytes
+    :param libdir: string
+    :param eula: bool, whether to accept the Minecraft EULA on the instance's behalf
+    :param on_line: callable(string) / None, see ServerProcess
+    :param placement: Placement / None, CPUs / limits to run it with (see mc_launcher_core.placement)
+    :param kwargs: passed to build_server_commands
+    :return: ServerProcess, started
+    """
+    from mc_launcher_core.placement import get_host_resources, place_commands
+
+    if eula:
+        accept_eula(gamedir)
+
+    if placement is not None:
+        kwargs.setdefault("host", get_host_resources(placement))
+
+    commands = place_commands(build_server_commands(serverdir, javapath, memory, libdir, **kwargs), placement)
+    return ServerProcess(commands, gamedir, on_line).start()
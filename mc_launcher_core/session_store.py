@@ -0,0 +1,167 @@
+"""
+On-disk cache of authentication sessions (access tokens and profiles), so a session can be validated / refreshed
+instead of logging in with the password every time. THE PASSWORD IS NOT STORED.
+
+The store file is only ever readable by its owner (0600)
+"""
+import os
+import json
+import time
+import logging
+import threading
+import contextlib
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+logger = logging.getLogger(__name__)
+
+
+def _default_store_path():
+    return os.path.join(
+        os.environ.get("XDG_CONFIG_HOME") or os.path.join(os.path.expanduser("~"), ".config"),
+        "mc_launcher_core",
+        "sessions.json"
+    )
+
+
+class StoredSession:
+    """
+    A cached session for a single account
+    """
+    def __init__(self, username, client_token, access_token, selected_profile, available_profiles, user_id=None, obtained_at=None, validated_at=None):
+        self.username = username
+        self.client_token = client_token
+        self.access_token = access_token
+        self.selected_profile = selected_profile  # dict, raw profile from the auth response
+        self.available_profiles = available_profiles  # list<dict>
+        self.user_id = user_id
+        self.obtained_at = obtained_at if obtained_at is not None else time.time()
+        self.validated_at = validated_at if validated_at is not None else self.obtained_at
+
+    def to_dict(self):
+        return dict(
+            client_token=self.client_token,
+            access_token=self.access_token,
+            selected_profile=self.selected_profile,
+            available_profiles=self.available_profiles,
+            user_id=self.user_id,
+            obtained_at=self.obtained_at,
+            validated_at=self.validated_at
+        )
+
+
+def make_stored_session(username, res, client_token=None):
+    """
+    Constructs a StoredSession from an authenticate / refresh response
+    :param username: string
+    :param res: dict, response JSON
+    :param client_token: string / None, used if the response doesn't include one
+    :return: StoredSession
+    """
+    return StoredSession(
+        username,
+        res.get("clientToken") or client_token,
+        res["accessToken"],
+        res["selectedProfile"],
+        res.get("availableProfiles") or [res["selectedProfile"]],
+        (res.get("user") or dict()).get("id")
+    )
+
+
+class SessionStore:
+    """
+    A JSON file of StoredSessions keyed by username
+    """
+    def __init__(self, path=None, trust_for=300):
+        """
+        :param path: string / None, defaults to ~/.config/mc_launcher_core/sessions.json
+        :param trust_for: int, seconds after a session was last validated that it's used without validating it again
+        """
+        self.path = path or _default_store_path()
+        self.trust_for = trust_for
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """
+        Locks the store against other threads and processes
+        """
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            fd = os.open(self.path + ".lock", os.O_CREAT | os.O_RDWR, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                yield
+            finally:
+                os.close(fd)
+
+    def _read(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return dict()
+        except ValueError:
+            logger.warning("Session store at: {} is corrupt, ignoring it".format(self.path))
+            return dict()
+
+    def _write(self, data):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = "{}.{}.tmp".format(self.path, os.getpid())
+
+        fd = os.open(tmp_path, os.O_CREAT | os.O_WRONLY | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            if hasattr(os, "fchmod"):
+                os.fchmod(f.fileno(), 0o600)  # in case the tmp file already existed
+            json.dump(data, f)
+
+        os.replace(tmp_path, self.path)
+
+    def get(self, username):
+        """
+        :param username: string
+        :return: StoredSession / None
+        """
+        with self._locked():
+            d = self._read().get(username)
+
+        if d is None:
+            return None
+
+        return StoredSession(username, **d)
+
+    def put(self, session):
+        """
+        :param session: StoredSession
+        :return: None
+        """
+        with self._locked():
+            data = self._read()
+            data[session.username] = session.to_dict()
+            self._write(data)
+
+    def remove(self, username):
+        """
+        :param username: string
+        :return: None
+        """
+        with self._locked():
+            data = self._read()
+            if data.pop(username, None) is not None:
+                self._write(data)
+
+    def is_trusted(self, session):
+        """
+        Whether session was validated recently enough to skip validating it
+        :param session: StoredSession
+        :return: bool
+        """
+        return time.time() - session.validated_at < self.trust_for
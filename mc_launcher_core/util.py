@@ -2,10 +2,8 @@ import posixpath
 import platform
 import os.path
 import logging
-import zipfile
-import json
-import lzma
-from mc_launcher_core.web.util import get_download_url_path_for_minecraft_lib
+from mc_launcher_core.models import make_library, rules_allow, get_host_system
+from mc_launcher_core.profiles import resolve_profile, load_profile_libraries
 
 logger = logging.getLogger(__name__)
 
@@ -68,19 +66,7 @@ def do_get_library(rules):
     :param rules: list
     :return: bool
     """
-    if rules is None:
-        return True
-
-    action = "disallow"
-
-    for rule in rules:
-        if rule.get("os"):
-            if rule["os"]["name"] == platform.system().lower():
-                action = rule["action"]
-        else:
-            action = rule["action"]
-
-    return action == "allow"
+    return rules_allow(rules, get_host_system())
 
 
 def is_old_style_library(lib):
@@ -98,59 +84,63 @@ def is_old_style_library(lib):
 def get_lib_file_path(lib):
     """
     Gets a libraries file path (if it's installed at all)
-    :param lib: dict
+    :param lib: dict / Library
     :return: None / string
     """
-    if is_old_style_library(lib):
-        if lib.get("clientreq") is True:
-            # it's required here
-            return get_download_url_path_for_minecraft_lib(lib["name"])
+    if isinstance(lib, dict):
+        lib = make_library(lib)
 
-    if lib.get("rules") is None or (lib.get("rules") is not None and do_get_library(lib["rules"])):
-        # this one is supposed to be installed
-        if lib["downloads"].get("artifact"):
-            return lib["downloads"]["artifact"]["path"]
+    if lib is not None and lib.artifact is not None:
+        return lib.artifact.path
 
 
 def get_required_libraries_paths(bindir):
     """
-    Gets the required libraries for the minecraft in bindir (from the minecraft.json) for the hosts OS
+    Gets the required libraries for the minecraft in bindir (from its merged profile) for the hosts OS
     :param bindir: string
     :return: list<string>
     """
-    libs = []
-
     logger.info("Loading required libraries...")
-    with open(os.path.join(bindir, "minecraft.json")) as f:
-        libraries = json.load(f)["libraries"]
 
-    for lib in libraries:
-        x = get_lib_file_path(lib)
-        if x is not None:
-            libs.append(x)
-
-    return libs
+    return [
+        lib.artifact.path
+        for lib in load_profile_libraries(bindir)
+        if lib.artifact is not None
+    ]
 
 
 def get_minecraft_launch_details(bindir):
     """
-    Gets the required launch details for Minecraft
+    Gets the required launch details for Minecraft, from bindir's merged profile (see mc_launcher_core.profiles)
     :param bindir: string
-    :return: dict<classpath: string, args: string, version_id: string, logging_arg: string>
+    :return: dict<classpath: string, args: string, version_id: string, version_type: string, assets_index: string>
     """
-    file_to_get_details_from = "modloader.json" if os.path.isfile(os.path.join(bindir, "modloader.json")) else "minecraft.json"
-
-    with open(os.path.join(bindir, file_to_get_details_from)) as f:
-        j = json.load(f)
+    j = resolve_profile(bindir)
 
     return dict(
         classpath=j["mainClass"],
         args=j["minecraftArguments"],
         version_id=j["id"],
-        version_type=j["type"]
+        version_type=j["type"],
+        assets_index=j["fu_assets_index"]
     )
 
 
+def get_logging_config_path(assetsdir, profile):
+    """
+    Gets where the log4j config a profile's logging.client names is kept (<assetsdir>/log_configs/<id>, as Mojang's launcher
+    keeps them)
+    :param assetsdir: string
+    :param profile: dict, a (merged) version JSON
+    :return: string / None, None if the version doesn't have one
+    """
+    config = profile.get("logging", dict()).get("client")
+    if config is None:
+        return None
+
+    return os.path.join(assetsdir, "log_configs", config["file"]["id"])
+
+
 def java_esque_string_substitutor(s, **kwargs):
     """
     Substitutes in a java-style kwargs into s
@@ -184,6 +174,7 @@ def extract_file_to_directory(filepath, directory, exclude=()):
     :param exclude: list of things not to extract
     :return: None
     """
+    import zipfile
     with zipfile.ZipFile(filepath) as z:
         names = z.namelist()
 
@@ -201,6 +192,7 @@ def extract_xz_to_file(infile, outfile):
     :param outfile: string, path to wherever
     :return: None
     """
+    import lzma
     with lzma.open(infile) as f:
         with open(outfile, 'wb') as x:
             x.write(f.read())
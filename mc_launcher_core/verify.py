@@ -0,0 +1,105 @@
+"""
+Checking an install is complete and uncorrupted, without downloading anything
+"""
+import os
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from mc_launcher_core.profiles import get_profile_path, resolve_profile, load_profile_libraries, is_evicted, EVICTED_FILENAME
+from mc_launcher_core.web.util import verify_sha1
+
+
+logger = logging.getLogger(__name__)
+
+
+class Problem:
+    """
+    Something wrong with a file in an install
+    """
+    MISSING = "missing"
+    HASH_MISMATCH = "hash_mismatch"
+    EVICTED = "evicted"  # the install was evicted from the caches, its libraries and assets need downloading again
+
+    def __init__(self, path, kind):
+        self.path = path
+        self.kind = kind
+
+    def to_dict(self):
+        return dict(path=self.path, kind=self.kind)
+
+    def __repr__(self):
+        return "Problem(path={!r}, kind={!r})".format(self.path, self.kind)
+
+
+def _check(path, sha1):
+    """
+    :param path: string
+    :param sha1: string / None, only checks the file exists if None
+    :return: Problem / None
+    """
+    if not os.path.isfile(path):
+        return Problem(path, Problem.MISSING)
+    if sha1 is not None and not verify_sha1(path, sha1):
+        return Problem(path, Problem.HASH_MISMATCH)
+    return None
+
+
+def get_install_checks(bindir, libdir, assetsdir, mcversion):
+    """
+    Lists the files an install should have
+    :param bindir: string
+    :param libdir: string
+    :param assetsdir: string
+    :param mcversion: string
+    :return: list<tuple<path, sha1 / None>>
+    """
+    json_path = get_profile_path(bindir)
+    if not os.path.isfile(json_path):
+        return [(json_path, None)]
+
+    profile = resolve_profile(bindir)
+    client = profile.get("downloads", dict()).get("client", dict())
+
+    checks = [(profile["fu_client_jar"], client.get("sha1"))]
+
+    for lib in load_profile_libraries(bindir):
+        if lib.artifact is None:
+            continue
+        # repacked (pack.xz) libraries don't match the hash of what was downloaded
+        sha1 = None if lib.xz_unpack or lib.existence_guaranteed else lib.artifact.sha1
+        checks.append((os.path.join(libdir, *lib.artifact.path.split("/")), sha1))
+
+    index_path = os.path.join(assetsdir, "indexes", "{}.json".format(mcversion))
+    checks.append((index_path, None))
+
+    if os.path.isfile(index_path):
+        with open(index_path) as f:
+            objects = json.load(f)["objects"]
+
+        for asset in objects.values():
+            checks.append((os.path.join(assetsdir, "objects", asset["hash"][:2], asset["hash"]), asset["hash"]))
+
+    return checks
+
+
+def verify_install(bindir, libdir, assetsdir, mcversion, workers=None):
+    """
+    Checks every file of an install exists and has the right hash, in parallel
+    :param bindir: string
+    :param libdir: string
+    :param assetsdir: string
+    :param mcversion: string
+    :param workers: int / None, threads used for hashing
+    :return: tuple<int, list<Problem>>, number of files checked and the problems found
+    """
+    checks = get_install_checks(bindir, libdir, assetsdir, mcversion)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        problems = [p for p in pool.map(lambda c: _check(*c), checks) if p is not None]
+
+    if is_evicted(bindir):
+        problems.insert(0, Problem(os.path.join(bindir, EVICTED_FILENAME), Problem.EVICTED))
+
+    logger.info("Checked {} files, found {} problems".format(len(checks), len(problems)))
+
+    return len(checks), problems
@@ -1,14 +1,21 @@
 import os.path
 import json
+import contextlib
+import time
 import logging
-import platform
 from urllib.error import HTTPError, URLError
-from urllib.request import Request, urlopen
-from mc_launcher_core.exceptions import InvalidLoginError, InvalidMinecraftVersionError
-from mc_launcher_core.web.install import save_minecraft_jar, save_minecraft_lib, save_minecraft_asset
+from mc_launcher_core.exceptions import InvalidLoginError, InvalidMinecraftVersionError, RateLimitedError
+from mc_launcher_core.models import load_libraries
+from mc_launcher_core.web.install import save_minecraft_jar, save_minecraft_server_jar, save_minecraft_lib, save_minecraft_asset, save_logging_config
+from mc_launcher_core.web.transfer import get_default_policy
 from mc_launcher_core.web.util import chunked_file_download, get_download_url_path_for_minecraft_lib, verify_sha1
 
 MINECRAFT_VERSION_MANIFEST_URL = "https://launchermeta.mojang.com/mc/game/version_manifest.json"
+AUTHSERVER_URL = "https://authserver.mojang.com"
+AUTHENTICATION_URL = AUTHSERVER_URL + "/authenticate"
+VALIDATE_URL = AUTHSERVER_URL + "/validate"
+REFRESH_URL = AUTHSERVER_URL + "/refresh"
+AUTHENTICATION_HEADERS = {'Content-type': 'application/json', 'Accept': 'text/plain'}
 
 
 logger = logging.getLogger(__name__)
@@ -16,19 +23,15 @@ logger = logging.getLogger(__name__)
 _minecraft_versions_maybe = None  # this is populated after the first attempt to access. Access using get_available_minecraft_versions()
 
 
-def authenticate_user(username, password, request_user_data=False, client_token=None):
+def make_authentication_payload(username, password, request_user_data=False, client_token=None):
     """
-    Gets client access token and clientToken.
-    See: http://wiki.vg/Authentication#Response
+    Makes the JSON payload for an authentication request
     :param username: string
     :param password: string
-    :param request_user_data: bool, whether or not to get extra client info in the response payload
-    :param client_token: string, should only ever be None on first run, otherwise it should be saved and specified.
-    :return: json data
+    :param request_user_data: bool
+    :param client_token: string / None
+    :return: dict
     """
-    AUTHENTICATION_URL = "https://authserver.mojang.com/authenticate"
-    HEADERS = {'Content-type': 'application/json', 'Accept': 'text/plain'}
-
     payload = dict(
         agent=dict(
             name="Minecraft",
@@ -42,37 +45,164 @@ def authenticate_user(username, password, request_user_data=False, client_token=
     if client_token is not None:
         payload["clientToken"] = client_token
 
+    return payload
+
+
+def parse_retry_after(value):
+    """
+    Parses a Retry-After header
+    :param value: string / None, either a number of seconds or an HTTP date
+    :return: float / None, seconds to wait
+    """
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    import email.utils
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    return max(0.0, when.timestamp() - time.time())
+
+
+def _raise_for_auth_error(ex):
+    """
+    Converts auth server HTTP errors into exceptions
+    :param ex: HTTPError
+    :return: None
+    """
+    if ex.code == 429:
+        retry_after = parse_retry_after(ex.headers.get("Retry-After") if ex.headers else None)
+        logger.warning("Rate limited by the auth server (retry after: {})".format(retry_after))
+        raise RateLimitedError(retry_after)
+
+    logger.error("An HTTP error occurred (code: {})".format(ex.code))
+    raise ex
+
+
+def authenticate_user(username, password, request_user_data=False, client_token=None, authserver=None):
+    """
+    Gets client access token and clientToken.
+    See: http://wiki.vg/Authentication#Response
+    :param username: string
+    :param password: string
+    :param request_user_data: bool, whether or not to get extra client info in the response payload
+    :param client_token: string, should only ever be None on first run, otherwise it should be saved and specified.
+    :param authserver: string / None, base URL of the auth server, defaults to AUTHSERVER_URL
+    :return: json data
+    """
+    from urllib.request import Request, urlopen
+    payload = make_authentication_payload(username, password, request_user_data, client_token)
+
     request = Request(
-        AUTHENTICATION_URL,
+        authserver + "/authenticate" if authserver else AUTHENTICATION_URL,
         data=json.dumps(payload).encode('utf-8'),
-        headers=HEADERS
+        headers=AUTHENTICATION_HEADERS
     )
 
     try:
-        return json.loads(urlopen(request).read().decode('utf-8'))
+        return json.loads(urlopen(request, timeout=get_default_policy().read_timeout).read().decode('utf-8'))
     except HTTPError as ex:
         if ex.code == 403:
             # invalid login details
             logger.warning("Login details are invalid")
             raise InvalidLoginError()
-        logger.error("An HTTP error occurred (code: {})".format(ex.code))
-        raise
+        _raise_for_auth_error(ex)
     except URLError as ex:
         if ex.errno == 11001:
             logger.error("Login failed due to URLError 11001. This can happen when the device is not connected to the internet.")
         raise
 
 
-def get_available_minecraft_versions():
+def _post_json(url, payload):
+    """
+    POSTs payload to one of the auth server endpoints
+    :param url: string
+    :param payload: dict
+    :return: dict / None (if there was no response body)
+    """
+    from urllib.request import Request, urlopen
+    request = Request(
+        url,
+        data=json.dumps(payload).encode('utf-8'),
+        headers=AUTHENTICATION_HEADERS
+    )
+
+    body = urlopen(request, timeout=get_default_policy().read_timeout).read().decode('utf-8')
+    return json.loads(body) if body else None
+
+
+def validate_token(access_token, client_token=None, authserver=None):
+    """
+    Checks whether an access token can still be used to join servers (this is much cheaper than logging in again)
+    See: http://wiki.vg/Authentication#Validate
+    :param access_token: string
+    :param client_token: string / None
+    :param authserver: string / None, base URL of the auth server, defaults to AUTHSERVER_URL
+    :return: bool
+    """
+    payload = dict(accessToken=access_token)
+    if client_token is not None:
+        payload["clientToken"] = client_token
+
+    try:
+        _post_json(authserver + "/validate" if authserver else VALIDATE_URL, payload)
+        return True
+    except HTTPError as ex:
+        if ex.code == 403:
+            return False
+        _raise_for_auth_error(ex)
+
+
+def refresh_token(access_token, client_token, request_user_data=False, authserver=None):
+    """
+    Swaps an access token for a new one without the password
+    See: http://wiki.vg/Authentication#Refresh
+    :param access_token: string
+    :param client_token: string, must be the same client token the access token was obtained with
+    :param request_user_data: bool
+    :param authserver: string / None, base URL of the auth server, defaults to AUTHSERVER_URL
+    :return: json data
+    """
+    payload = dict(
+        accessToken=access_token,
+        clientToken=client_token,
+        requestUser=request_user_data
+    )
+
+    try:
+        return _post_json(authserver + "/refresh" if authserver else REFRESH_URL, payload)
+    except HTTPError as ex:
+        if ex.code == 403:
+            logger.warning("Access token can't be refreshed")
+            raise InvalidLoginError()
+        _raise_for_auth_error(ex)
+
+
+def get_available_minecraft_versions(policy=None):
     """
     Gets the list of all available Minecraft versions
+    :param policy: TransferPolicy / None, retry / timeout policy for the request
     :return: dict<see JSON at URL>
     """
     global _minecraft_versions_maybe
     if _minecraft_versions_maybe is None:
-        request = Request(MINECRAFT_VERSION_MANIFEST_URL)
+        if policy is None:
+            policy = get_default_policy()
+
+        from urllib.request import Request, urlopen
         try:
-            _minecraft_versions_maybe = json.loads(urlopen(request).read().decode('utf-8'))
+            data = policy.call(
+                MINECRAFT_VERSION_MANIFEST_URL,
+                lambda: urlopen(Request(MINECRAFT_VERSION_MANIFEST_URL), timeout=policy.read_timeout).read()
+            )
+            _minecraft_versions_maybe = json.loads(data.decode('utf-8'))
             return _minecraft_versions_maybe
         except HTTPError as ex:
             logger.error("An HTTP error occurred (code: {})".format(ex.code))
@@ -85,13 +215,15 @@ def get_available_minecraft_versions():
         return _minecraft_versions_maybe
 
 
-def save_minecraft_libs(libdir, nativesdir, libraries, raise_on_hash_mismatch=False):
+def save_minecraft_libs(libdir, nativesdir, libraries, raise_on_hash_mismatch=False, policy=None, endpoints=None):
     """
     Saves the library files into libdir, based off minecraft.json in bindir
     :param libdir: string
     :param nativesdir: string, where to put natives
-    :param libraries: list<library>
+    :param libraries: list<dict>, "libraries" from minecraft.json
     :param raise_on_hash_mismatch: bool, whether to raise an exception when hashes don't match
+    :param policy: TransferPolicy / None, retry / timeout policy for the downloads
+    :param endpoints: Endpoints / None, where to download from (mirrors first)
     :return: None
     """
     '''
@@ -110,18 +242,18 @@ def save_minecraft_libs(libdir, nativesdir, libraries, raise_on_hash_mismatch=Fa
         logger.debug("Determined Download URL for old-style lib: {} to be: {}".format(lib["name"], url))
     '''
 
-    system = platform.system().lower()
-
-    for lib in libraries:
-        save_minecraft_lib(lib, libdir, nativesdir, raise_on_hash_mismatch)
+    for lib in load_libraries(libraries):
+        save_minecraft_lib(lib, libdir, nativesdir, raise_on_hash_mismatch, policy, endpoints)
 
 
-def save_minecraft_assets(assets_index_path, assetsdir, raise_on_hash_mismatch=False):
+def save_minecraft_assets(assets_index_path, assetsdir, raise_on_hash_mismatch=False, policy=None, endpoints=None):
     """
     Checks if the assets are there, if not, download them
     :param assets_index_path: string, path to the assets index file
     :param assetsdir: string, path to assets directory
     :param raise_on_hash_mismatch: bool
+    :param policy: TransferPolicy / None, retry / timeout policy for the downloads
+    :param endpoints: Endpoints / None, where to download from (mirrors first)
     :return: None
     """
     with open(assets_index_path, 'r') as f:
@@ -129,35 +261,46 @@ def save_minecraft_assets(assets_index_path, assetsdir, raise_on_hash_mismatch=F
 
     for asset in assets_index["objects"].keys():
         # download assets, see: http://wiki.vg/Game_files
-        save_minecraft_asset(assets_index["objects"][asset], asset, assetsdir, raise_on_hash_mismatch)
+        save_minecraft_asset(assets_index["objects"][asset], asset, assetsdir, raise_on_hash_mismatch, policy, endpoints)
 
 
-def download_minecraft_bin(bindir, mcversion, raise_on_hash_mismatch=False):
+def get_version_manifest_entry(mcversion, policy=None):
+    """
+    Finds a version in the version manifest
+    :param mcversion: string
+    :param policy: TransferPolicy / None
+    :return: dict<id, type, url, ...>
+    """
+    logger.debug("Searching for version data")
+    manifest = get_available_minecraft_versions(policy)
+
+    for version in manifest["versions"]:
+        if version["id"] == mcversion:
+            logger.debug("Found Minecraft version data")
+            return version
+
+    logger.critical("Failed to file version data for Minecraft Version: {}".format(mcversion))
+    raise InvalidMinecraftVersionError(mcversion)
+
+
+def download_minecraft_bin(bindir, mcversion, raise_on_hash_mismatch=False, policy=None, endpoints=None):
     """
     Downloads minecraft.jar and minecraft.json into the Minecraft bin directory
     :param bindir: string, path to the bin directory
     :param mcversion: string, e.g. "1.7.10", "18w14b"
     :param raise_on_hash_mismatch: bool
+    :param policy: TransferPolicy / None, retry / timeout policy for the downloads
+    :param endpoints: Endpoints / None, where to download the jar from (mirrors first)
     :return: None
     """
     if not os.path.isfile(os.path.join(bindir, "minecraft.jar")) or not os.path.isfile(os.path.join(bindir, "minecraft.json")):
         logger.info("Failed to find minecraft.jar or minecraft.json, downloading one or both")
-        logger.debug("Searching for version data")
-        manifest = get_available_minecraft_versions()
-
-        for version in manifest["versions"]:
-            if version["id"] == mcversion:
-                logger.debug("Found Minecraft version data")
-                version_data = version
-                break
-        else:
-            logger.critical("Failed to file version data for Minecraft Version: {}".format(mcversion))
-            raise InvalidMinecraftVersionError(mcversion)
+        version = get_version_manifest_entry(mcversion, policy)
 
         # save the minecraft json
         if not os.path.isfile(os.path.join(bindir, "minecraft.json")):
             logger.info("Saving Minecraft JSON")
-            chunked_file_download(version["url"], os.path.join(bindir, 'minecraft.json'))
+            chunked_file_download(version["url"], os.path.join(bindir, 'minecraft.json'), policy=policy)
 
         with open(os.path.join(bindir, "minecraft.json"), 'r') as f:
             hash = json.load(f)["downloads"]["client"]["sha1"]
@@ -165,10 +308,45 @@ def download_minecraft_bin(bindir, mcversion, raise_on_hash_mismatch=False):
         # save the minecraft jar
         if not os.path.isfile(os.path.join(bindir, "minecraft.jar")):
             logger.info("Saving Minecraft jar...")
-            save_minecraft_jar(mcversion, os.path.join(bindir, 'minecraft.jar'), hash, raise_on_hash_mismatch)
+            save_minecraft_jar(mcversion, os.path.join(bindir, 'minecraft.jar'), hash, raise_on_hash_mismatch, policy, endpoints)
+
+
+def download_minecraft_server(serverdir, mcversion, libdir, policy=None, endpoints=None, registry=None):
+    """
+    Saves a dedicated server: minecraft.json and server.jar (verified against its sha1) into serverdir. Bundled servers
+    (1.18+) have their libraries unpacked into libdir, shared with clients and other servers, see mc_launcher_core.server
+    :param serverdir: string, path, one per version (instances each get their own game directory)
+    :param mcversion: string, e.g. "1.20.1"
+    :param libdir: string, path
+    :param policy: TransferPolicy / None
+    :param endpoints: Endpoints / None, mirrors to try before Mojang's servers
+    :param registry: CacheRegistry / None, registers the server (so cache collection keeps its libraries)
+    :return: None
+    """
+    from mc_launcher_core.server import SERVER_JAR_FILENAME, unpack_server_bundle
 
+    logger.info("Installing Minecraft server version: '{}' with serverdir: '{}', libdir: '{}'".format(mcversion, serverdir, libdir))
 
-def download_minecraft(bindir, assetsdir, libdir, nativesdir, mcversion, raise_on_hash_mismatch=False):
+    with (registry.using() if registry is not None else contextlib.nullcontext()):
+        json_path = os.path.join(serverdir, "minecraft.json")
+        if not os.path.isfile(json_path):
+            logger.info("Saving Minecraft JSON")
+            chunked_file_download(get_version_manifest_entry(mcversion, policy)["url"], json_path, policy=policy)
+
+        with open(json_path) as f:
+            download = json.load(f).get("downloads", dict()).get("server")
+
+        if download is None:
+            raise InvalidMinecraftVersionError(mcversion, "Minecraft version: {} has no dedicated server".format(mcversion))
+
+        save_minecraft_server_jar(mcversion, os.path.join(serverdir, SERVER_JAR_FILENAME), download, policy, endpoints)
+        unpack_server_bundle(serverdir, libdir)
+
+        if registry is not None:
+            registry.register(serverdir, mcversion)
+
+
+def download_minecraft(bindir, assetsdir, libdir, nativesdir, mcversion, raise_on_hash_mismatch=False, policy=None, endpoints=None, registry=None):
     """
     Saves all of the files required for Minecraft to run
     :param bindir: string, path
@@ -177,40 +355,52 @@ def download_minecraft(bindir, assetsdir, libdir, nativesdir, mcversion, raise_o
     :param nativesdir: string, path to the where natives should be saved (usually <bindir>/natives)
     :param mcversion: string, e.g. "1.7.10", "18w14b"
     :param raise_on_hash_mismatch: bool
+    :param policy: TransferPolicy / None, retry / timeout policy for all of the downloads in this install
+    :param endpoints: Endpoints / None, where to download from, e.g. Endpoints.with_mirrors(["http://10.0.0.5:8750/"])
+    :param registry: CacheRegistry / None, registers the install (so cache collection keeps its files) and holds its cache lock while installing
     :return: None
     """
     logger.info("Installing Minecraft version: '{}' with bindir: '{}', assetsdir: '{}', libdir: '{}', raise_on_hash_mismatch: '{}'".format(mcversion, bindir, assetsdir, libdir, raise_on_hash_mismatch))
 
-    logger.info("Installing Binaries and core data...")
-    download_minecraft_bin(bindir, mcversion, raise_on_hash_mismatch)
+    with (registry.using() if registry is not None else contextlib.nullcontext()):
+        logger.info("Installing Binaries and core data...")
+        download_minecraft_bin(bindir, mcversion, raise_on_hash_mismatch, policy, endpoints)
 
-    logger.info("Loading Minecraft data")
-    # save libraries
-    with open(os.path.join(bindir, 'minecraft.json')) as f:
-        minecraft_data = json.load(f)
+        logger.info("Loading Minecraft data")
+        # save libraries
+        with open(os.path.join(bindir, 'minecraft.json')) as f:
+            minecraft_data = json.load(f)
 
-    logger.info("Saving Minecraft libraries")
-    save_minecraft_libs(libdir, nativesdir, minecraft_data["libraries"], raise_on_hash_mismatch)
+        logger.info("Saving Minecraft libraries")
+        save_minecraft_libs(libdir, nativesdir, minecraft_data["libraries"], raise_on_hash_mismatch, policy, endpoints)
 
-    assets_index_path = os.path.join(
-        assetsdir,
-        "indexes",
-        "{}.json".format(mcversion)  # Minecraft will look for this using the --assetIndex flag specified, for compliance <mcversion> should be specified there
-    )
+        assets_index_path = os.path.join(
+            assetsdir,
+            "indexes",
+            "{}.json".format(mcversion)  # Minecraft will look for this using the --assetIndex flag specified, for compliance <mcversion> should be specified there
+        )
 
-    if not os.path.isfile(assets_index_path):
-        logger.info("Saving assets index into: {}".format(assets_index_path))
-        # download assets index
-        chunked_file_download(
-            minecraft_data["assetIndex"]["url"],
-            assets_index_path
+        if not os.path.isfile(assets_index_path):
+            logger.info("Saving assets index into: {}".format(assets_index_path))
+            # download assets index
+            chunked_file_download(
+                minecraft_data["assetIndex"]["url"],
+                assets_index_path,
+                policy=policy
+            )
+
+        save_minecraft_assets(
+            assets_index_path,
+            assetsdir,
+            raise_on_hash_mismatch,
+            policy,
+            endpoints
         )
 
-    save_minecraft_assets(
-        assets_index_path,
-        assetsdir,
-        raise_on_hash_mismatch
-    )
+        save_logging_config(assetsdir, minecraft_data, policy)
+
+        if registry is not None:
+            registry.register(bindir, mcversion)
 
     return
 
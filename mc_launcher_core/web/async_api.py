@@ -0,0 +1,526 @@
+"""
+asyncio-native variants of the install and auth APIs
+
+Every function takes an optional AsyncHTTPClient, pass one in to share its connection pool (and limits) between
+many concurrent installs / logins. Downloads are retried according to the client's TransferPolicy. Blocking work (hashing, extracting, unpacking) is run in the default executor.
+Cancelling a task stops its downloads, and partially downloaded files are removed (files are downloaded to a temporary
+path and moved into place once complete)
+"""
+import os
+import json
+import uuid
+import asyncio
+import hashlib
+import logging
+import functools
+import contextlib
+from urllib.error import HTTPError, URLError
+import mc_launcher_core.web as web
+import mc_launcher_core.forge_utils.web as forge_web
+from mc_launcher_core.exceptions import InvalidLoginError, InvalidMinecraftVersionError, HashMatchError, CircuitOpenError
+from mc_launcher_core.models import load_libraries
+from mc_launcher_core.util import get_logging_config_path
+from mc_launcher_core.web.async_http import AsyncHTTPClient
+from mc_launcher_core.web.transfer import get_default_policy
+from mc_launcher_core.web.util import verify_sha1, get_tmp_path
+from mc_launcher_core.web.endpoints import get_default_endpoints
+from mc_launcher_core.web import install
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 16  # files downloaded at once by a single install
+
+
+@contextlib.asynccontextmanager
+async def _client_or_default(client):
+    if client is not None:
+        yield client
+    else:
+        async with AsyncHTTPClient() as client:
+            yield client
+
+
+async def _run_blocking(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(None, functools.partial(func, *args))
+
+
+async def _run_bounded(coroutine_function, items, concurrency):
+    """
+    Runs coroutine_function(item) for all items with at most <concurrency> running at once.
+    If one fails, the rest are cancelled and the exception is raised
+    :param coroutine_function: async callable
+    :param items: iterable
+    :param concurrency: int
+    :return: None
+    """
+    iterator = iter(items)
+
+    async def worker():
+        for item in iterator:
+            await coroutine_function(item)
+
+    workers = [asyncio.ensure_future(worker()) for _ in range(max(1, concurrency))]
+    try:
+        await asyncio.gather(*workers)
+    except BaseException:
+        for w in workers:
+            w.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        raise
+
+
+async def authenticate_user(username, password, request_user_data=False, client_token=None, client=None):
+    """
+    Gets client access token and clientToken.
+    See: http://wiki.vg/Authentication#Response
+    :param username: string
+    :param password: string
+    :param request_user_data: bool, whether or not to get extra client info in the response payload
+    :param client_token: string, should only ever be None on first run, otherwise it should be saved and specified.
+    :param client: AsyncHTTPClient / None
+    :return: json data
+    """
+    payload = web.make_authentication_payload(username, password, request_user_data, client_token)
+
+    async with _client_or_default(client) as client:
+        try:
+            body = await client.fetch(
+                "POST",
+                web.AUTHENTICATION_URL,
+                json.dumps(payload).encode('utf-8'),
+                web.AUTHENTICATION_HEADERS
+            )
+        except HTTPError as ex:
+            if ex.code == 403:
+                # invalid login details
+                logger.warning("Login details are invalid")
+                raise InvalidLoginError()
+            web._raise_for_auth_error(ex)
+
+    return json.loads(body.decode('utf-8'))
+
+
+async def get_available_minecraft_versions(client=None):
+    """
+    Gets the list of all available Minecraft versions (shares the cache with web.get_available_minecraft_versions)
+    :param client: AsyncHTTPClient / None
+    :return: dict<see JSON at URL>
+    """
+    if web._minecraft_versions_maybe is None:
+        async with _client_or_default(client) as client:
+            body = await client.fetch("GET", web.MINECRAFT_VERSION_MANIFEST_URL)
+        web._minecraft_versions_maybe = json.loads(body.decode('utf-8'))
+
+    return web._minecraft_versions_maybe
+
+
+async def chunked_download(url, stream, chunk_size=(16*1024), client=None, policy=None, sha1=None):
+    """
+    download from URL in chunks, and write to a stream. Failed attempts are retried according to policy
+    :param url: string
+    :param stream: File / writable (seekable, so failed attempts can be thrown away)
+    :param chunk_size: int, size of chunks to read
+    :param client: AsyncHTTPClient / None
+    :param policy: TransferPolicy / None, defaults to the client's policy, then the process-wide policy
+    :param sha1: string / None, expected sha1 of the content, a mismatch raises HashMatchError (and is retried)
+    :return: None
+    """
+    async with _client_or_default(client) as client:
+        policy = policy or client.policy or get_default_policy()
+        start = stream.tell()
+
+        attempt = 0
+        while True:
+            attempt += 1
+            trial = policy.before_request(url)
+
+            stream.seek(start)
+            stream.truncate()
+            hasher = hashlib.sha1() if sha1 is not None else None
+
+            try:
+                async with client.stream("GET", url) as response:
+                    async for chunk in response.iter_chunks(chunk_size):
+                        if policy.bandwidth is not None:
+                            delay = policy.bandwidth.reserve(len(chunk))
+                            if delay > 0:
+                                await asyncio.sleep(delay)
+                        if hasher is not None:
+                            hasher.update(chunk)
+                        stream.write(chunk)
+
+                if hasher is not None and hasher.hexdigest() != sha1:
+                    raise HashMatchError(url, "download", "Hash of: {} is {}, expected: {}".format(url, hasher.hexdigest(), sha1))
+            except Exception as ex:
+                policy.record_failure(url, ex)
+
+                delay = policy.retry_delay(attempt, ex)
+                if delay is None:
+                    raise
+
+                logger.info("Download of: {} failed ({!r}), retrying in {:.2f}s (attempt: {})".format(url, ex, delay, attempt))
+            else:
+                policy.record_success(url)
+                return
+            finally:
+                policy.end_request(url, trial)
+
+            await asyncio.sleep(delay)
+
+
+async def chunked_file_download(url, path, chunk_size=(16*1024), makedirs=True, client=None, policy=None, sha1=None):
+    """
+    download from URL in chunks, and write to a file. It's downloaded to a temporary file that replaces path once
+    complete (and verified), the temporary file is removed if the download fails or is cancelled
+    :param url: string
+    :param path: string, absolute path to file
+    :param chunk_size: int, size of chunks to read
+    :param makedirs: bool, whether or not to make the directories required for this file
+    :param client: AsyncHTTPClient / None
+    :param policy: TransferPolicy / None
+    :param sha1: string / None, expected sha1 of the file, a mismatch raises HashMatchError (and is retried)
+    :return: None
+    """
+    if makedirs:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    tmp_path = get_tmp_path(path)
+    try:
+        with open(tmp_path, 'wb') as f:
+            await chunked_download(url, f, chunk_size, client, policy, sha1)
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+
+
+async def download_from_first_available(urls, path, client=None, policy=None, sha1=None):
+    """
+    Downloads path from the first URL in urls that works
+    :param urls: list<string>
+    :param path: string
+    :param client: AsyncHTTPClient / None
+    :param policy: TransferPolicy / None
+    :param sha1: string / None
+    :return: string, the URL it was downloaded from
+    """
+    last_error = None
+
+    for url in urls:
+        try:
+            await chunked_file_download(url, path, client=client, policy=policy, sha1=sha1)
+            return url
+        except (URLError, CircuitOpenError, HashMatchError, OSError) as ex:
+            logger.debug("Failed to download: {} ({!r}), trying next source".format(url, ex))
+            last_error = ex
+
+    raise last_error
+
+
+async def download_verified(urls, path, sha1, raise_on_hash_mismatch=False, client=None):
+    """
+    Downloads path from the first source with a copy matching sha1, like install.download_verified
+    :param urls: list<string>
+    :param path: string
+    :param sha1: string / None
+    :param raise_on_hash_mismatch: bool
+    :param client: AsyncHTTPClient / None
+    :return: string, the URL it was downloaded from
+    """
+    try:
+        return await download_from_first_available(urls, path, client, sha1=sha1)
+    except HashMatchError:
+        if raise_on_hash_mismatch or sha1 is None:
+            raise
+        logger.warning("No source has a copy of: {} matching sha1: {}".format(path, sha1))
+        return await download_from_first_available(urls, path, client)
+
+
+async def save_minecraft_jar(mcversion, path, hash=None, raise_on_hash_mismatch=False, client=None, endpoints=None):
+    """
+    Downloads and saves the Minecraft.jar (from Mojang source) into path
+    :param mcversion: string, e.g. "1.7.10", "18w14b"
+    :param path: string, absolute path to the location where this file should be saved
+    :param hash: string, sha1 hash of the Jar file
+    :param raise_on_hash_mismatch: bool
+    :param client: AsyncHTTPClient / None
+    :param endpoints: Endpoints / None, where to download from (mirrors first), defaults to get_default_endpoints()
+    :return: None
+    """
+    urls = (endpoints or get_default_endpoints()).version_jar_urls(mcversion)
+
+    if os.path.isfile(path) and os.path.getsize(path) != 0 and (hash is None or await _run_blocking(verify_sha1, path, hash)):
+        return
+
+    logger.info("Downloading Minecraft.jar from URLs: {}...".format(urls))
+    try:
+        # corrupt downloads are retried by the policy
+        await download_from_first_available(urls, path, client, sha1=hash)
+    except HashMatchError:
+        logger.critical("Failed to download minecraft.jar. Hash of file doesn't match expected hash: '{}'".format(hash))
+
+        if raise_on_hash_mismatch:
+            raise
+        return
+
+    if not os.path.isfile(path) or os.path.getsize(path) == 0:
+        logger.critical("Failed to download Minecraft.jar")
+        raise Exception("Minecraft.jar not downloading correctly (file is either 0 bytes or non-existent)")
+
+
+async def save_minecraft_lib(lib, libdir, nativesdir, raise_on_hash_mismatch=False, client=None, endpoints=None):
+    """
+    Save a specific Minecraft lib
+    :param lib: Library / dict (library JSON format)
+    :param libdir: string
+    :param nativesdir: string, where to put natives
+    :param raise_on_hash_mismatch: bool, whether to raise an exception when hashes don't match
+    :param client: AsyncHTTPClient / None
+    :param endpoints: Endpoints / None, where to download from (mirrors first), defaults to get_default_endpoints()
+    :return: None
+    """
+    lib = install._as_library(lib)
+    if lib is None:
+        return
+
+    if endpoints is None:
+        endpoints = get_default_endpoints()
+
+    if lib.native is not None:
+        filepath = install.get_native_download_path(lib, nativesdir)
+        logger.debug("Downloading native to: '{}'".format(filepath))
+
+        await download_verified(
+            endpoints.library_urls(lib.native.artifact.path, lib.native.artifact.url),
+            filepath,
+            lib.native.artifact.sha1,
+            raise_on_hash_mismatch,
+            client
+        )
+        await _run_blocking(install.finish_native, lib, filepath)
+
+    filepath = install.get_artifact_download_path(lib, libdir)
+    if filepath is not None:
+        urls = endpoints.library_urls(lib.artifact.path, lib.artifact.url)
+        if lib.artifact.alt_url:
+            urls.append(lib.artifact.alt_url)
+
+        logger.info("Downloading artifact from: {} to: {}".format(urls, filepath))
+        # a .pack.xz only has the unpacked jar's hash, so it can't be verified as it downloads
+        url = await download_verified(urls, filepath, None if lib.xz_unpack else lib.artifact.sha1, raise_on_hash_mismatch, client)
+
+        await _run_blocking(
+            install.finish_artifact,
+            lib,
+            filepath,
+            url == lib.artifact.alt_url,
+            url in (lib.artifact.url, lib.artifact.alt_url)
+        )
+
+
+async def save_minecraft_libs(libdir, nativesdir, libraries, raise_on_hash_mismatch=False, client=None, concurrency=DEFAULT_CONCURRENCY, endpoints=None):
+    """
+    Saves the library files into libdir
+    :param libdir: string
+    :param nativesdir: string, where to put natives
+    :param libraries: list<dict>, "libraries" from minecraft.json
+    :param raise_on_hash_mismatch: bool, whether to raise an exception when hashes don't match
+    :param client: AsyncHTTPClient / None
+    :param concurrency: int, libraries downloaded at once
+    :param endpoints: Endpoints / None
+    :return: None
+    """
+    async with _client_or_default(client) as client:
+        await _run_bounded(
+            lambda lib: save_minecraft_lib(lib, libdir, nativesdir, raise_on_hash_mismatch, client, endpoints),
+            load_libraries(libraries),
+            concurrency
+        )
+
+
+async def save_minecraft_asset(asset, assetname, assetsdir, raise_on_hash_mismatch=False, client=None, endpoints=None):
+    """
+    Downloads an asset into the correct locations
+    :param asset: dict
+    :param assetname: string, name of asset
+    :param assetsdir: string
+    :param raise_on_hash_mismatch: bool, whether to raise if the hash doesn't match
+    :param client: AsyncHTTPClient / None
+    :param endpoints: Endpoints / None
+    :return: None
+    """
+    urls, filepath = install.get_asset_path(asset, assetsdir, endpoints)
+
+    if not os.path.isfile(filepath):
+        logger.debug("Downloading Asset from: {} to: {}".format(urls, filepath))
+        await download_verified(urls, filepath, asset["hash"], raise_on_hash_mismatch, client)
+
+    await _run_blocking(install.copy_legacy_asset, filepath, assetname, assetsdir)
+
+
+async def save_minecraft_assets(assets_index_path, assetsdir, raise_on_hash_mismatch=False, client=None, concurrency=DEFAULT_CONCURRENCY, endpoints=None):
+    """
+    Checks if the assets are there, if not, download them
+    :param assets_index_path: string, path to the assets index file
+    :param assetsdir: string, path to assets directory
+    :param raise_on_hash_mismatch: bool
+    :param client: AsyncHTTPClient / None
+    :param concurrency: int, assets downloaded at once
+    :param endpoints: Endpoints / None
+    :return: None
+    """
+    with open(assets_index_path, 'r') as f:
+        assets_index = json.load(f)
+
+    # indexes list some objects under several names, download each object once
+    by_hash = dict()  # hash -> tuple<asset, list<name>>
+    for name, asset in assets_index["objects"].items():
+        by_hash.setdefault(asset["hash"], (asset, []))[1].append(name)
+
+    async def save(item):
+        asset, names = item
+        await save_minecraft_asset(asset, names[0], assetsdir, raise_on_hash_mismatch, client, endpoints)
+
+        filepath = install.get_asset_path(asset, assetsdir)[1]
+        for name in names[1:]:
+            await _run_blocking(install.copy_legacy_asset, filepath, name, assetsdir)
+
+    async with _client_or_default(client) as client:
+        await _run_bounded(save, by_hash.values(), concurrency)
+
+
+async def download_minecraft_bin(bindir, mcversion, raise_on_hash_mismatch=False, client=None, endpoints=None):
+    """
+    Downloads minecraft.jar and minecraft.json into the Minecraft bin directory
+    :param bindir: string, path to the bin directory
+    :param mcversion: string, e.g. "1.7.10", "18w14b"
+    :param raise_on_hash_mismatch: bool
+    :param client: AsyncHTTPClient / None
+    :param endpoints: Endpoints / None
+    :return: None
+    """
+    json_path = os.path.join(bindir, "minecraft.json")
+    jar_path = os.path.join(bindir, "minecraft.jar")
+
+    if os.path.isfile(jar_path) and os.path.isfile(json_path):
+        return
+
+    logger.info("Failed to find minecraft.jar or minecraft.json, downloading one or both")
+
+    if not os.path.isfile(json_path):
+        manifest = await get_available_minecraft_versions(client)
+
+        for version in manifest["versions"]:
+            if version["id"] == mcversion:
+                break
+        else:
+            logger.critical("Failed to file version data for Minecraft Version: {}".format(mcversion))
+            raise InvalidMinecraftVersionError(mcversion)
+
+        logger.info("Saving Minecraft JSON")
+        await chunked_file_download(version["url"], json_path, client=client)
+
+    with open(json_path, 'r') as f:
+        hash = json.load(f)["downloads"]["client"]["sha1"]
+
+    if not os.path.isfile(jar_path):
+        logger.info("Saving Minecraft jar...")
+        await save_minecraft_jar(mcversion, jar_path, hash, raise_on_hash_mismatch, client, endpoints)
+
+
+async def save_logging_config(assetsdir, minecraft_data, client=None):
+    """
+    Downloads the log4j config the version JSON names into <assetsdir>/log_configs/ (see install.save_logging_config)
+    :param assetsdir: string
+    :param minecraft_data: dict, the version JSON
+    :param client: AsyncHTTPClient / None
+    :return: string / None, its path, None if the version doesn't have one
+    """
+    path = get_logging_config_path(assetsdir, minecraft_data)
+    if path is None:
+        return None
+
+    download = minecraft_data["logging"]["client"]["file"]
+    if os.path.isfile(path) and await _run_blocking(verify_sha1, path, download["sha1"]):
+        return path
+
+    logger.info("Saving log config into: {}".format(path))
+    await chunked_file_download(download["url"], path, client=client)
+
+    if not await _run_blocking(verify_sha1, path, download["sha1"]):
+        os.remove(path)
+        raise HashMatchError(path, "log_config", "Log config: {} doesn't match sha1: {}".format(path, download["sha1"]))
+
+    return path
+
+
+async def download_minecraft(bindir, assetsdir, libdir, nativesdir, mcversion, raise_on_hash_mismatch=False, client=None, concurrency=DEFAULT_CONCURRENCY, endpoints=None):
+    """
+    Saves all of the files required for Minecraft to run. Libraries and assets are downloaded concurrently
+    :param bindir: string, path
+    :param assetsdir: string, path
+    :param libdir: string, path (usually <assetsdir>/../libraries
+    :param nativesdir: string, path to the where natives should be saved (usually <bindir>/natives)
+    :param mcversion: string, e.g. "1.7.10", "18w14b"
+    :param raise_on_hash_mismatch: bool
+    :param client: AsyncHTTPClient / None
+    :param concurrency: int, files downloaded at once (for each of libraries and assets)
+    :param endpoints: Endpoints / None, where to download from (mirrors first), defaults to get_default_endpoints()
+    :return: None
+    """
+    logger.info("Installing Minecraft version: '{}' with bindir: '{}', assetsdir: '{}', libdir: '{}'".format(mcversion, bindir, assetsdir, libdir))
+
+    async with _client_or_default(client) as client:
+        await download_minecraft_bin(bindir, mcversion, raise_on_hash_mismatch, client, endpoints)
+
+        with open(os.path.join(bindir, 'minecraft.json')) as f:
+            minecraft_data = json.load(f)
+
+        assets_index_path = os.path.join(assetsdir, "indexes", "{}.json".format(mcversion))
+
+        async def save_assets():
+            if not os.path.isfile(assets_index_path):
+                logger.info("Saving assets index into: {}".format(assets_index_path))
+                await chunked_file_download(minecraft_data["assetIndex"]["url"], assets_index_path, client=client)
+
+            await save_minecraft_assets(assets_index_path, assetsdir, raise_on_hash_mismatch, client, concurrency, endpoints)
+
+        await asyncio.gather(
+            save_minecraft_libs(libdir, nativesdir, minecraft_data["libraries"], raise_on_hash_mismatch, client, concurrency, endpoints),
+            save_assets(),
+            save_logging_config(assetsdir, minecraft_data, client)
+        )
+
+
+async def download_forge_installer(mcversion, tempdir, client=None):
+    """
+    Downloads the appropriate Forge installer for mcversion into tempdir
+    :param mcversion: string, e.g. "1.7.10"
+    :param tempdir: string, path to temporary storage directory (remember to clear this after forge has been installed)
+    :param client: AsyncHTTPClient / None
+    :return: string, path to installer
+    """
+    async with _client_or_default(client) as client:
+        if forge_web._forge_promotions_maybe is None:
+            logger.info("Attempting to fetch forge promotions...")
+            body = await client.fetch("GET", forge_web.FORGE_PROMOTION_URL)
+            forge_web._forge_promotions_maybe = json.loads(body.decode('utf-8'))
+
+        promotions = forge_web._forge_promotions_maybe
+        forge_version = promotions["promos"].get("{}-recommended".format(mcversion)) or promotions["promos"].get("{}-latest".format(mcversion))
+
+        forge_save_path = os.path.join(
+            tempdir,
+            uuid.uuid4().hex,
+            "forge_installer_{}.jar".format(mcversion)
+        )
+
+        forge_url = forge_web._get_forge_version_url(mcversion, forge_version, promotions["homepage"])
+
+        logger.info("Downloading Forge version: {} from url: {} into: {}".format(forge_version, forge_url, forge_save_path))
+        await chunked_file_download(forge_url, forge_save_path, client=client)
+
+    return forge_save_path
+
@@ -0,0 +1,346 @@
+"""
+A small non-blocking HTTP/1.1 client built on asyncio streams, used by the async install and auth APIs
+
+Connections are pooled (keep-alive) per host, and the number of open connections is capped globally and per host, so
+callers awaiting a connection are what provides backpressure. Cancelling a task mid-request closes its connection
+"""
+import ssl
+import email.message
+import asyncio
+import logging
+import contextlib
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlsplit, urljoin
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_USER_AGENT = "mc_launcher_core"
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+
+
+class _Connection:
+    def __init__(self, key, reader, writer):
+        self.key = key
+        self.reader = reader
+        self.writer = writer
+
+    def close(self):
+        self.writer.close()
+
+
+class AsyncResponse:
+    """
+    A streamed HTTP response. Use AsyncHTTPClient.stream() to get one
+    """
+    def __init__(self, client, connection, url, status, reason, headers, method):
+        self.url = url
+        self.status = status
+        self.reason = reason
+        self.headers = headers  # dict<lowercase name: value>
+
+        self._client = client
+        self._connection = connection
+        self._read_timeout = client.read_timeout
+        self._done = False
+        self._keep_alive = headers.get("connection", "").lower() != "close"
+
+        self._chunked = "chunked" in headers.get("transfer-encoding", "").lower()
+        self._chunk_remaining = 0
+        self._remaining = None  # bytes left when Content-Length is known
+
+        if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+            self._done = True
+        elif not self._chunked:
+            if "content-length" in headers:
+                self._remaining = int(headers["content-length"])
+                self._done = self._remaining == 0
+            else:
+                # body runs until the server closes the connection
+                self._keep_alive = False
+
+    async def _wait(self, coro):
+        return await asyncio.wait_for(coro, self._read_timeout)
+
+    async def _read_chunked(self, n):
+        reader = self._connection.reader
+
+        if self._chunk_remaining == 0:
+            line = await self._wait(reader.readline())
+            size = int(line.split(b";", 1)[0].strip() or b"0", 16)
+
+            if size == 0:
+                # skip any trailers
+                while (await self._wait(reader.readline())) not in (b"\r\n", b"\n", b""):
+                    pass
+                self._done = True
+                return b""
+
+            self._chunk_remaining = size
+
+        data = await self._wait(reader.read(min(n, self._chunk_remaining)))
+        if not data:
+            raise URLError("Connection closed in the middle of a chunk")
+
+        self._chunk_remaining -= len(data)
+        if self._chunk_remaining == 0:
+            await self._wait(reader.readline())  # CRLF after chunk data
+
+        return data
+
+    async def read(self, n=64*1024):
+        """
+        Reads up to n bytes of the body
+        :param n: int
+        :return: bytes, empty once the body is finished
+        """
+        if self._done:
+            return b""
+
+        if self._chunked:
+            return await self._read_chunked(n)
+
+        if self._remaining is not None:
+            data = await self._wait(self._connection.reader.read(min(n, self._remaining)))
+            if not data:
+                raise URLError("Connection closed before the whole body was received")
+
+            self._remaining -= len(data)
+            self._done = self._remaining == 0
+            return data
+
+        data = await self._wait(self._connection.reader.read(n))
+        if not data:
+            self._done = True
+        return data
+
+    async def read_all(self):
+        """
+        :return: bytes, the whole (remaining) body
+        """
+        parts = []
+        while True:
+            data = await self.read()
+            if not data:
+                break
+            parts.append(data)
+
+        return b"".join(parts)
+
+    async def iter_chunks(self, chunk_size=16*1024):
+        """
+        Async generator over the body in chunks of up to chunk_size
+        """
+        while True:
+            data = await self.read(chunk_size)
+            if not data:
+                break
+            yield data
+
+    def _release(self):
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            self._client._release(connection, reuse=self._done and self._keep_alive)
+
+
+class AsyncHTTPClient:
+    """
+    Non-blocking HTTP client with a keep-alive connection pool
+    """
+    def __init__(self, max_connections=64, max_connections_per_host=8, connect_timeout=30, read_timeout=60, user_agent=DEFAULT_USER_AGENT, policy=None):
+        """
+        :param max_connections: int, open connections allowed in total
+        :param max_connections_per_host: int, open connections allowed to a single host
+        :param connect_timeout: float, seconds
+        :param read_timeout: float, seconds to wait for any single read
+        :param user_agent: string
+        :param policy: TransferPolicy / None, retry policy for downloads made through this client (its timeouts aren't used)
+        """
+        self.max_connections_per_host = max_connections_per_host
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.user_agent = user_agent
+        self.policy = policy
+
+        self._semaphore = asyncio.Semaphore(max_connections)
+        self._host_semaphores = dict()  # (scheme, host, port) -> asyncio.Semaphore
+        self._idle = dict()  # (scheme, host, port) -> list<_Connection>
+        self._ssl_context = ssl.create_default_context()
+        self._closed = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """
+        Closes all idle connections
+        :return: None
+        """
+        self._closed = True
+        for connections in self._idle.values():
+            for connection in connections:
+                connection.close()
+        self._idle.clear()
+
+    def _host_semaphore(self, key):
+        semaphore = self._host_semaphores.get(key)
+        if semaphore is None:
+            semaphore = self._host_semaphores[key] = asyncio.Semaphore(self.max_connections_per_host)
+        return semaphore
+
+    async def _connect(self, key):
+        idle = self._idle.get(key)
+        while idle:
+            connection = idle.pop()
+            if not connection.reader.at_eof():
+                return connection, True
+            connection.close()
+
+        scheme, host, port = key
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(host, port, ssl=self._ssl_context if scheme == "https" else None),
+                self.connect_timeout
+            )
+        except (OSError, asyncio.TimeoutError) as ex:
+            raise URLError("Failed to connect to {}:{} ({!r})".format(host, port, ex))
+
+        return _Connection(key, reader, writer), False
+
+    def _release(self, connection, reuse):
+        if reuse and not self._closed:
+            self._idle.setdefault(connection.key, []).append(connection)
+        else:
+            connection.close()
+
+        self._host_semaphore(connection.key).release()
+        self._semaphore.release()
+
+    async def _send(self, connection, method, url, data, headers):
+        parts = urlsplit(url)
+        target = parts.path or "/"
+        if parts.query:
+            target += "?" + parts.query
+
+        all_headers = {
+            "Host": parts.netloc,
+            "User-Agent": self.user_agent,
+            "Accept-Encoding": "identity",
+            "Connection": "keep-alive",
+        }
+        all_headers.update(headers or dict())
+        if data is not None:
+            all_headers["Content-Length"] = str(len(data))
+
+        head = "{} {} HTTP/1.1\r\n".format(method, target) + "".join(
+            "{}: {}\r\n".format(k, v) for k, v in all_headers.items()
+        ) + "\r\n"
+
+        connection.writer.write(head.encode("latin-1") + (data or b""))
+        await asyncio.wait_for(connection.writer.drain(), self.read_timeout)
+
+        reader = connection.reader
+        status_line = await asyncio.wait_for(reader.readline(), self.read_timeout)
+        if not status_line:
+            raise ConnectionResetError("Connection closed before the response")
+
+        _, status, reason = (status_line.decode("latin-1").rstrip("\r\n").split(" ", 2) + [""])[:3]
+
+        response_headers = dict()
+        while True:
+            line = await asyncio.wait_for(reader.readline(), self.read_timeout)
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+
+        return int(status), reason, response_headers
+
+    async def _open(self, method, url, data, headers):
+        """
+        Opens a single request (no redirects), the caller must release the response
+        :return: AsyncResponse
+        """
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            raise URLError("Unsupported URL scheme: {}".format(url))
+
+        key = (parts.scheme, parts.hostname, parts.port or (443 if parts.scheme == "https" else 80))
+
+        await self._semaphore.acquire()
+        try:
+            await self._host_semaphore(key).acquire()
+        except BaseException:
+            self._semaphore.release()
+            raise
+
+        connection = None
+        try:
+            connection, reused = await self._connect(key)
+            try:
+                status, reason, response_headers = await self._send(connection, method, url, data, headers)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                if not reused:
+                    raise
+                # the server closed an idle keep-alive connection, try again with a fresh one
+                connection.close()
+                connection, _ = await self._connect(key)
+                status, reason, response_headers = await self._send(connection, method, url, data, headers)
+        except BaseException as ex:
+            if connection is not None:
+                connection.close()
+            self._host_semaphore(key).release()
+            self._semaphore.release()
+            if isinstance(ex, (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError)) and not isinstance(ex, URLError):
+                raise URLError("Request to {} failed ({!r})".format(url, ex))
+            raise
+
+        return AsyncResponse(self, connection, url, status, reason, response_headers, method)
+
+    @contextlib.asynccontextmanager
+    async def stream(self, method, url, data=None, headers=None, max_redirects=5):
+        """
+        Makes a request, following redirects, and yields the streamed AsyncResponse
+        Raises urllib.error.HTTPError for 4xx / 5xx responses (like urlopen)
+        :param method: string
+        :param url: string
+        :param data: bytes / None, request body
+        :param headers: dict / None
+        :param max_redirects: int
+        """
+        for _ in range(max_redirects + 1):
+            response = await self._open(method, url, data, headers)
+            try:
+                if response.status in REDIRECT_CODES and "location" in response.headers:
+                    await response.read_all()
+                    url = urljoin(url, response.headers["location"])
+                    if response.status == 303:
+                        method, data = "GET", None
+                    continue
+
+                if response.status >= 400:
+                    body = await response.read_all()
+                    hdrs = email.message.Message()
+                    for k, v in response.headers.items():
+                        hdrs[k] = v
+                    error = HTTPError(url, response.status, response.reason, hdrs, None)
+                    error.body = body
+                    raise error
+
+                yield response
+                return
+            finally:
+                response._release()
+
+        raise URLError("Too many redirects, last URL: {}".format(url))
+
+    async def fetch(self, method, url, data=None, headers=None):
+        """
+        Makes a request and reads the whole body
+        :return: bytes
+        """
+        async with self.stream(method, url, data, headers) as response:
+            return await response.read_all()
@@ -0,0 +1,216 @@
+"""
+Installing many Minecraft versions at once. Versions share most of their libraries and asset objects, so instead of
+installing each version separately (checking / fetching shared files once per version) their libraries, natives and
+asset objects are merged into one work set, keyed by path / sha1, which is run once
+"""
+import os
+import json
+import shutil
+import logging
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from mc_launcher_core.models import Library, load_libraries
+from mc_launcher_core.util import extract_file_to_directory, get_url_filename, get_logging_config_path
+from mc_launcher_core.web import download_minecraft_bin
+from mc_launcher_core.web.endpoints import get_default_endpoints
+from mc_launcher_core.web.install import save_minecraft_lib, save_minecraft_asset, copy_legacy_asset, download_verified, save_logging_config
+from mc_launcher_core.web.util import chunked_file_download, verify_sha1
+
+
+logger = logging.getLogger(__name__)
+
+
+class BatchWork:
+    """
+    The deduplicated files needed by a set of versions
+    """
+    def __init__(self):
+        self.artifacts = dict()  # artifact path -> Library (without its native)
+        self.natives = dict()  # native artifact path -> tuple<Library, list<nativesdir>>
+        self.assets = dict()  # sha1 -> tuple<asset dict, list<asset name>>
+        self.library_references = 0
+        self.asset_references = 0
+
+    def add_libraries(self, libraries, nativesdir):
+        """
+        :param libraries: list<Library>
+        :param nativesdir: string, where this version's natives go
+        :return: None
+        """
+        for lib in libraries:
+            self.library_references += 1
+
+            if lib.artifact is not None and lib.artifact.path not in self.artifacts:
+                self.artifacts[lib.artifact.path] = Library(
+                    lib.name, lib.artifact, None, lib.xz_unpack, lib.xz_unpack_on_alt_url, lib.existence_guaranteed
+                )
+
+            if lib.native is not None:
+                _, nativesdirs = self.natives.setdefault(lib.native.artifact.path, (lib, []))
+                if nativesdir not in nativesdirs:
+                    nativesdirs.append(nativesdir)
+
+    def add_assets(self, objects):
+        """
+        :param objects: dict<name: asset dict>, "objects" from an asset index
+        :return: None
+        """
+        for name, asset in objects.items():
+            self.asset_references += 1
+            _, names = self.assets.setdefault(asset["hash"], (asset, []))
+            if name not in names:
+                names.append(name)
+
+    def summary(self):
+        return dict(
+            libraries=len(self.artifacts),
+            library_references=self.library_references,
+            natives=len(self.natives),
+            assets=len(self.assets),
+            asset_references=self.asset_references
+        )
+
+
+def save_shared_native(lib, libdir, nativesdirs, raise_on_hash_mismatch=False, policy=None, endpoints=None):
+    """
+    Downloads a native once (into libdir, at its Maven path) and extracts it into each of nativesdirs
+    :param lib: Library, with a native
+    :param libdir: string
+    :param nativesdirs: list<string>
+    :param raise_on_hash_mismatch: bool
+    :param policy: TransferPolicy / None
+    :param endpoints: Endpoints / None
+    :return: None
+    """
+    native = lib.native
+    filepath = os.path.join(libdir, *native.artifact.path.split("/"))
+
+    if not os.path.isfile(filepath) or (native.artifact.sha1 and not verify_sha1(filepath, native.artifact.sha1)):
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        download_verified(
+            (endpoints or get_default_endpoints()).library_urls(native.artifact.path, native.artifact.url),
+            filepath,
+            native.artifact.sha1,
+            raise_on_hash_mismatch,
+            policy
+        )
+
+    for nativesdir in nativesdirs:
+        os.makedirs(nativesdir, exist_ok=True)
+        if native.do_extract:
+            extract_file_to_directory(filepath, nativesdir, native.extract_exclude)
+        else:
+            shutil.copyfile(filepath, os.path.join(nativesdir, get_url_filename(native.artifact.path)))
+
+
+def save_asset_for_names(asset, names, assetsdir, raise_on_hash_mismatch=False, policy=None, endpoints=None):
+    """
+    Downloads an asset object once, and makes its legacy copy under each of its names
+    :return: None
+    """
+    save_minecraft_asset(asset, names[0], assetsdir, raise_on_hash_mismatch, policy, endpoints)
+
+    filepath = os.path.join(assetsdir, "objects", asset["hash"][:2], asset["hash"])
+    for name in names[1:]:
+        copy_legacy_asset(filepath, name, assetsdir)
+
+
+def _run_all(pool, calls):
+    """
+    Runs every call on pool, then raises the first error (if any)
+    :param pool: ThreadPoolExecutor
+    :param calls: list<tuple<callable, args...>>
+    :return: None
+    """
+    futures = [pool.submit(*call) for call in calls]
+
+    errors = [f.exception() for f in futures]
+    errors = [e for e in errors if e is not None]
+    if errors:
+        logger.error("{} of {} batch tasks failed".format(len(errors), len(futures)))
+        raise errors[0]
+
+
+def download_minecraft_versions(bindirs, assetsdir, libdir, raise_on_hash_mismatch=False, policy=None, endpoints=None, workers=8, nativesdirs=None, registry=None):
+    """
+    Installs several Minecraft versions, fetching / checking each distinct library, native and asset object only once
+    Each version still gets its own minecraft.json, minecraft.jar, natives, asset index and log config
+    :param bindirs: dict<mcversion: bindir>
+    :param assetsdir: string, shared by all versions
+    :param libdir: string, shared by all versions
+    :param raise_on_hash_mismatch: bool
+    :param policy: TransferPolicy / None
+    :param endpoints: Endpoints / None
+    :param workers: int, downloads in flight at once
+    :param nativesdirs: dict<mcversion: nativesdir> / None, defaults to <bindir>/natives
+    :param registry: CacheRegistry / None, registers the installs (so cache collection keeps their files) and holds its cache lock while installing
+    :return: dict, counts of distinct files vs. references across the versions
+    """
+    nativesdirs = nativesdirs or dict()
+    versions = list(bindirs)
+    logger.info("Batch installing Minecraft versions: {}".format(versions))
+
+    with (registry.using() if registry is not None else contextlib.nullcontext()), ThreadPoolExecutor(max_workers=workers) as pool:
+        # jars and version JSONs are per version
+        _run_all(pool, [
+            (download_minecraft_bin, bindirs[v], v, raise_on_hash_mismatch, policy, endpoints) for v in versions
+        ])
+
+        version_data = dict()
+        for v in versions:
+            with open(os.path.join(bindirs[v], "minecraft.json")) as f:
+                version_data[v] = json.load(f)
+
+        # versions often share an asset index, fetch each once and copy it to the other versions' names
+        index_paths = dict()  # url -> list<path>
+        for v in versions:
+            index_paths.setdefault(version_data[v]["assetIndex"]["url"], []).append(
+                os.path.join(assetsdir, "indexes", "{}.json".format(v))
+            )
+
+        def save_index(url, paths):
+            existing = next((p for p in paths if os.path.isfile(p)), None)
+            if existing is None:
+                existing = paths[0]
+                chunked_file_download(url, existing, policy=policy)
+            for path in paths:
+                if not os.path.isfile(path):
+                    shutil.copyfile(existing, path)
+
+        # and a log config (most versions since 1.12 share client-1.12.xml)
+        logging_configs = dict()  # path -> version JSON
+        for v in versions:
+            path = get_logging_config_path(assetsdir, version_data[v])
+            if path is not None:
+                logging_configs.setdefault(path, version_data[v])
+
+        _run_all(pool, (
+            [(save_index, url, paths) for url, paths in index_paths.items()] +
+            [(save_logging_config, assetsdir, data, policy) for data in logging_configs.values()]
+        ))
+
+        work = BatchWork()
+        for v in versions:
+            work.add_libraries(
+                load_libraries(version_data[v]["libraries"]),
+                nativesdirs.get(v) or os.path.join(bindirs[v], "natives")
+            )
+
+            with open(os.path.join(assetsdir, "indexes", "{}.json".format(v))) as f:
+                work.add_assets(json.load(f)["objects"])
+
+        summary = work.summary()
+        logger.info("Batch work set: {}".format(summary))
+
+        _run_all(pool, (
+            [(save_minecraft_lib, lib, libdir, None, raise_on_hash_mismatch, policy, endpoints) for lib in work.artifacts.values()] +
+            [(save_shared_native, lib, libdir, dirs, raise_on_hash_mismatch, policy, endpoints) for lib, dirs in work.natives.values()] +
+            [(save_asset_for_names, asset, names, assetsdir, raise_on_hash_mismatch, policy, endpoints) for asset, names in work.assets.values()]
+        ))
+
+        if registry is not None:
+            for v in versions:
+                registry.register(bindirs[v], v)
+
+    summary["versions"] = len(versions)
+    return summary
@@ -0,0 +1,202 @@
+"""
+Bulk authentication of many accounts at once, without tripping the auth server's rate limits
+
+Logins are spread out by a shared token bucket, a 429 pauses *all* workers for the server's Retry-After, and
+transient failures are retried with jittered exponential backoff. One account failing never aborts the batch
+"""
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from mc_launcher_core.exceptions import InvalidLoginError, RateLimitedError
+from mc_launcher_core.session_store import make_stored_session
+from mc_launcher_core.web import authenticate_user
+
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket, with support for pausing everyone (e.g. after a 429)
+    """
+    def __init__(self, rate, burst=1):
+        """
+        :param rate: float, requests allowed per second
+        :param burst: int, requests allowed back-to-back
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive, got: {}".format(rate))
+        if burst < 1:
+            raise ValueError("burst must be at least 1, got: {}".format(burst))
+
+        self.rate = rate
+        self.burst = burst
+
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def pause(self, seconds):
+        """
+        Stops handing out tokens for seconds
+        :param seconds: float
+        :return: None
+        """
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+    def acquire(self):
+        """
+        Blocks until a request is allowed
+        :return: None
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                else:
+                    self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+
+                    wait = (1 - self._tokens) / self.rate
+
+            time.sleep(wait)
+
+
+class AuthResult:
+    """
+    The outcome of authenticating a single account
+    """
+    def __init__(self, username, response=None, error=None, attempts=0, elapsed=0.0):
+        self.username = username
+        self.response = response  # dict, auth server response (None if failed)
+        self.error = error  # Exception / None
+        self.attempts = attempts
+        self.elapsed = elapsed  # seconds, including time spent waiting
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        return "AuthResult(username={!r}, ok={!r}, attempts={!r}, error={!r})".format(
+            self.username, self.ok, self.attempts, self.error
+        )
+
+
+def _backoff(attempt, base, cap):
+    """
+    "Full jitter" exponential backoff
+    :param attempt: int, 1 for the first retry
+    :return: float, seconds
+    """
+    return random.uniform(0, min(cap, base * (2 ** (attempt - 1))))
+
+
+def _is_retryable(ex):
+    if isinstance(ex, HTTPError):
+        return ex.code >= 500
+    return isinstance(ex, (URLError, OSError))
+
+
+class BulkAuthenticator:
+    """
+    Authenticates many accounts concurrently at a limited rate
+    """
+    def __init__(self, rate=1.0, burst=1, max_workers=8, max_attempts=5, base_backoff=1.0, max_backoff=60.0, authserver=None, session_store=None):
+        """
+        :param rate: float, logins per second across all workers
+        :param burst: int, logins allowed back-to-back
+        :param max_workers: int, logins in flight at once
+        :param max_attempts: int, attempts per account (rate limited attempts included)
+        :param base_backoff: float, seconds, first retry waits up to this long
+        :param max_backoff: float, seconds, cap on the backoff
+        :param authserver: string / None, base URL of the auth server
+        :param session_store: SessionStore / None, where to save successful sessions
+        """
+        self.limiter = RateLimiter(rate, burst)
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.authserver = authserver
+        self.session_store = session_store
+
+    def authenticate(self, username, password, client_token=None):
+        """
+        Authenticates one account, retrying as needed. Never raises
+        :param username: string
+        :param password: string
+        :param client_token: string / None
+        :return: AuthResult
+        """
+        start = time.monotonic()
+        attempt = 0
+
+        while True:
+            attempt += 1
+            self.limiter.acquire()
+
+            try:
+                res = authenticate_user(username, password, True, client_token, self.authserver)
+            except InvalidLoginError as ex:
+                return AuthResult(username, error=ex, attempts=attempt, elapsed=time.monotonic() - start)
+            except RateLimitedError as ex:
+                wait = ex.retry_after if ex.retry_after is not None else _backoff(attempt, self.base_backoff, self.max_backoff)
+                logger.info("Rate limited authenticating: {}, pausing logins for {:.1f}s".format(username, wait))
+                self.limiter.pause(wait)
+                error = ex
+            except Exception as ex:
+                if not _is_retryable(ex):
+                    return AuthResult(username, error=ex, attempts=attempt, elapsed=time.monotonic() - start)
+
+                wait = _backoff(attempt, self.base_backoff, self.max_backoff)
+                logger.info("Failed to authenticate: {} ({!r}), retrying in {:.1f}s".format(username, ex, wait))
+                error = ex
+            else:
+                if self.session_store is not None:
+                    self.session_store.put(make_stored_session(username, res, client_token))
+                return AuthResult(username, res, attempts=attempt, elapsed=time.monotonic() - start)
+
+            if attempt >= self.max_attempts:
+                return AuthResult(username, error=error, attempts=attempt, elapsed=time.monotonic() - start)
+
+            if not isinstance(error, RateLimitedError):
+                time.sleep(wait)
+
+    def authenticate_all(self, accounts):
+        """
+        Authenticates all accounts
+        :param accounts: iterable<tuple<username, password> / tuple<username, password, client_token>>
+        :return: dict<username: AuthResult>, in the order the accounts were given
+        """
+        accounts = list(accounts)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = [pool.submit(self.authenticate, *account) for account in accounts]
+            results = [f.result() for f in futures]
+
+        return {result.username: result for result in results}
+
+
+def authenticate_users(accounts, rate=1.0, max_workers=8, **kwargs):
+    """
+    Authenticates many accounts, see BulkAuthenticator
+    :param accounts: iterable<tuple<username, password> / tuple<username, password, client_token>>
+    :param rate: float, logins per second
+    :param max_workers: int
+    :param kwargs: other BulkAuthenticator options
+    :return: dict<username: AuthResult>
+    """
+    return BulkAuthenticator(rate=rate, max_workers=max_workers, **kwargs).authenticate_all(accounts)
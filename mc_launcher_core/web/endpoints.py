@@ -0,0 +1,152 @@
+"""
+Where files are downloaded from. Mirrors (e.g. a warm peer running mc_launcher_core.mirror) are tried first, and
+Mojang's servers last
+"""
+import os
+import logging
+from urllib.error import URLError
+from mc_launcher_core.exceptions import CircuitOpenError, HashMatchError
+from mc_launcher_core.web.util import chunked_file_download
+
+
+logger = logging.getLogger(__name__)
+
+MINECRAFT_RESOURCES_ROOT = "https://resources.download.minecraft.net/"
+MINECRAFT_VERSIONS_ROOT = "https://s3.amazonaws.com/Minecraft.Download/versions/"
+MINECRAFT_LIBRARIES_ROOT = "https://libraries.minecraft.net/"
+
+MIRRORS_ENV_VAR = "MC_LAUNCHER_CORE_MIRRORS"  # comma separated mirror base URLs
+
+_default_endpoints = None
+
+
+def _with_slash(url):
+    return url if url.endswith("/") else url + "/"
+
+
+class Endpoints:
+    """
+    Base URLs to download from, in order of preference
+    """
+    def __init__(self, resources_roots=(MINECRAFT_RESOURCES_ROOT,), versions_roots=(MINECRAFT_VERSIONS_ROOT,), libraries_roots=(MINECRAFT_LIBRARIES_ROOT,)):
+        """
+        :param resources_roots: list<string>, roots serving assets as <root>/<hash[:2]>/<hash>
+        :param versions_roots: list<string>, roots serving jars as <root>/<version>/<version>.jar
+        :param libraries_roots: list<string>, roots serving libraries by their Maven path
+        """
+        self.resources_roots = [_with_slash(x) for x in resources_roots]
+        self.versions_roots = [_with_slash(x) for x in versions_roots]
+        self.libraries_roots = [_with_slash(x) for x in libraries_roots]
+
+    @classmethod
+    def with_mirrors(cls, mirrors, upstream=None):
+        """
+        Makes Endpoints that try each mirror (laid out like mc_launcher_core.mirror serves) before upstream
+        :param mirrors: list<string>, mirror base URLs, e.g. ["http://10.0.0.5:8750/"]
+        :param upstream: Endpoints / None, defaults to Mojang's servers
+        :return: Endpoints
+        """
+        upstream = upstream or cls()
+        mirrors = [_with_slash(x) for x in mirrors]
+
+        return cls(
+            [x + "resources/" for x in mirrors] + upstream.resources_roots,
+            [x + "versions/" for x in mirrors] + upstream.versions_roots,
+            [x + "libraries/" for x in mirrors] + upstream.libraries_roots
+        )
+
+    @classmethod
+    def from_env(cls):
+        """
+        Endpoints using the mirrors listed in the MC_LAUNCHER_CORE_MIRRORS environment variable (if any)
+        :return: Endpoints
+        """
+        mirrors = [x.strip() for x in os.environ.get(MIRRORS_ENV_VAR, "").split(",") if x.strip()]
+        return cls.with_mirrors(mirrors) if mirrors else cls()
+
+    def asset_urls(self, hash):
+        """
+        :param hash: string, sha1 of the asset
+        :return: list<string>
+        """
+        return [root + hash[:2] + "/" + hash for root in self.resources_roots]
+
+    def version_jar_urls(self, mcversion):
+        """
+        :param mcversion: string
+        :return: list<string>
+        """
+        return ["{0}{1}/{1}.jar".format(root, mcversion) for root in self.versions_roots]
+
+    def version_server_jar_urls(self, mcversion, url=None):
+        """
+        Gets the URLs to try for a dedicated server jar, mirrors first and its own URL (from the version JSON) last
+        :param mcversion: string
+        :param url: string / None, downloads.server.url from the version JSON
+        :return: list<string>
+        """
+        urls = ["{0}{1}/minecraft_server.{1}.jar".format(root, mcversion) for root in self.versions_roots]
+
+        if url is not None:
+            urls = [x for x in urls if not x.startswith(MINECRAFT_VERSIONS_ROOT)] + [url]
+
+        return urls
+
+    def library_urls(self, path, url):
+        """
+        Gets the URLs to try for a library, its own URL is always tried last
+        :param path: string, Maven path of the library, e.g. "org/ow2/asm/asm/5.0.3/asm-5.0.3.jar"
+        :param url: string / None, the URL the version JSON gives for it
+        :return: list<string>
+        """
+        urls = [root + path for root in self.libraries_roots]
+
+        if url is not None:
+            # libraries from other repositories (e.g. Forge's) aren't on Mojang's server
+            urls = [x for x in urls if not x.startswith(MINECRAFT_LIBRARIES_ROOT)] + [url]
+
+        seen = set()
+        return [x for x in urls if not (x in seen or seen.add(x))]
+
+
+def get_default_endpoints():
+    """
+    Gets the process-wide Endpoints (from the environment on first use)
+    :return: Endpoints
+    """
+    global _default_endpoints
+    if _default_endpoints is None:
+        _default_endpoints = Endpoints.from_env()
+
+    return _default_endpoints
+
+
+def set_default_endpoints(endpoints):
+    """
+    :param endpoints: Endpoints
+    :return: None
+    """
+    global _default_endpoints
+    _default_endpoints = endpoints
+
+
+def download_from_first_available(urls, path, policy=None, sha1=None):
+    """
+    Downloads path from the first URL in urls that works
+    :param urls: list<string>
+    :param path: string
+    :param policy: TransferPolicy / None
+    :param sha1: string / None
+    :return: string, the URL it was downloaded from
+    """
+    last_error = None
+
+    for url in urls:
+        try:
+            chunked_file_download(url, path, policy=policy, sha1=sha1)
+            return url
+        except (URLError, CircuitOpenError, HashMatchError, OSError) as ex:
+            logger.debug("Failed to download: {} ({!r}), trying next source".format(url, ex))
+            last_error = ex
+
+    raise last_error
@@ -3,229 +3,315 @@ All the web requests related to installing a version of Minecraft
 """
 import os.path
 import logging
-import platform
 import shutil
-import unpack200
-from urllib.error import URLError, HTTPError
 from mc_launcher_core.exceptions import HashMatchError
-from mc_launcher_core.util import extract_file_to_directory, java_esque_string_substitutor, is_os_64bit, get_url_filename, do_get_library, extract_xz_to_file
-from mc_launcher_core.web.util import chunked_file_download, verify_sha1, get_sha1_hash
+from mc_launcher_core.models import make_library
+from mc_launcher_core.util import extract_file_to_directory, is_os_64bit, get_url_filename, extract_xz_to_file, get_logging_config_path
+from mc_launcher_core.web.util import verify_sha1
+from mc_launcher_core.web.endpoints import get_default_endpoints, download_from_first_available
 
 
-MINECRAFT_VERSIONS_ROOT = "https://s3.amazonaws.com/Minecraft.Download/versions"
 logger = logging.getLogger(__name__)
-system = platform.system().lower()
 
 
-def save_minecraft_jar(mcversion, path, hash=None, raise_on_hash_mismatch=False):
+def save_minecraft_jar(mcversion, path, hash=None, raise_on_hash_mismatch=False, policy=None, endpoints=None):
     """
     Downloads and saves the Minecraft.jar (from Mojang source) into path
     :param mcversion: string, e.g. "1.7.10", "18w14b"
     :param path: string, absolute path to the location where this file should be saved
     :param hash: string, sha1 hash of the Jar file
     :param raise_on_hash_mismatch: bool
+    :param policy: TransferPolicy / None, retry / timeout policy for the download
+    :param endpoints: Endpoints / None, where to download from (mirrors first), defaults to get_default_endpoints()
     :return: None
     """
-    url = "{0}/{1}/{1}.jar".format(MINECRAFT_VERSIONS_ROOT, mcversion)
+    urls = (endpoints or get_default_endpoints()).version_jar_urls(mcversion)
 
-    attempt_count = 0
+    if os.path.isfile(path) and os.path.getsize(path) != 0 and (hash is None or verify_sha1(path, hash)):
+        return
+
+    logger.info("Downloading Minecraft.jar from URLs: {}...".format(urls))
+    try:
+        # corrupt downloads are retried by the policy
+        download_from_first_available(urls, path, policy, hash)
+    except HashMatchError:
+        logger.critical("Failed to download minecraft.jar. Hash of file doesn't match expected hash: '{}'".format(hash))
 
-    while (not os.path.isfile(path) or os.path.getsize(path) == 0 or (hash is not None and not verify_sha1(path, hash))) and attempt_count <= 4:
-        logger.info("Downloading Minecraft.jar from URL: {}... (attempt: {})".format(url, attempt_count))
-        chunked_file_download(url, path)
-        attempt_count += 1
+        if raise_on_hash_mismatch:
+            raise
+        return
 
     if not os.path.isfile(path) or os.path.getsize(path) == 0:
-        logging.critical("Failed to download Minecraft.jar")
+        logger.critical("Failed to download Minecraft.jar")
         raise Exception("Minecraft.jar not downloading correctly (file is either 0 bytes or non-existent)")
 
-    with open(path, 'rb') as f:
-        h = get_sha1_hash(f)
 
-    if hash is not None and h != hash:  # hashes don't match!!!
-        logger.critical("Failed to download minecraft.jar. Hash of file: '{}' doesn't match expected hash: '{}'".format(
-            h,
-            hash
-        ))
+def save_minecraft_server_jar(mcversion, path, download, policy=None, endpoints=None):
+    """
+    Downloads and saves a dedicated server jar into path, verified against its sha1 as it downloads
+    :param mcversion: string
+    :param path: string
+    :param download: dict<url, sha1>, downloads.server from the version JSON
+    :param policy: TransferPolicy / None
+    :param endpoints: Endpoints / None, mirrors are tried before download["url"]
+    :return: None
+    """
+    if os.path.isfile(path) and verify_sha1(path, download["sha1"]):
+        return
 
-        if raise_on_hash_mismatch:
-            raise HashMatchError("minecraft.jar", "Hashes don't match. Expected: '{}' but got '{}'".format(h, hash))
+    urls = (endpoints or get_default_endpoints()).version_server_jar_urls(mcversion, download["url"])
+    logger.info("Downloading server jar from URLs: {}...".format(urls))
+
+    # a server can't run from a partial / corrupt jar, so unlike the client jar a mismatch always raises
+    download_from_first_available(urls, path, policy, download["sha1"])
 
 
-def save_minecraft_lib(lib, libdir, nativesdir, raise_on_hash_mismatch=False):
+def save_logging_config(assetsdir, minecraft_data, policy=None):
+    """
+    Downloads the log4j config the version JSON's logging.client names (it makes the game log structured events to the
+    console, see mc_launcher_core.gamelog) into <assetsdir>/log_configs/
+    :param assetsdir: string
+    :param minecraft_data: dict, the version JSON
+    :param policy: TransferPolicy / None
+    :return: string / None, its path, None if the version doesn't have one
+    """
+    path = get_logging_config_path(assetsdir, minecraft_data)
+    if path is None:
+        return None
+
+    download = minecraft_data["logging"]["client"]["file"]
+    if os.path.isfile(path) and verify_sha1(path, download["sha1"]):
+        return path
+
+    logger.info("Saving log config into: {}".format(path))
+    download_from_first_available([download["url"]], path, policy, download["sha1"])
+
+    return path
+
+
+def download_verified(urls, path, sha1, raise_on_hash_mismatch=False, policy=None):
+    """
+    Downloads path from the first source with a copy matching sha1: corrupt copies are retried by the policy, then the
+    next source is tried. If no source has a matching copy, the HashMatchError is raised if raise_on_hash_mismatch,
+    otherwise the first working source's copy is kept (the caller warns about it)
+    :param urls: list<string>
+    :param path: string
+    :param sha1: string / None
+    :param raise_on_hash_mismatch: bool
+    :param policy: TransferPolicy / None
+    :return: string, the URL it was downloaded from
+    """
+    try:
+        return download_from_first_available(urls, path, policy, sha1)
+    except HashMatchError:
+        if raise_on_hash_mismatch or sha1 is None:
+            raise
+        logger.warning("No source has a copy of: {} matching sha1: {}".format(path, sha1))
+        return download_from_first_available(urls, path, policy)
+
+
+def save_minecraft_lib(lib, libdir, nativesdir, raise_on_hash_mismatch=False, policy=None, endpoints=None):
     """
     Save a specific Minecraft lib
-    :param lib: dict, library JSON format
+    :param lib: Library / dict (library JSON format)
     :param libdir: string
     :param nativesdir: string, where to put natives
     :param raise_on_hash_mismatch: bool, whether to raise an exception when hashes don't match
+    :param policy: TransferPolicy / None, retry / timeout policy for the downloads
+    :param endpoints: Endpoints / None, where to download from (mirrors first), defaults to get_default_endpoints()
     :return: None
     """
-    logger.info("Checking library: {}".format(lib["name"]))
-    '''if lib.get("clientreq") is True:
-        # this is old-style and required for the client
-        old_style_library_saver(lib)
-        continue
-    elif lib.get("serverreq") is not None or lib.get("downloads") is None:
-        # old-style but we don't need to download it
-        continue'''
-
-    if not do_get_library(lib.get("rules")):
-        logger.info("No need to download.")
+    lib = _as_library(lib)
+    if lib is None:
         return
 
-    native_classifier_to_download = None
-    logger.debug("Checking for natives...")
-    if lib.get("natives"):
-        logger.info("Checking for natives for {}bit system".format(("64" if is_os_64bit() else "32")))
-        # this library has natives attached to it
-        native_classifier_to_download = lib["natives"].get(system)
-        if native_classifier_to_download is not None:
-            native_classifier_to_download = java_esque_string_substitutor(
-                native_classifier_to_download,
-                arch=("64" if is_os_64bit() else "32")
-            )
-            logger.info("Found native")
-
-    if native_classifier_to_download is not None:
-        filepath = os.path.join(
-            nativesdir,
-            get_url_filename(lib["downloads"]["classifiers"][native_classifier_to_download]["path"])  # file name
-        )
+    if endpoints is None:
+        endpoints = get_default_endpoints()
+
+    if lib.native is not None:
+        filepath = get_native_download_path(lib, nativesdir)
         logger.debug("Downloading native to: '{}'".format(filepath))
 
-        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        download_verified(
+            endpoints.library_urls(lib.native.artifact.path, lib.native.artifact.url),
+            filepath,
+            lib.native.artifact.sha1,
+            raise_on_hash_mismatch,
+            policy
+        )
+
+        finish_native(lib, filepath)
+
+    filepath = get_artifact_download_path(lib, libdir)
+    if filepath is not None:
+        # get that file, cos it's not there yet
+        urls = endpoints.library_urls(lib.artifact.path, lib.artifact.url)
+        if lib.artifact.alt_url:
+            urls.append(lib.artifact.alt_url)
+
+        logger.info(
+            "Downloading artifact from: {} to: {}".format(urls, filepath))
 
-        chunked_file_download(
-            lib["downloads"]["classifiers"][native_classifier_to_download]["url"],
-            filepath
+        # a .pack.xz only has the unpacked jar's hash, so it can't be verified as it downloads
+        url = download_verified(urls, filepath, None if lib.xz_unpack else lib.artifact.sha1, raise_on_hash_mismatch, policy)
+
+        # mirrors serve the library as it's stored in libdir, so only the original URLs might need unpacking
+        finish_artifact(
+            lib,
+            filepath,
+            url == lib.artifact.alt_url,
+            unpack=url in (lib.artifact.url, lib.artifact.alt_url)
         )
 
-        if not verify_sha1(filepath, lib["downloads"]["classifiers"][native_classifier_to_download]["sha1"]):
-            logger.warning("Hashes don't match. Expected: {}".format(lib["downloads"]["classifiers"][native_classifier_to_download]["sha1"]))
-            if raise_on_hash_mismatch:
-                raise HashMatchError(lib, "Failed to download native as hashes don't match!")
 
-        logger.debug("download complete")
+def _as_library(lib):
+    """
+    :param lib: Library / dict (library JSON format)
+    :return: Library / None (if it isn't needed on this host)
+    """
+    if isinstance(lib, dict):
+        logger.info("Checking library: {}".format(lib["name"]))
+        lib = make_library(lib)
 
-        if lib.get("extract"):
-            exclude_from_extract = lib["extract"].get("exclude")
-            logger.debug("extracting files...")
+        if lib is None:
+            logger.info("No need to download.")
+    else:
+        logger.info("Checking library: {}".format(lib.name))
 
-            # extract the file
-            extract_file_to_directory(
-                filepath,
-                os.path.dirname(filepath),
-                exclude_from_extract
-            )
+    return lib
 
-            # clean up afterwards
-            os.remove(filepath)
-            logger.debug("done")
 
-    if lib["downloads"].get("artifact"):
-        filepath = os.path.join(
-            libdir,
-            *lib["downloads"]["artifact"]["path"].split("/")
-        )
-        if lib.get("fu_existence_guaranteed") in (None, False):
-            logger.debug("Checking if need to download artifact to: {}".format(filepath))
-            if not os.path.isfile(filepath):
-                # get that file, cos it's not there yet
-                using_alt_url = False
-
-                os.makedirs(os.path.dirname(filepath), exist_ok=True)
-
-                logger.info(
-                    "Downloading artifact from: {} to: {}".format(lib["downloads"]["artifact"]["url"], filepath))
-                try:
-                    chunked_file_download(
-                        lib["downloads"]["artifact"]["url"],
-                        filepath
-                    )
-                except HTTPError:
-                    if lib["downloads"]["artifact"].get("fu_alt_url"):
-                        # download from alt URL
-                        using_alt_url = True
-                        chunked_file_download(
-                            lib["downloads"]["artifact"]["fu_alt_url"],
-                            filepath
-                        )
-
-                if lib["downloads"]["artifact"].get("sha1") is not None:  # let's verify this file
-                    if not verify_sha1(filepath, lib["downloads"]["artifact"]["sha1"]):
-                        logger.warning("library file at: {} sha1 hash doesn't match".format(
-                            lib["downloads"]["artifact"]["sha1"]
-                        ))
-                        if raise_on_hash_mismatch:
-                            HashMatchError(lib)
-
-                logger.info("download complete")
-
-                if lib.get("extract") and lib["extract"].get("fu_xz_unpack") and (
-                        not using_alt_url or lib["extract"].get("fu_xz_unpack_on_alt_url")):
-                    logger.debug("unzipping .pack.xz file...")
-
-                    if os.path.isfile(filepath + ".pack.xz"):
-                        os.remove(filepath + ".pack.xz")
-
-                    if os.path.isfile(filepath + ".pack"):
-                        os.remove(filepath + ".pack")
-
-                    os.rename(filepath, filepath + ".pack.xz")
-                    extract_xz_to_file(
-                        filepath + ".pack.xz",
-                        filepath + ".pack"
-                    )
-                    os.remove(filepath + ".pack.xz")
-
-                    logger.debug("Unzipped, unpacking...")
-                    unpack200.unpack(
-                        filepath + ".pack",
-                        filepath,
-                        remove_source=True
-                    )
-
-                    logger.debug("done")
-
-
-def save_minecraft_asset(asset, assetname, assetsdir, raise_on_hash_mismatch=False):
+def get_native_download_path(lib, nativesdir):
     """
-    Downloads an asset into the correct locations
-    :param asset: dict
-    :param assetsdir: string
-    :param assetname: string, name of asset
-    :param raise_on_hash_mismatch: bool, whether to raise if the hash doesn't match
+    Gets where to download lib's native to (creating directories as needed)
+    :param lib: Library, with a native
+    :param nativesdir: string
+    :return: string
+    """
+    logger.info("Found native for {}bit system".format(("64" if is_os_64bit() else "32")))
+
+    filepath = os.path.join(
+        nativesdir,
+        get_url_filename(lib.native.artifact.path)  # file name
+    )
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+
+    return filepath
+
+
+def finish_native(lib, filepath):
+    """
+    Extracts a downloaded native (download_verified has already checked its hash)
+    :param lib: Library
+    :param filepath: string, where the native was downloaded to
     :return: None
     """
-    MINECRAFT_RESOURCES_ROOT = "https://resources.download.minecraft.net/"
+    native = lib.native
+
+    logger.debug("download complete")
+
+    if native.do_extract:
+        logger.debug("extracting files...")
+
+        # extract the file
+        extract_file_to_directory(
+            filepath,
+            os.path.dirname(filepath),
+            native.extract_exclude
+        )
 
-    path = (asset["hash"][:2], asset["hash"])
+        # clean up afterwards
+        os.remove(filepath)
+        logger.debug("done")
+
+
+def get_artifact_download_path(lib, libdir):
+    """
+    Gets where to download lib's artifact to (creating directories as needed)
+    :param lib: Library
+    :param libdir: string
+    :return: string / None, None if the artifact doesn't need to be downloaded
+    """
+    if lib.artifact is None or lib.artifact.url is None or lib.existence_guaranteed:
+        return None
 
     filepath = os.path.join(
-        assetsdir,
-        "objects",
-        *path
+        libdir,
+        *lib.artifact.path.split("/")
     )
 
-    url = MINECRAFT_RESOURCES_ROOT + "/".join(path)
+    logger.debug("Checking if need to download artifact to: {}".format(filepath))
+    if os.path.isfile(filepath):
+        return None
 
-    logger.debug("Downloading Asset from: {} to: {}".format(url, filepath))
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    return filepath
 
-    # download file
-    if not os.path.isfile(filepath):
-        chunked_file_download(
-            url,
-            filepath
+
+def finish_artifact(lib, filepath, using_alt_url=False, unpack=True):
+    """
+    Unpacks (if it's a .pack.xz) a downloaded library artifact. Plain jars were verified as they downloaded (see
+    download_verified), repacked ones don't match the hash of what was downloaded so can't be
+    :param lib: Library
+    :param filepath: string, where the artifact was downloaded to
+    :param using_alt_url: bool, whether it was downloaded from artifact.alt_url
+    :param unpack: bool, False if the file is known to be a plain jar (e.g. it came from a mirror)
+    :return: None
+    """
+    logger.info("download complete")
+
+    if unpack and lib.xz_unpack and (not using_alt_url or lib.xz_unpack_on_alt_url):
+        logger.debug("unzipping .pack.xz file...")
+
+        if os.path.isfile(filepath + ".pack.xz"):
+            os.remove(filepath + ".pack.xz")
+
+        if os.path.isfile(filepath + ".pack"):
+            os.remove(filepath + ".pack")
+
+        os.rename(filepath, filepath + ".pack.xz")
+        extract_xz_to_file(
+            filepath + ".pack.xz",
+            filepath + ".pack"
+        )
+        os.remove(filepath + ".pack.xz")
+
+        logger.debug("Unzipped, unpacking...")
+        import unpack200
+        unpack200.unpack(
+            filepath + ".pack",
+            filepath,
+            remove_source=True
         )
 
-        # check hash
-        if not verify_sha1(filepath, asset["hash"]):
-            logger.warning("Hash for asset doesn't match. Expected: {}".format(asset["hash"]))
-            if raise_on_hash_mismatch:
-                raise HashMatchError(asset, type="asset")
+        logger.debug("done")
 
-    # copy file
+
+def get_asset_path(asset, assetsdir, endpoints=None):
+    """
+    :param asset: dict
+    :param assetsdir: string
+    :param endpoints: Endpoints / None
+    :return: tuple<list<string>, string>, (urls, filepath)
+    """
+    filepath = os.path.join(
+        assetsdir,
+        "objects",
+        asset["hash"][:2],
+        asset["hash"]
+    )
+
+    return (endpoints or get_default_endpoints()).asset_urls(asset["hash"]), filepath
+
+
+def copy_legacy_asset(filepath, assetname, assetsdir):
+    """
+    Copies an asset into the legacy (virtual) assets directory
+    :param filepath: string, path to the asset object
+    :param assetname: string
+    :param assetsdir: string
+    :return: None
+    """
     legacy_path = os.path.join(
         assetsdir,
         "virtual",
@@ -239,3 +325,25 @@ def save_minecraft_asset(asset, assetname, assetsdir, raise_on_hash_mismatch=Fal
         os.makedirs(os.path.dirname(legacy_path), exist_ok=True)
 
         shutil.copyfile(filepath, legacy_path)
+
+
+def save_minecraft_asset(asset, assetname, assetsdir, raise_on_hash_mismatch=False, policy=None, endpoints=None):
+    """
+    Downloads an asset into the correct locations
+    :param asset: dict
+    :param assetsdir: string
+    :param assetname: string, name of asset
+    :param raise_on_hash_mismatch: bool, whether to raise if the hash doesn't match
+    :param policy: TransferPolicy / None, retry / timeout policy for the download
+    :param endpoints: Endpoints / None, where to download from (mirrors first), defaults to get_default_endpoints()
+    :return: None
+    """
+    urls, filepath = get_asset_path(asset, assetsdir, endpoints)
+
+    # download file
+    if not os.path.isfile(filepath):
+        logger.debug("Downloading Asset from: {} to: {}".format(urls, filepath))
+        download_verified(urls, filepath, asset["hash"], raise_on_hash_mismatch, policy)
+
+    # copy file
+    copy_legacy_asset(filepath, assetname, assetsdir)
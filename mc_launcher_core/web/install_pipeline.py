@@ -0,0 +1,133 @@
+"""
+Installing Minecraft (and optionally Forge) as a task DAG (see mc_launcher_core.pipeline) instead of one step after
+another:
+
+    version_json -> client_jar
+                 -> libraries
+                 -> asset_index -> assets
+                 -> logging_config
+    forge_installer -> forge_install -> forge_profile -> forge_libraries      (forge=True)
+                        version_json -^
+
+The Forge installer download doesn't depend on anything vanilla, so it runs alongside the vanilla downloads, and the
+assets (usually the longest stage) run alongside the jar, the libraries and all of Forge. Progress is checkpointed in
+<bindir>/.install_pipeline.json, so rerunning a crashed install picks up after the last completed task
+"""
+import os
+import json
+import shutil
+import logging
+import contextlib
+from mc_launcher_core.pipeline import Pipeline
+from mc_launcher_core.web import get_version_manifest_entry, save_minecraft_libs, save_minecraft_assets
+from mc_launcher_core.web.install import save_minecraft_jar, save_logging_config
+from mc_launcher_core.web.util import chunked_file_download
+
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_FILENAME = ".install_pipeline.json"
+WORKDIR_NAME = ".install_tmp"
+
+
+def make_install_pipeline(bindir, assetsdir, libdir, nativesdir, mcversion, forge=False, raise_on_hash_mismatch=False, policy=None, endpoints=None, workers=4, checkpoint=True):
+    """
+    Builds the install DAG, see the module docstring. Arguments are as for web.download_minecraft
+    :param forge: bool, whether to install Forge (the recommended / latest build for mcversion) too
+    :param workers: int, tasks run at once
+    :param checkpoint: bool, whether to checkpoint progress in bindir
+    :return: Pipeline
+    """
+    json_path = os.path.join(bindir, "minecraft.json")
+    assets_index_path = os.path.join(assetsdir, "indexes", "{}.json".format(mcversion))
+    workdir = os.path.join(bindir, WORKDIR_NAME)
+
+    def load_version_json():
+        with open(json_path) as f:
+            return json.load(f)
+
+    def version_json(_):
+        if not os.path.isfile(json_path):
+            logger.info("Saving Minecraft JSON")
+            chunked_file_download(get_version_manifest_entry(mcversion, policy)["url"], json_path, policy=policy)
+
+    def client_jar(_):
+        save_minecraft_jar(
+            mcversion, os.path.join(bindir, "minecraft.jar"), load_version_json()["downloads"]["client"]["sha1"],
+            raise_on_hash_mismatch, policy, endpoints
+        )
+
+    def libraries(_):
+        save_minecraft_libs(libdir, nativesdir, load_version_json()["libraries"], raise_on_hash_mismatch, policy, endpoints)
+
+    def asset_index(_):
+        if not os.path.isfile(assets_index_path):
+            logger.info("Saving assets index into: {}".format(assets_index_path))
+            chunked_file_download(load_version_json()["assetIndex"]["url"], assets_index_path, policy=policy)
+
+    def assets(_):
+        save_minecraft_assets(assets_index_path, assetsdir, raise_on_hash_mismatch, policy, endpoints)
+
+    def logging_config(_):
+        save_logging_config(assetsdir, load_version_json(), policy)
+
+    pipeline = Pipeline(
+        os.path.join(bindir, CHECKPOINT_FILENAME) if checkpoint else None,
+        key=dict(mcversion=mcversion, forge=forge, assetsdir=os.path.abspath(assetsdir), libdir=os.path.abspath(libdir)),
+        workers=workers
+    )
+
+    pipeline.add("version_json", version_json)
+    pipeline.add("client_jar", client_jar, ["version_json"])
+    pipeline.add("libraries", libraries, ["version_json"])
+    pipeline.add("asset_index", asset_index, ["version_json"])
+    pipeline.add("assets", assets, ["asset_index"])
+    pipeline.add("logging_config", logging_config, ["version_json"])
+
+    if forge:
+        from mc_launcher_core.forge_utils import merge_forge_library_requirements
+        from mc_launcher_core.forge_utils.install import install_forge_from_jar
+        from mc_launcher_core.forge_utils.web import download_forge_installer
+
+        def forge_installer(_):
+            # kept in bindir rather than a temporary directory, so a resumed install can still find it
+            return download_forge_installer(mcversion, workdir, policy)
+
+        def forge_install(results):
+            return install_forge_from_jar(results["forge_installer"], libdir)
+
+        def forge_profile(results):
+            merge_forge_library_requirements(results["forge_install"], bindir)
+
+        def forge_libraries(_):
+            with open(os.path.join(bindir, "modloader.json")) as f:
+                save_minecraft_libs(libdir, nativesdir, json.load(f)["libraries"], raise_on_hash_mismatch, policy, endpoints)
+
+        pipeline.add("forge_installer", forge_installer)
+        pipeline.add("forge_install", forge_install, ["forge_installer"])
+        pipeline.add("forge_profile", forge_profile, ["forge_install", "version_json"])
+        pipeline.add("forge_libraries", forge_libraries, ["forge_profile"])
+
+    return pipeline
+
+
+def run_install_pipeline(bindir, assetsdir, libdir, nativesdir, mcversion, forge=False, raise_on_hash_mismatch=False, policy=None, endpoints=None, workers=4, checkpoint=True, registry=None):
+    """
+    Installs Minecraft (and Forge) with make_install_pipeline
+    :param registry: CacheRegistry / None, registers the install and holds its cache lock while installing
+    :return: PipelineReport, per task timings and the critical path
+    """
+    logger.info("Installing Minecraft version: '{}'{} with bindir: '{}'".format(mcversion, " and Forge" if forge else "", bindir))
+    os.makedirs(bindir, exist_ok=True)
+
+    with (registry.using() if registry is not None else contextlib.nullcontext()):
+        report = make_install_pipeline(
+            bindir, assetsdir, libdir, nativesdir, mcversion, forge, raise_on_hash_mismatch, policy, endpoints, workers, checkpoint
+        ).run()
+
+        if registry is not None:
+            registry.register(bindir, mcversion)
+
+    shutil.rmtree(os.path.join(bindir, WORKDIR_NAME), ignore_errors=True)
+
+    return report
@@ -0,0 +1,271 @@
+"""
+Installing the Java runtimes Mojang publishes for Minecraft (the "javaVersion" component of a version JSON, e.g.
+"jre-legacy" or "java-runtime-gamma"), from the Java runtime manifest
+
+Layout (under runtimesdir):
+    objects/<sha1[:2]>/<sha1>              file contents, shared by every runtime that has the same file
+    <component>/<platform>/...             the runtime's tree, files are hard links into objects
+    <component>/<platform>/.installed.json written last, marks the runtime complete
+
+Files are downloaded in parallel, using the lzma-compressed variant (decompressed while it downloads) when there is one
+"""
+import os
+import json
+import shutil
+import hashlib
+import logging
+import platform
+from concurrent.futures import ThreadPoolExecutor
+from mc_launcher_core.exceptions import HashMatchError, JavaRuntimeNotFoundError
+from mc_launcher_core.models import get_host_system
+from mc_launcher_core.web.transfer import get_default_policy
+from mc_launcher_core.web.util import chunked_download, chunked_file_download
+
+
+logger = logging.getLogger(__name__)
+
+JAVA_RUNTIME_MANIFEST_URL = "https://launchermeta.mojang.com/v1/products/java-runtime/2ec0cc96c44e5a76b9c8b7c39df7210883d12871/all.json"
+INSTALLED_FILENAME = ".installed.json"
+
+_runtime_manifests = dict()  # url -> dict, populated on first use. Access using get_java_runtime_manifest()
+
+
+def get_runtime_platform(system=None, machine=None):
+    """
+    Gets the platform name the Java runtime manifest uses for this host, e.g. "linux", "windows-x64", "mac-os-arm64"
+    :param system: string / None, OS name as used by minecraft.json, defaults to the host's
+    :param machine: string / None, e.g. "x86_64", "AMD64", "arm64", defaults to the host's
+    :return: string
+    """
+    system = system or get_host_system()
+    machine = (machine or platform.machine()).lower()
+
+    if system == "windows":
+        if machine in ("arm64", "aarch64"):
+            return "windows-arm64"
+        return "windows-x64" if machine.endswith("64") else "windows-x86"
+
+    if system == "osx":
+        return "mac-os-arm64" if machine in ("arm64", "aarch64") else "mac-os"
+
+    return "linux" if machine.endswith("64") else "linux-i386"
+
+
+def get_java_executable(runtime_dir, runtime_platform=None):
+    """
+    :param runtime_dir: string, an installed runtime's directory
+    :param runtime_platform: string / None
+    :return: string, path to its Java executable
+    """
+    runtime_platform = runtime_platform or get_runtime_platform()
+
+    if runtime_platform.startswith("windows"):
+        return os.path.join(runtime_dir, "bin", "javaw.exe")
+    if runtime_platform.startswith("mac-os"):
+        return os.path.join(runtime_dir, "jre.bundle", "Contents", "Home", "bin", "java")
+    return os.path.join(runtime_dir, "bin", "java")
+
+
+def _fetch_json(url, policy):
+    from io import BytesIO
+    buffer = BytesIO()
+    chunked_download(url, buffer, policy=policy)
+    return json.loads(buffer.getvalue().decode("utf-8"))
+
+
+def get_java_runtime_manifest(policy=None, url=None):
+    """
+    Gets the list of Java runtimes for every platform, fetched once per process
+    :param policy: TransferPolicy / None
+    :param url: string / None, defaults to JAVA_RUNTIME_MANIFEST_URL
+    :return: dict<platform: dict<component: list<dict>>>
+    """
+    url = url or JAVA_RUNTIME_MANIFEST_URL
+    if url not in _runtime_manifests:
+        _runtime_manifests[url] = _fetch_json(url, policy or get_default_policy())
+
+    return _runtime_manifests[url]
+
+
+class _DecompressingWriter:
+    """
+    A stream for chunked_download that decompresses lzma / xz data into a file as it's written, hashing what comes out.
+    Rewinding it (for a retry) starts the file and hash again
+    """
+    def __init__(self, f):
+        self.f = f
+        self.seek(0)
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return 0
+
+    def seek(self, offset):
+        import lzma
+        self.decompressor = lzma.LZMADecompressor()
+        self.hasher = hashlib.sha1()
+        self.f.seek(offset)
+
+    def truncate(self):
+        self.f.truncate()
+
+    def write(self, data):
+        out = self.decompressor.decompress(data)
+        self.hasher.update(out)
+        self.f.write(out)
+
+    def hexdigest(self):
+        return self.hasher.hexdigest()
+
+
+def save_runtime_object(entry, objectsdir, policy=None, prefer_lzma=True):
+    """
+    Downloads a runtime file into the content-addressed objects directory, unless it's already there
+    :param entry: dict, a "file" from a runtime's manifest
+    :param objectsdir: string
+    :param policy: TransferPolicy / None
+    :param prefer_lzma: bool, whether to download the lzma-compressed variant when there is one
+    :return: string, path to the object
+    """
+    raw = entry["downloads"]["raw"]
+    path = os.path.join(objectsdir, raw["sha1"][:2], raw["sha1"])
+    if os.path.isfile(path):
+        return path
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+
+    try:
+        compressed = entry["downloads"].get("lzma") if prefer_lzma else None
+        if compressed is not None:
+            with open(tmp_path, 'wb') as f:
+                writer = _DecompressingWriter(f)
+                chunked_download(compressed["url"], writer, policy=policy, sha1=compressed["sha1"])
+
+            if writer.hexdigest() != raw["sha1"]:
+                raise HashMatchError(entry, "runtime", "Decompressed: {} has hash: {}, expected: {}".format(compressed["url"], writer.hexdigest(), raw["sha1"]))
+        else:
+            chunked_file_download(raw["url"], tmp_path, policy=policy, sha1=raw["sha1"])
+
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return path
+
+
+def _link_file(object_path, path, executable):
+    if os.path.lexists(path):
+        os.remove(path)
+
+    try:
+        os.link(object_path, path)
+    except OSError:
+        # different filesystems / no hard links
+        shutil.copyfile(object_path, path)
+
+    if executable:
+        os.chmod(path, 0o755)
+
+
+def get_runtime_dir(runtimesdir, component, runtime_platform=None):
+    """
+    :param runtimesdir: string
+    :param component: string, e.g. "java-runtime-gamma"
+    :param runtime_platform: string / None, defaults to the host's
+    :return: string
+    """
+    return os.path.join(runtimesdir, component, runtime_platform or get_runtime_platform())
+
+
+def get_installed_java_runtime(runtimesdir, component, runtime_platform=None):
+    """
+    Gets an installed runtime without going online
+    :param runtimesdir: string
+    :param component: string
+    :param runtime_platform: string / None
+    :return: dict<version, manifest_sha1, java>, None if it isn't installed
+    """
+    runtime_dir = get_runtime_dir(runtimesdir, component, runtime_platform)
+    try:
+        with open(os.path.join(runtime_dir, INSTALLED_FILENAME)) as f:
+            installed = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    installed["java"] = get_java_executable(runtime_dir, runtime_platform)
+    return installed
+
+
+def install_java_runtime(runtimesdir, component, runtime_platform=None, policy=None, workers=8, manifest_url=None, update=False, prefer_lzma=True):
+    """
+    Installs a Java runtime from the Java runtime manifest
+    :param runtimesdir: string
+    :param component: string, e.g. "jre-legacy", "java-runtime-gamma"
+    :param runtime_platform: string / None, defaults to the host's
+    :param policy: TransferPolicy / None
+    :param workers: int, files downloaded at once
+    :param manifest_url: string / None, defaults to JAVA_RUNTIME_MANIFEST_URL
+    :param update: bool, whether to check for a newer runtime if one is already installed (needs to go online)
+    :param prefer_lzma: bool
+    :return: string, path to the runtime's Java executable
+    """
+    runtime_platform = runtime_platform or get_runtime_platform()
+    runtime_dir = get_runtime_dir(runtimesdir, component, runtime_platform)
+
+    installed = get_installed_java_runtime(runtimesdir, component, runtime_platform)
+    if installed is not None and not update:
+        return installed["java"]
+
+    entries = get_java_runtime_manifest(policy, manifest_url).get(runtime_platform, dict()).get(component)
+    if not entries:
+        raise JavaRuntimeNotFoundError(component, "No Java runtime: {} for platform: {}".format(component, runtime_platform))
+    entry = entries[0]
+
+    if installed is not None and installed["manifest_sha1"] == entry["manifest"]["sha1"]:
+        return installed["java"]
+
+    logger.info("Installing Java runtime: {} {} for: {}".format(component, entry["version"]["name"], runtime_platform))
+    files = _fetch_json(entry["manifest"]["url"], policy or get_default_policy())["files"]
+
+    if os.path.exists(os.path.join(runtime_dir, INSTALLED_FILENAME)):
+        os.remove(os.path.join(runtime_dir, INSTALLED_FILENAME))
+
+    for name, f in sorted(files.items()):
+        if f["type"] == "directory":
+            os.makedirs(os.path.join(runtime_dir, *name.split("/")), exist_ok=True)
+
+    objectsdir = os.path.join(runtimesdir, "objects")
+
+    # runtimes repeat files (e.g. legal notices), each distinct file is downloaded once
+    by_sha1 = dict()  # sha1 -> list<tuple<name, file entry>>
+    for name, f in files.items():
+        if f["type"] == "file":
+            by_sha1.setdefault(f["downloads"]["raw"]["sha1"], []).append((name, f))
+
+    def install_files(named_entries):
+        object_path = save_runtime_object(named_entries[0][1], objectsdir, policy, prefer_lzma)
+        for name, f in named_entries:
+            path = os.path.join(runtime_dir, *name.split("/"))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _link_file(object_path, path, f.get("executable", False))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(install_files, named_entries) for named_entries in by_sha1.values()]
+        for future in futures:
+            future.result()
+
+    for name, f in files.items():
+        if f["type"] == "link":
+            path = os.path.join(runtime_dir, *name.split("/"))
+            if os.path.lexists(path):
+                os.remove(path)
+            os.symlink(f["target"], path)
+
+    with open(os.path.join(runtime_dir, INSTALLED_FILENAME), 'w') as f:
+        json.dump(dict(version=entry["version"]["name"], manifest_sha1=entry["manifest"]["sha1"]), f)
+
+    return get_java_executable(runtime_dir, runtime_platform)
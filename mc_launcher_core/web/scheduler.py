@@ -0,0 +1,303 @@
+"""
+Priority download scheduler: gets an install to the point it can be launched as soon as possible, then streams the
+rest of the assets in the background
+
+Downloads are split into priority classes, CRITICAL (jar, JSON, asset index, libraries, natives), LAUNCH (the assets
+needed to reach the main menu) and BACKGROUND (everything else). Workers always take the most important work first, and
+within a class they take turns between installs, so one big install can't starve the others. A shared BandwidthLimiter
+caps the total download rate of everything run through the scheduler, whichever policy each install uses
+"""
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+from mc_launcher_core.exceptions import DownloadCancelledError
+from mc_launcher_core.models import load_libraries
+from mc_launcher_core.web import download_minecraft_bin
+from mc_launcher_core.web.transfer import TransferPolicy, BandwidthLimiter
+from mc_launcher_core.web.util import chunked_file_download
+from mc_launcher_core.web.install import save_minecraft_lib, save_minecraft_asset, save_logging_config
+
+
+logger = logging.getLogger(__name__)
+
+CRITICAL = 0
+LAUNCH = 1
+BACKGROUND = 2
+PRIORITIES = (CRITICAL, LAUNCH, BACKGROUND)
+
+# assets needed to get to the main menu, anything else (sounds, music, other languages) can arrive later
+LAUNCH_CRITICAL_ASSET_PREFIXES = (
+    "icons/",
+    "pack.mcmeta",
+    "minecraft/lang/en_us",
+    "lang/en_US.lang",
+    "minecraft/font/",
+    "minecraft/textures/font/",
+    "minecraft/textures/gui/",
+    "minecraft/shaders/",
+    "minecraft/sounds.json",
+    "minecraft/sounds/ui/",
+    "realms/",
+)
+
+
+def is_launch_critical_asset(name):
+    """
+    The default launch-critical asset filter
+    :param name: string, asset name from the asset index
+    :return: bool
+    """
+    return name.startswith(LAUNCH_CRITICAL_ASSET_PREFIXES)
+
+
+class InstallHandle:
+    """
+    Tracks one install's tasks in a DownloadScheduler
+    """
+    def __init__(self, name):
+        self.name = name
+        self.errors = []  # list<tuple<description, Exception>>
+        self.started_at = time.monotonic()
+        self.launchable_at = None  # time.monotonic() when all CRITICAL and LAUNCH work finished
+        self.finished_at = None
+
+        self._queues = tuple(deque() for _ in PRIORITIES)
+        self._pending = [0 for _ in PRIORITIES]  # queued + running
+        self._completed = [0 for _ in PRIORITIES]
+        self._launchable = threading.Event()
+        self._done = threading.Event()
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def progress(self):
+        """
+        :return: dict<priority: tuple<completed, total>>
+        """
+        return {p: (self._completed[p], self._completed[p] + self._pending[p]) for p in PRIORITIES}
+
+    def wait_until_launchable(self, timeout=None):
+        """
+        Blocks until everything needed to launch has been downloaded
+        :param timeout: float / None
+        :return: bool, False if it timed out
+        """
+        return self._launchable.wait(timeout)
+
+    def wait(self, timeout=None):
+        """
+        Blocks until the whole install (background assets included) has finished
+        :param timeout: float / None
+        :return: bool, False if it timed out
+        """
+        return self._done.wait(timeout)
+
+    def _update_events(self):
+        if self._pending[CRITICAL] == 0 and self._pending[LAUNCH] == 0 and not self._launchable.is_set():
+            self.launchable_at = time.monotonic()
+            logger.info("Install: {} is launchable after {:.2f}s".format(self.name, self.launchable_at - self.started_at))
+            self._launchable.set()
+
+        if not any(self._pending) and not self._done.is_set():
+            self.finished_at = time.monotonic()
+            self._done.set()
+
+
+class DownloadScheduler:
+    """
+    Runs download tasks on a pool of worker threads, by priority class, taking turns between installs
+    """
+    def __init__(self, workers=8, bandwidth_limit=None, policy=None):
+        """
+        :param workers: int, downloads in flight at once
+        :param bandwidth_limit: int / None, bytes per second across all installs, attached to every policy run through
+        the scheduler (see use_policy)
+        :param policy: TransferPolicy / None, default policy for installs run through this scheduler
+        """
+        self.bandwidth = BandwidthLimiter(bandwidth_limit) if bandwidth_limit else None
+        self.policy = self.use_policy(policy or TransferPolicy())
+
+        self._installs = []  # list<InstallHandle> with queued work
+        self._turn = [0 for _ in PRIORITIES]  # round-robin position per priority
+        self._cond = threading.Condition()
+        self._shutdown = False
+
+        self._threads = [threading.Thread(target=self._worker, name="mc-download-{}".format(i), daemon=True) for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def use_policy(self, policy):
+        """
+        Attaches the scheduler's bandwidth limiter to a policy its installs will use. Raises ValueError if the policy
+        already has a different limiter, as the scheduler's cap couldn't be kept
+        :param policy: TransferPolicy
+        :return: TransferPolicy, policy
+        """
+        if self.bandwidth is None or policy.bandwidth is self.bandwidth:
+            return policy
+
+        if policy.bandwidth is not None:
+            raise ValueError("Policy already has a bandwidth limiter, give the scheduler a bandwidth_limit or the policy one, not both")
+
+        policy.bandwidth = self.bandwidth
+        return policy
+
+    def new_install(self, name):
+        """
+        :param name: string, used in logs
+        :return: InstallHandle
+        """
+        handle = InstallHandle(name)
+        with self._cond:
+            self._installs.append(handle)
+        return handle
+
+    def submit(self, handle, priority, description, func, *args):
+        """
+        Queues func(*args) for handle, once the scheduler is shut down the task fails with DownloadCancelledError instead
+        :param handle: InstallHandle
+        :param priority: int, CRITICAL / LAUNCH / BACKGROUND
+        :param description: string, used in logs and errors
+        :param func: callable
+        :return: None
+        """
+        with self._cond:
+            if self._shutdown:
+                handle.errors.append((description, DownloadCancelledError(description, "Scheduler was shut down")))
+                handle._update_events()
+                return
+
+            handle._queues[priority].append((description, func, args))
+            handle._pending[priority] += 1
+            if handle not in self._installs:
+                self._installs.append(handle)
+            self._cond.notify()
+
+    def _next_task(self):
+        """
+        Gets the next task, the most important class first, and within a class the next install in turn
+        (call with self._cond held)
+        :return: tuple<InstallHandle, priority, task> / None
+        """
+        for priority in PRIORITIES:
+            count = len(self._installs)
+            for i in range(count):
+                index = (self._turn[priority] + i) % count
+                handle = self._installs[index]
+                if handle._queues[priority]:
+                    self._turn[priority] = index + 1
+                    return handle, priority, handle._queues[priority].popleft()
+
+        return None
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._shutdown:
+                        return
+                    task = self._next_task()
+                    if task is not None:
+                        break
+                    self._cond.wait()
+
+            handle, priority, (description, func, args) = task
+            error = None
+            try:
+                func(*args)
+            except Exception as ex:
+                logger.error("Install: {} task: {} failed ({!r})".format(handle.name, description, ex))
+                error = ex
+
+            with self._cond:
+                if error is not None:
+                    handle.errors.append((description, error))
+                handle._pending[priority] -= 1
+                handle._completed[priority] += 1
+                handle._update_events()
+
+                if handle._done.is_set() and handle in self._installs:
+                    self._installs.remove(handle)
+
+    def shutdown(self, wait=True):
+        """
+        Stops the workers. Queued tasks are dropped and fail their installs with DownloadCancelledError, so waits on
+        the handles return once running tasks finish
+        :param wait: bool, whether to wait for running tasks to finish
+        :return: None
+        """
+        with self._cond:
+            self._shutdown = True
+
+            for handle in self._installs:
+                for priority in PRIORITIES:
+                    queue = handle._queues[priority]
+                    while queue:
+                        description, _, _ = queue.popleft()
+                        handle.errors.append((description, DownloadCancelledError(description, "Scheduler was shut down")))
+                        handle._pending[priority] -= 1
+                handle._update_events()
+
+            self._cond.notify_all()
+
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+
+def schedule_minecraft_install(scheduler, bindir, assetsdir, libdir, nativesdir, mcversion, raise_on_hash_mismatch=False, policy=None, launch_asset_filter=is_launch_critical_asset, endpoints=None):
+    """
+    Queues an install of Minecraft (like web.download_minecraft) on scheduler
+    Use handle.wait_until_launchable() to know when Minecraft can be launched, the remaining assets keep downloading
+    in the background until handle.wait() returns
+    :param scheduler: DownloadScheduler
+    :param bindir: string, path
+    :param assetsdir: string, path
+    :param libdir: string, path
+    :param nativesdir: string, path
+    :param mcversion: string, e.g. "1.7.10", "18w14b"
+    :param raise_on_hash_mismatch: bool
+    :param policy: TransferPolicy / None, defaults to the scheduler's policy, the scheduler's bandwidth limiter is
+    attached to it (see DownloadScheduler.use_policy)
+    :param launch_asset_filter: callable(asset name) -> bool, which assets are needed to reach the main menu
+    :param endpoints: Endpoints / None, where to download from (mirrors first)
+    :return: InstallHandle
+    """
+    policy = scheduler.policy if policy is None else scheduler.use_policy(policy)
+
+    handle = scheduler.new_install(mcversion)
+    assets_index_path = os.path.join(assetsdir, "indexes", "{}.json".format(mcversion))
+
+    def prepare():
+        download_minecraft_bin(bindir, mcversion, raise_on_hash_mismatch, policy, endpoints)
+
+        with open(os.path.join(bindir, 'minecraft.json')) as f:
+            minecraft_data = json.load(f)
+
+        for lib in load_libraries(minecraft_data["libraries"]):
+            scheduler.submit(handle, CRITICAL, lib.name, save_minecraft_lib, lib, libdir, nativesdir, raise_on_hash_mismatch, policy, endpoints)
+
+        scheduler.submit(handle, CRITICAL, "{} log config".format(mcversion), save_logging_config, assetsdir, minecraft_data, policy)
+
+        if not os.path.isfile(assets_index_path):
+            logger.info("Saving assets index into: {}".format(assets_index_path))
+            chunked_file_download(minecraft_data["assetIndex"]["url"], assets_index_path, policy=policy)
+
+        with open(assets_index_path) as f:
+            objects = json.load(f)["objects"]
+
+        for name, asset in objects.items():
+            scheduler.submit(
+                handle,
+                LAUNCH if launch_asset_filter(name) else BACKGROUND,
+                name,
+                save_minecraft_asset, asset, name, assetsdir, raise_on_hash_mismatch, policy, endpoints
+            )
+
+    scheduler.submit(handle, CRITICAL, "{} jar, JSON and asset index".format(mcversion), prepare)
+
+    return handle
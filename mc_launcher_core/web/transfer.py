@@ -0,0 +1,303 @@
+"""
+Transfer policy (timeouts, retries, backoff, circuit breaking) applied to every download
+"""
+import time
+import errno
+import random
+import socket
+import logging
+import threading
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlsplit
+from mc_launcher_core.exceptions import CircuitOpenError, HashMatchError
+
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_HTTP_CODES = (408, 425, 429, 500, 502, 503, 504)
+
+# errors writing the downloaded file, they say nothing about the host
+LOCAL_ERRNOS = (errno.ENOSPC, errno.EDQUOT, errno.EACCES, errno.EPERM, errno.EROFS, errno.EMFILE, errno.ENFILE, errno.EISDIR, errno.ENOTDIR)
+
+_default_policy = None
+
+
+class BandwidthLimiter:
+    """
+    Thread-safe token bucket limiting bytes per second. Share one between policies to cap them all together
+    """
+    def __init__(self, bytes_per_second, burst=None):
+        """
+        :param bytes_per_second: int
+        :param burst: int / None, bytes allowed back-to-back, defaults to a quarter of a second's worth
+        """
+        self.bytes_per_second = float(bytes_per_second)
+        self.burst = float(burst if burst is not None else max(64 * 1024, bytes_per_second // 4))
+
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, n):
+        """
+        Takes n bytes from the bucket (going into debt if need be)
+        :param n: int
+        :return: float, seconds the caller should wait before using them
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.bytes_per_second)
+            self._updated = now
+            self._tokens -= n
+
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.bytes_per_second
+
+    def consume(self, n):
+        """
+        Blocks until n bytes may be transferred
+        :param n: int
+        :return: None
+        """
+        delay = self.reserve(n)
+        if delay > 0:
+            time.sleep(delay)
+
+
+class _CircuitBreaker:
+    """
+    Per-host breaker: opens after <threshold> consecutive failures, lets a single trial request through after <cooldown>
+    """
+    def __init__(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+
+class TransferPolicy:
+    """
+    How downloads are made: connect / read timeouts, exponential backoff with jitter, a retry budget shared by all
+    downloads using this policy, and per-host circuit breaking. Share one policy between everything in an install
+    (or between installs) so the budget and breakers see all of the traffic
+    """
+    def __init__(self, connect_timeout=10.0, read_timeout=30.0, max_attempts=5, base_backoff=0.5, max_backoff=30.0,
+                 retry_budget_ratio=0.2, min_retries=10, breaker_threshold=5, breaker_cooldown=30.0, bandwidth=None):
+        """
+        :param connect_timeout: float, seconds to wait to connect
+        :param read_timeout: float, seconds to wait for any single read
+        :param max_attempts: int, attempts per download
+        :param base_backoff: float, seconds, first retry waits up to this long
+        :param max_backoff: float, seconds, cap on the backoff
+        :param retry_budget_ratio: float, retries allowed as a fraction of requests made (stops retry storms when a host is down)
+        :param min_retries: int, retries always allowed regardless of the ratio
+        :param breaker_threshold: int, consecutive failures to a host before its circuit opens (None to disable)
+        :param breaker_cooldown: float, seconds an open circuit waits before letting a trial request through
+        :param bandwidth: BandwidthLimiter / None, caps the download rate
+        """
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.retry_budget_ratio = retry_budget_ratio
+        self.min_retries = min_retries
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.bandwidth = bandwidth
+
+        self.requests = 0
+        self.retries = 0
+        self._breakers = dict()  # host -> _CircuitBreaker
+        self._lock = threading.Lock()
+
+    def _breaker(self, host):
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = self._breakers[host] = _CircuitBreaker()
+        return breaker
+
+    def before_request(self, url):
+        """
+        Call before each attempt, raises CircuitOpenError if the host's circuit is open. Every attempt it lets through
+        must be followed by end_request(), however it ends
+        :param url: string
+        :return: bool, whether the attempt is the trial request of a half open circuit
+        """
+        host = urlsplit(url).netloc
+
+        with self._lock:
+            self.requests += 1
+
+            if self.breaker_threshold is None:
+                return False
+
+            breaker = self._breaker(host)
+            if breaker.opened_at is None:
+                return False
+
+            if time.monotonic() - breaker.opened_at < self.breaker_cooldown or breaker.trial_in_flight:
+                raise CircuitOpenError(host, "Circuit for host: {} is open after {} failures".format(host, breaker.failures))
+
+            # half open, let this one through to see if the host has recovered
+            breaker.trial_in_flight = True
+            return True
+
+    def end_request(self, url, trial):
+        """
+        Call once an attempt has ended (succeeded, failed or was cancelled), so a trial that ended without telling
+        whether the host has recovered doesn't hold the circuit open for good
+        :param url: string
+        :param trial: bool, what before_request() returned
+        :return: None
+        """
+        if not trial:
+            return
+
+        with self._lock:
+            breaker = self._breakers.get(urlsplit(url).netloc)
+            if breaker is not None:
+                # still open, the next request after this one gets to be the trial
+                breaker.trial_in_flight = False
+
+    def record_success(self, url):
+        """
+        :param url: string
+        :return: None
+        """
+        with self._lock:
+            breaker = self._breakers.get(urlsplit(url).netloc)
+            if breaker is not None:
+                breaker.failures = 0
+                breaker.opened_at = None
+                breaker.trial_in_flight = False
+
+    def record_failure(self, url, ex):
+        """
+        :param url: string
+        :param ex: Exception
+        :return: None
+        """
+        if isinstance(ex, CircuitOpenError) or self.is_local_error(ex):
+            return
+
+        if isinstance(ex, HashMatchError) or isinstance(ex, HTTPError) and ex.code not in RETRYABLE_HTTP_CODES:
+            # the host answered properly (e.g. 404), it's not unhealthy
+            self.record_success(url)
+            return
+
+        if not self.is_retryable(ex):
+            return
+
+        host = urlsplit(url).netloc
+        with self._lock:
+            if self.breaker_threshold is None:
+                return
+
+            breaker = self._breaker(host)
+            breaker.failures += 1
+            breaker.trial_in_flight = False
+
+            if breaker.failures >= self.breaker_threshold:
+                if breaker.opened_at is None:
+                    logger.warning("Too many failures downloading from: {}, opening circuit".format(host))
+                breaker.opened_at = time.monotonic()
+
+    @staticmethod
+    def is_local_error(ex):
+        """
+        Whether a failed attempt failed on this machine (e.g. the disk is full) rather than talking to the host
+        :param ex: Exception
+        :return: bool
+        """
+        if not isinstance(ex, OSError) or isinstance(ex, (URLError, socket.timeout, ConnectionError)):
+            return False
+        return ex.filename is not None or ex.errno in LOCAL_ERRNOS
+
+    @classmethod
+    def is_retryable(cls, ex):
+        """
+        Whether a failed attempt is worth retrying
+        :param ex: Exception
+        :return: bool
+        """
+        from http.client import HTTPException
+
+        if isinstance(ex, HTTPError):
+            return ex.code in RETRYABLE_HTTP_CODES
+        if cls.is_local_error(ex):
+            return False
+        return isinstance(ex, (URLError, socket.timeout, ConnectionError, HTTPException, HashMatchError, OSError))
+
+    def retry_delay(self, attempt, ex):
+        """
+        Decides whether to retry after a failed attempt
+        :param attempt: int, number of attempts made so far
+        :param ex: Exception, why the attempt failed
+        :return: float / None, seconds to wait before retrying, or None to give up
+        """
+        if attempt >= self.max_attempts or not self.is_retryable(ex) or isinstance(ex, CircuitOpenError):
+            return None
+
+        with self._lock:
+            if self.retries >= self.min_retries + self.retry_budget_ratio * self.requests:
+                logger.warning("Retry budget exhausted, not retrying ({!r})".format(ex))
+                return None
+            self.retries += 1
+
+        if isinstance(ex, HTTPError) and ex.code == 429 and ex.headers is not None:
+            retry_after = ex.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return min(float(retry_after), self.max_backoff)
+
+        # "full jitter"
+        return random.uniform(0, min(self.max_backoff, self.base_backoff * (2 ** (attempt - 1))))
+
+    def call(self, url, func):
+        """
+        Runs func() (a single attempt at transferring url) under this policy
+        :param url: string
+        :param func: callable
+        :return: whatever func returns
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            trial = self.before_request(url)
+
+            try:
+                result = func()
+            except Exception as ex:
+                self.record_failure(url, ex)
+
+                delay = self.retry_delay(attempt, ex)
+                if delay is None:
+                    raise
+
+                logger.info("Download of: {} failed ({!r}), retrying in {:.2f}s (attempt: {})".format(url, ex, delay, attempt))
+            else:
+                self.record_success(url)
+                return result
+            finally:
+                self.end_request(url, trial)
+
+            time.sleep(delay)
+
+
+def get_default_policy():
+    """
+    Gets the process-wide TransferPolicy, used when no policy is given
+    :return: TransferPolicy
+    """
+    global _default_policy
+    if _default_policy is None:
+        _default_policy = TransferPolicy()
+
+    return _default_policy
+
+
+def set_default_policy(policy):
+    """
+    :param policy: TransferPolicy
+    :return: None
+    """
+    global _default_policy
+    _default_policy = policy
@@ -3,40 +3,110 @@ web utilities
 """
 import os
 import hashlib
-from urllib import request
+import itertools
+from mc_launcher_core.exceptions import HashMatchError, DownloadInterruptedError
+from mc_launcher_core.models import get_download_url_path_for_minecraft_lib
+from mc_launcher_core.web.transfer import get_default_policy
 
 
-def chunked_download(url, stream, chunk_size=(16*1024)):
+_tmp_counter = itertools.count()
+
+
+def get_tmp_path(path):
+    """
+    Gets a temporary path next to path to download into, unique to this call (concurrent downloads of the same file in
+    one process, e.g. two assets with the same hash, each get their own)
+    :param path: string
+    :return: string
+    """
+    return "{}.{}.{}.tmp".format(path, os.getpid(), next(_tmp_counter))
+
+
+def _set_read_timeout(response, timeout):
+    """
+    urlopen's timeout covers connecting, switch the socket over to the read timeout once connected
     """
-    download from URL in chunks, and write to a stream
+    try:
+        response.fp.raw._sock.settimeout(timeout)
+    except AttributeError:
+        pass
+
+
+def chunked_download(url, stream, chunk_size=(16*1024), policy=None, sha1=None):
+    """
+    download from URL in chunks, and write to a stream. Failed attempts are retried according to policy
     :param url: string
     :param stream: File / writable, anything that can be written to (NOTE: files should be opened with 'wb' parameter
     :param chunk_size: int, size of chunks to read
+    :param policy: TransferPolicy / None, defaults to the process-wide policy
+    :param sha1: string / None, expected sha1 of the content, a mismatch raises HashMatchError (and is retried)
     :return: None
     """
-    response = request.urlopen(url)
-    while True:
-        chunk = response.read(chunk_size)
-        if not chunk:
-            break
+    if policy is None:
+        policy = get_default_policy()
+
+    start = stream.tell() if getattr(stream, "seekable", lambda: False)() else None
 
-        stream.write(chunk)
+    def attempt():
+        if start is not None:
+            # throw away anything written by a previous attempt
+            stream.seek(start)
+            stream.truncate()
 
+        hasher = hashlib.sha1() if sha1 is not None else None
+        written = 0
 
-def chunked_file_download(url, path, chunk_size=(16*1024), makedirs=True):
+        try:
+            from urllib import request
+            response = request.urlopen(url, timeout=policy.connect_timeout)
+            with response:
+                _set_read_timeout(response, policy.read_timeout)
+                while True:
+                    chunk = response.read(chunk_size)
+                    if not chunk:
+                        break
+
+                    if policy.bandwidth is not None:
+                        policy.bandwidth.consume(len(chunk))
+                    if hasher is not None:
+                        hasher.update(chunk)
+                    stream.write(chunk)
+                    written += len(chunk)
+        except Exception:
+            if written and start is None:
+                # can't rewind the stream, so can't retry
+                raise DownloadInterruptedError(url, "Download of: {} failed after {} bytes and the stream can't be rewound".format(url, written))
+            raise
+
+        if hasher is not None and hasher.hexdigest() != sha1:
+            raise HashMatchError(url, "download", "Hash of: {} is {}, expected: {}".format(url, hasher.hexdigest(), sha1))
+
+    policy.call(url, attempt)
+
+
+def chunked_file_download(url, path, chunk_size=(16*1024), makedirs=True, policy=None, sha1=None):
     """
-    download from URL in chunks, and write to a file
+    download from URL in chunks, and write to a file. It's downloaded to a temporary file that replaces path once complete
+    (and verified), so path never holds a partial download
     :param url: string
     :param path: string, absolute path to file
     :param chunk_size: int, size of chunks to read
     :param makedirs: bool, whether or not to make the directories required for this file
+    :param policy: TransferPolicy / None, defaults to the process-wide policy
+    :param sha1: string / None, expected sha1 of the file, a mismatch raises HashMatchError (and is retried)
     :return: None
     """
     if makedirs:
         os.makedirs(os.path.dirname(path), exist_ok=True)
 
-    with open(path, 'wb') as f:
-        chunked_download(url, f, chunk_size)
+    tmp_path = get_tmp_path(path)
+    try:
+        with open(tmp_path, 'wb') as f:
+            chunked_download(url, f, chunk_size, policy, sha1)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
 
 
 def get_sha1_hash(stream):
@@ -67,42 +137,6 @@ def verify_sha1(file, hash):
         return get_sha1_hash(f) == hash
 
 
-def get_download_url_path_for_minecraft_lib(descriptor):
-    """
-    Gets the URL path for a library based on it's name
-    :param descriptor: string, e.g. "com.typesafe.akka:akka-actor_2.11:2.3.3"
-    :return: string
-    """
-    ext = "jar"
-
-    pts = descriptor.split(":")
-    domain = pts[0]
-    name = pts[1]
-
-    last = len(pts) - 1
-    if "@" in pts[last]:
-        idx = pts[last].index("@")
-        ext = pts[last][idx+1:]
-        pts[last] = pts[last][0:idx+1]
-
-    version = pts[2]
-
-    classifier = None
-    if len(pts) > 3:
-        classifier = pts[3]
-
-    file = name + "-" + version
-
-    if classifier is not None:
-        file += "-" + classifier
-
-    file += "." + ext
-
-    path = domain.replace(".", "/") + "/" + name + "/" + version + "/" + file
-
-    return path
-
-
 def get_download_url_for_minecraft_lib(libname, base_url="https://libraries.minecraft.net/"):
     # TODO: this probably shouldn't exist
     """
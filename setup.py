@@ -16,5 +16,8 @@ setup(
     ],
     keywords="minecraft mod launcher",
     packages=find_packages(exclude=[".idea", "*.ignore*"]),
-    py_modules=["mc_launcher_core"]
+    py_modules=["mc_launcher_core"],
+    entry_points={
+        "console_scripts": ["mc-launcher-core=mc_launcher_core.cli:main"]
+    }
 )
@@ -0,0 +1,94 @@
+"""
+A local stand-in for the Mojang auth server (authenticate / validate / refresh), for the auth tests
+"""
+import json
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+DROP = "drop"  # a scripted response that closes the connection without answering
+
+
+def _session(username, n):
+    profile = dict(id="{}-id".format(username), name=username)
+    return dict(
+        accessToken="{}-token-{}".format(username, n),
+        clientToken="client-token",
+        selectedProfile=profile,
+        availableProfiles=[profile],
+        user=dict(id="{}-user".format(username))
+    )
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8"))
+        response = self.server.fake.handle(self.path, payload)
+
+        if response == DROP:
+            self.close_connection = True
+            return
+
+        status, body, headers = response
+        data = json.dumps(body).encode("utf-8") if body is not None else b""
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class FakeAuthServer:
+    """
+    Logs anyone in, unless responses are scripted for an endpoint with script()
+    """
+    def __init__(self):
+        self.requests = []  # list<tuple<path, payload, time.monotonic()>>
+        self._scripts = dict()  # path -> list<response>
+        self._lock = threading.Lock()
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.fake = self
+
+    @property
+    def url(self):
+        return "http://127.0.0.1:{}".format(self._httpd.server_address[1])
+
+    def script(self, path, *responses):
+        """
+        Queues responses for path, each DROP or tuple<status, body, headers>
+        """
+        with self._lock:
+            self._scripts.setdefault(path, []).extend(responses)
+
+    def requests_to(self, path):
+        return [r for r in self.requests if r[0] == path]
+
+    def handle(self, path, payload):
+        with self._lock:
+            self.requests.append((path, payload, time.monotonic()))
+            scripted = self._scripts.get(path)
+            if scripted:
+                return scripted.pop(0)
+            n = len(self.requests)
+
+        if path == "/authenticate":
+            return 200, _session(payload["username"], n), dict()
+        if path == "/validate":
+            return 204, None, dict()
+        if path == "/refresh":
+            return 200, _session(payload["accessToken"].split("-token-")[0], n), dict()
+        return 404, dict(error="Not Found"), dict()
+
+    def __enter__(self):
+        threading.Thread(target=self._httpd.serve_forever, args=(0.05,), daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._httpd.shutdown()
+        self._httpd.server_close()
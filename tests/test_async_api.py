@@ -0,0 +1,87 @@
+import os
+import asyncio
+import hashlib
+import shutil
+import tempfile
+import threading
+import unittest
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from mc_launcher_core.exceptions import HashMatchError
+from mc_launcher_core.web import async_api
+from mc_launcher_core.web.async_http import AsyncHTTPClient
+from mc_launcher_core.web.endpoints import Endpoints
+from mc_launcher_core.web.transfer import TransferPolicy
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        data = self.server.files.get(self.path)
+        if data is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class AsyncDownloadTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.data = b"asset contents"
+        self.hash = hashlib.sha1(self.data).hexdigest()
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.httpd.files = {
+            "/mirror/{}/{}".format(self.hash[:2], self.hash): b"corrupt copy!!",
+            "/cdn/{}/{}".format(self.hash[:2], self.hash): self.data,
+        }
+        self.httpd.requests = []
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.url = "http://127.0.0.1:{}/".format(self.httpd.server_address[1])
+
+    def tearDown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        shutil.rmtree(self.root)
+
+    def _run(self, coroutine_function):
+        async def run():
+            async with AsyncHTTPClient(policy=TransferPolicy(max_attempts=2, base_backoff=0.01)) as client:
+                return await coroutine_function(client)
+        return asyncio.run(run())
+
+    def test_corrupt_mirror_falls_back_to_the_next_source(self):
+        endpoints = Endpoints([self.url + "mirror/", self.url + "cdn/"])
+        asset = dict(hash=self.hash, size=len(self.data))
+
+        self._run(lambda client: async_api.save_minecraft_asset(asset, "a.txt", self.root, client=client, endpoints=endpoints))
+
+        with open(os.path.join(self.root, "objects", self.hash[:2], self.hash), 'rb') as f:
+            self.assertEqual(f.read(), self.data)
+        self.assertEqual(self.httpd.requests.count("/mirror/{}/{}".format(self.hash[:2], self.hash)), 2)
+
+    def test_raises_when_no_source_matches(self):
+        path = os.path.join(self.root, "a")
+        urls = [self.url + "mirror/{}/{}".format(self.hash[:2], self.hash)]
+
+        with self.assertRaises(HashMatchError):
+            self._run(lambda client: async_api.download_verified(urls, path, self.hash, True, client))
+        self.assertFalse(os.path.exists(path))
+
+    def test_jar_attempts_are_left_to_the_policy(self):
+        self.httpd.files["/versions/1.0/1.0.jar"] = b"corrupt jar"
+        endpoints = Endpoints(versions_roots=[self.url + "versions/"])
+        path = os.path.join(self.root, "minecraft.jar")
+
+        with self.assertRaises(HashMatchError):
+            self._run(lambda client: async_api.save_minecraft_jar("1.0", path, self.hash, True, client, endpoints))
+        self.assertEqual(self.httpd.requests.count("/versions/1.0/1.0.jar"), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
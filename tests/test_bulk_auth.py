@@ -0,0 +1,90 @@
+import time
+import unittest
+from fake_authserver import FakeAuthServer
+from mc_launcher_core.exceptions import InvalidLoginError, RateLimitedError
+from mc_launcher_core.web.bulk_auth import BulkAuthenticator, RateLimiter
+
+
+class RateLimiterTest(unittest.TestCase):
+    def test_rejects_non_positive_rates(self):
+        for rate in (0, -1):
+            with self.assertRaises(ValueError):
+                RateLimiter(rate)
+        with self.assertRaises(ValueError):
+            RateLimiter(1, burst=0)
+
+    def test_spaces_out_requests_after_the_burst(self):
+        limiter = RateLimiter(20, burst=2)
+        start = time.monotonic()
+        for _ in range(6):
+            limiter.acquire()
+        # 2 straight away, then one every 50ms
+        self.assertGreaterEqual(time.monotonic() - start, 0.19)
+
+    def test_pause_holds_everyone(self):
+        limiter = RateLimiter(1000, burst=5)
+        limiter.pause(0.2)
+        start = time.monotonic()
+        limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.19)
+
+
+class BulkAuthenticatorTest(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeAuthServer().__enter__()
+
+    def tearDown(self):
+        self.server.__exit__()
+
+    def _authenticator(self, **kwargs):
+        kwargs.setdefault("rate", 1000)
+        kwargs.setdefault("burst", 100)
+        return BulkAuthenticator(authserver=self.server.url, base_backoff=0.01, max_backoff=0.05, **kwargs)
+
+    def test_concurrent_logins(self):
+        accounts = [("bot{}".format(i), "password") for i in range(20)]
+        results = self._authenticator(max_workers=8).authenticate_all(accounts)
+
+        self.assertEqual(list(results), [username for username, _ in accounts])
+        self.assertTrue(all(r.ok and r.attempts == 1 for r in results.values()))
+        self.assertEqual(results["bot3"].response["selectedProfile"]["name"], "bot3")
+        self.assertEqual(len(self.server.requests_to("/authenticate")), 20)
+
+    def test_logins_are_rate_limited(self):
+        start = time.monotonic()
+        self._authenticator(rate=20, burst=1, max_workers=8).authenticate_all([("bot{}".format(i), "password") for i in range(5)])
+        self.assertGreaterEqual(time.monotonic() - start, 0.19)
+
+    def test_retry_after_pauses_logins(self):
+        self.server.script("/authenticate", (429, dict(error="TooManyRequestsException"), {"Retry-After": "0.3"}))
+        result = self._authenticator().authenticate("bot", "password")
+
+        self.assertTrue(result.ok)
+        self.assertEqual(result.attempts, 2)
+        first, second = self.server.requests_to("/authenticate")
+        self.assertGreaterEqual(second[2] - first[2], 0.29)
+
+    def test_failures_dont_abort_the_batch(self):
+        self.server.script(
+            "/authenticate",
+            (403, dict(error="ForbiddenOperationException"), dict()),
+            (503, None, dict())
+        )
+        results = self._authenticator(max_workers=1, max_attempts=3).authenticate_all([("bad", "x"), ("flaky", "y"), ("good", "z")])
+
+        self.assertIsInstance(results["bad"].error, InvalidLoginError)
+        self.assertEqual(results["bad"].attempts, 1)
+        self.assertTrue(results["flaky"].ok)
+        self.assertEqual(results["flaky"].attempts, 2)
+        self.assertTrue(results["good"].ok)
+
+    def test_gives_up_after_max_attempts(self):
+        self.server.script("/authenticate", *[(429, None, {"Retry-After": "0"})] * 3)
+        result = self._authenticator(max_attempts=3).authenticate("bot", "password")
+
+        self.assertIsInstance(result.error, RateLimitedError)
+        self.assertEqual(result.attempts, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
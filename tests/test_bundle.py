@@ -0,0 +1,93 @@
+import os
+import json
+import shutil
+import tempfile
+import hashlib
+import unittest
+from unittest import mock
+import mc_launcher_core.bundle as bundle
+from mc_launcher_core.bundle import export_bundle, import_bundle
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+class ImportBundleTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        src = os.path.join(self.root, "src")
+        _write(os.path.join(src, "bin", "minecraft.json"), json.dumps(dict(id="1.0", libraries=[])).encode())
+        _write(os.path.join(src, "bin", "minecraft.jar"), b"client jar")
+        _write(os.path.join(src, "assets", "indexes", "1.0.json"), json.dumps(dict(objects=dict())).encode())
+
+        self.bundle_path = os.path.join(self.root, "install.bundle")
+        export_bundle(self.bundle_path, os.path.join(src, "bin"), os.path.join(src, "lib"), os.path.join(src, "assets"), "1.0")
+
+        self.dst = os.path.join(self.root, "dst")
+        self.jar_path = os.path.join(self.dst, "bin", "minecraft.jar")
+        _write(self.jar_path, b"x" * len(b"client jar"))
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def _import(self, verify):
+        import_bundle(self.bundle_path, *(os.path.join(self.dst, d) for d in ("bin", "lib", "assets")), verify=verify)
+        with open(self.jar_path, 'rb') as f:
+            return f.read()
+
+    def test_replaces_corrupt_file_of_the_same_size(self):
+        self.assertEqual(self._import(verify=True), b"client jar")
+
+    def test_keeps_file_of_the_same_size_without_verify(self):
+        self.assertEqual(self._import(verify=False), b"x" * len(b"client jar"))
+
+
+class SharedAssetsTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.src = os.path.join(self.root, "src")
+        data = b"shared asset"
+        self.hash = hashlib.sha1(data).hexdigest()
+        objects = {"sounds/{}.ogg".format(i): dict(hash=self.hash, size=len(data)) for i in range(40)}
+
+        _write(os.path.join(self.src, "bin", "minecraft.json"), json.dumps(dict(id="1.0", libraries=[])).encode())
+        _write(os.path.join(self.src, "assets", "indexes", "1.0.json"), json.dumps(dict(objects=objects)).encode())
+        _write(os.path.join(self.src, "assets", "objects", self.hash[:2], self.hash), data)
+        self.bundle_path = os.path.join(self.root, "install.bundle")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def _export(self):
+        return export_bundle(self.bundle_path, *(os.path.join(self.src, d) for d in ("bin", "lib", "assets")), "1.0")
+
+    def _import_many(self):
+        for i in range(10):
+            dst = os.path.join(self.root, "dst{}".format(i))
+            import_bundle(self.bundle_path, *(os.path.join(dst, d) for d in ("bin", "lib", "assets")), workers=16, verify=False)
+            self.assertTrue(os.path.isfile(os.path.join(dst, "assets", "objects", self.hash[:2], self.hash)))
+            self.assertEqual([f for f in os.listdir(os.path.join(dst, "assets", "objects", self.hash[:2])) if f.endswith(".tmp")], [])
+
+    def test_shared_object_is_exported_once(self):
+        index = self._export()
+        self.assertEqual(sum(1 for _, path, _ in index["files"] if path.startswith("objects/")), 1)
+        self._import_many()
+
+    def test_import_dedupes_repeated_destinations(self):
+        collect = bundle.collect_install_files
+
+        def with_duplicates(*args):
+            files = collect(*args)
+            return files + [f for f in files if f[1].startswith("objects/")] * 39
+
+        with mock.patch.object(bundle, "collect_install_files", with_duplicates):
+            index = self._export()
+        self.assertEqual(sum(1 for _, path, _ in index["files"] if path.startswith("objects/")), 40)
+        self._import_many()
+
+
+if __name__ == "__main__":
+    unittest.main()
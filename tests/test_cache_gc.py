@@ -0,0 +1,69 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from mc_launcher_core.cache_gc import CacheRegistry
+from mc_launcher_core.exceptions import InstallEvictedError
+from mc_launcher_core.launch import build_commands
+from mc_launcher_core.profiles import is_evicted
+from mc_launcher_core.verify import Problem, verify_install
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+class EvictionTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.libdir = os.path.join(self.root, "libraries")
+        self.assetsdir = os.path.join(self.root, "assets")
+        self.registry = CacheRegistry(self.libdir, self.assetsdir)
+
+        for i, version in enumerate(("old", "new")):
+            bindir = os.path.join(self.root, "versions", version)
+            lib = dict(name="test:lib{}:1".format(i), downloads=dict(artifact=dict(
+                path="test/lib{}.jar".format(i), url="", sha1="0" * 40, size=1000
+            )))
+            _write(os.path.join(bindir, "minecraft.json"), json.dumps(dict(id=version, libraries=[lib])).encode())
+            _write(os.path.join(bindir, "minecraft.jar"), b"")
+            _write(os.path.join(self.libdir, "test", "lib{}.jar".format(i)), b"x" * 1000)
+            self.registry.register(bindir, version)
+
+        installs = self.registry.installs()
+        installs[os.path.join(self.root, "versions", "old")]["last_used"] -= 60
+        self.registry._write(dict(installs=installs))
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_evicted_install_is_marked(self):
+        old = os.path.join(self.root, "versions", "old")
+
+        report = self.registry.collect(quota=1500, grace=0)
+
+        self.assertEqual(report.evicted, [old])
+        self.assertFalse(os.path.isfile(os.path.join(self.libdir, "test", "lib0.jar")))
+        self.assertTrue(is_evicted(old))
+        self.assertFalse(is_evicted(os.path.join(self.root, "versions", "new")))
+
+        with self.assertRaises(InstallEvictedError):
+            build_commands(old, self.root, self.assetsdir, "java", None, 1024, self.libdir)
+
+        _, problems = verify_install(old, self.libdir, self.assetsdir, "old")
+        self.assertEqual(problems[0].kind, Problem.EVICTED)
+
+        # reinstalling registers it again
+        self.registry.register(old, "old")
+        self.assertFalse(is_evicted(old))
+
+    def test_dry_run_doesnt_mark(self):
+        self.registry.collect(quota=1500, grace=0, dry_run=True)
+        self.assertFalse(is_evicted(os.path.join(self.root, "versions", "old")))
+
+
+if __name__ == "__main__":
+    unittest.main()
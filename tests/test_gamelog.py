@@ -0,0 +1,66 @@
+import time
+import shutil
+import tempfile
+import unittest
+from mc_launcher_core.gamelog import GameLogStore, GameLogWriter, LaunchMetrics, LogEvent
+
+
+class LaunchMetricsTest(unittest.TestCase):
+    def _phases(self, events):
+        metrics = LaunchMetrics("test", 0)
+        for ms, message in events:
+            metrics.observe(LogEvent(ms, "INFO", message))
+        return metrics.phases
+
+    def test_fabric_mod_loading_ends_after_initialisers(self):
+        phases = self._phases([
+            (1000, "Loading Minecraft 1.20.1 with Fabric Loader 0.14.21"),
+            (1100, "Loading 40 mods:"),
+            (4000, "Backend library: LWJGL version 3.3.1 SNAPSHOT"),
+            (9000, "Sound engine started"),
+        ])
+        self.assertEqual(phases, dict(jvm_start=1.0, mod_loading=3.0, main_menu=9.0))
+
+    def test_forge_mod_loading_ignores_fabric_markers(self):
+        phases = self._phases([
+            (1000, "ModLauncher running: args [--version, 1.20.1]"),
+            (2000, "Backend library: LWJGL version 3.3.1 SNAPSHOT"),
+            (6000, "Mod loading complete"),
+        ])
+        self.assertEqual(phases["mod_loading"], 5.0)
+
+
+class GameLogWriterTest(unittest.TestCase):
+    def setUp(self):
+        self.logdir = tempfile.mkdtemp()
+        self.store = GameLogStore(self.logdir)
+
+    def tearDown(self):
+        shutil.rmtree(self.logdir)
+
+    def test_events_before_a_pause_are_readable(self):
+        writer = GameLogWriter(self.store, "test", flush_seconds=0.05)
+        try:
+            for i in range(3):
+                writer.write(LogEvent(1700000000000 + i, "INFO", "message {}".format(i)))
+
+            # nothing else is written, as when the game hangs
+            deadline = time.monotonic() + 5
+            while not list(self.store.search(launch="test")) and time.monotonic() < deadline:
+                time.sleep(0.02)
+
+            self.assertEqual([r["message"] for r in self.store.search(launch="test")], ["message 0", "message 1", "message 2"])
+        finally:
+            writer.close()
+
+    def test_close_writes_the_rest(self):
+        writer = GameLogWriter(self.store, "test", flush_seconds=None)
+        writer.write(LogEvent(1700000000000, "INFO", "last words"))
+        self.assertEqual(list(self.store.search()), [])
+
+        writer.close()
+        self.assertEqual([r["message"] for r in self.store.search()], ["last words"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,31 @@
+import unittest
+from mc_launcher_core.javautils import JavaVersion
+from mc_launcher_core.jvm_profiles import HostResources, JvmProfile, build_jvm_args, choose_profile
+
+
+class JvmProfilesTest(unittest.TestCase):
+    def test_legacy_incremental_mode_only_before_java_9(self):
+        host = HostResources(4, 16384)
+        self.assertIn("-XX:+CMSIncrementalMode", build_jvm_args(JavaVersion("1.8.0_181"), 2048, "legacy", host=host))
+        self.assertNotIn("-XX:+CMSIncrementalMode", build_jvm_args(JavaVersion("11.0.2"), 2048, "legacy", host=host))
+
+    def test_choose_by_cores_and_memory(self):
+        self.assertEqual(choose_profile(JavaVersion("17"), 4096, HostResources(8, 32768)).name, "aikar")
+        self.assertEqual(choose_profile(JavaVersion("21"), 8192, HostResources(8, 32768)).name, "zgc")
+        self.assertEqual(choose_profile(JavaVersion("17"), 4096, HostResources(2, 32768)).name, "g1")
+        self.assertEqual(choose_profile(JavaVersion("17"), 16384, HostResources(8, 4096)).name, "g1")
+
+    def test_heap_larger_than_host(self):
+        args = build_jvm_args(JavaVersion("17"), 16384, "aikar", host=HostResources(8, 4096))
+        self.assertIn("-Xmx16384m", args)
+        self.assertNotIn("-Xms16384m", args)
+        self.assertNotIn("-XX:+AlwaysPreTouch", args)
+
+    def test_base_profile_uses_jvm_defaults(self):
+        args = build_jvm_args(JavaVersion("17"), 2048, JvmProfile(), host=HostResources(4, 16384))
+        self.assertIn("-Xmx2048m", args)
+        self.assertFalse(any(a.startswith("-XX:+Use") for a in args))
+
+
+if __name__ == "__main__":
+    unittest.main()
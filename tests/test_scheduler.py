@@ -0,0 +1,55 @@
+import threading
+import unittest
+from mc_launcher_core.exceptions import DownloadCancelledError
+from mc_launcher_core.web.scheduler import DownloadScheduler, CRITICAL, BACKGROUND
+from mc_launcher_core.web.transfer import TransferPolicy, BandwidthLimiter
+
+
+class DownloadSchedulerTest(unittest.TestCase):
+    def test_bandwidth_limit_applies_to_given_policies(self):
+        policy = TransferPolicy()
+        scheduler = DownloadScheduler(workers=1, bandwidth_limit=1024, policy=policy)
+        try:
+            self.assertIs(scheduler.policy, policy)
+            self.assertIs(policy.bandwidth, scheduler.bandwidth)
+
+            other = TransferPolicy()
+            self.assertIs(scheduler.use_policy(other).bandwidth, scheduler.bandwidth)
+
+            with self.assertRaises(ValueError):
+                scheduler.use_policy(TransferPolicy(bandwidth=BandwidthLimiter(2048)))
+        finally:
+            scheduler.shutdown()
+
+    def test_shutdown_fails_queued_tasks(self):
+        scheduler = DownloadScheduler(workers=1)
+        started = threading.Event()
+        release = threading.Event()
+
+        def block():
+            started.set()
+            release.wait(5)
+
+        handle = scheduler.new_install("test")
+        scheduler.submit(handle, CRITICAL, "running", block)
+        started.wait(5)
+        scheduler.submit(handle, CRITICAL, "queued", lambda: None)
+        scheduler.submit(handle, BACKGROUND, "queued background", lambda: None)
+
+        scheduler.shutdown(wait=False)
+        release.set()
+
+        self.assertTrue(handle.wait(5))
+        self.assertTrue(handle.wait_until_launchable(0))
+        self.assertEqual([d for d, _ in handle.errors], ["queued", "queued background"])
+        self.assertTrue(all(isinstance(ex, DownloadCancelledError) for _, ex in handle.errors))
+
+        # work submitted afterwards (e.g. by a running task) fails straight away
+        late = scheduler.new_install("late")
+        scheduler.submit(late, CRITICAL, "late", lambda: None)
+        self.assertTrue(late.wait(0))
+        self.assertFalse(late.ok)
+
+
+if __name__ == "__main__":
+    unittest.main()
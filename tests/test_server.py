@@ -0,0 +1,42 @@
+import os
+import shutil
+import hashlib
+import zipfile
+import tempfile
+import unittest
+from mc_launcher_core.server import unpack_server_bundle
+
+
+class UnpackServerBundleTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.serverdir = os.path.join(self.root, "server")
+        self.libdir = os.path.join(self.root, "libraries")
+        os.makedirs(self.serverdir)
+
+        self.lib = b"library contents"
+        self.server = b"server contents"
+        with zipfile.ZipFile(os.path.join(self.serverdir, "server.jar"), 'w') as z:
+            z.writestr("META-INF/libraries.list", "{}\ttest:lib:1\ttest/lib.jar\n".format(hashlib.sha256(self.lib).hexdigest()))
+            z.writestr("META-INF/versions.list", "{}\t1.0\t1.0/server-1.0.jar\n".format(hashlib.sha256(self.server).hexdigest()))
+            z.writestr("META-INF/main-class", "net.minecraft.bundler.Main\n")
+            z.writestr("META-INF/libraries/test/lib.jar", self.lib)
+            z.writestr("META-INF/versions/1.0/server-1.0.jar", self.server)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_replaces_corrupt_library_of_the_same_size(self):
+        lib_path = os.path.join(self.libdir, "test", "lib.jar")
+        os.makedirs(os.path.dirname(lib_path))
+        with open(lib_path, 'wb') as f:
+            f.write(b"x" * len(self.lib))
+
+        unpack_server_bundle(self.serverdir, self.libdir)
+
+        with open(lib_path, 'rb') as f:
+            self.assertEqual(f.read(), self.lib)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import os
+import time
+import shutil
+import tempfile
+import unittest
+from urllib.error import HTTPError
+from fake_authserver import FakeAuthServer, DROP
+from mc_launcher_core import MinecraftSession
+from mc_launcher_core.session_store import SessionStore, StoredSession
+
+
+class SessionRestoreTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.store = SessionStore(os.path.join(self.root, "sessions.json"), trust_for=0)
+        profile = dict(id="alice-id", name="alice")
+        self.store.put(StoredSession("alice", "client-token", "alice-token-old", profile, [profile], validated_at=time.time() - 60))
+
+        self.server = FakeAuthServer().__enter__()
+
+    def tearDown(self):
+        self.server.__exit__()
+        shutil.rmtree(self.root)
+
+    def _session(self, password="hunter2"):
+        return MinecraftSession("alice", password, session_store=self.store, authserver=self.server.url)
+
+    def test_valid_token_is_reused(self):
+        session = self._session()
+        self.assertEqual(session.access_token, "alice-token-old")
+        self.assertEqual(self.server.requests_to("/authenticate"), [])
+
+    def test_refreshes_invalid_token(self):
+        self.server.script("/validate", (403, dict(error="ForbiddenOperationException"), dict()))
+        session = self._session()
+        self.assertTrue(session.access_token.startswith("alice-token-"))
+        self.assertNotEqual(session.access_token, "alice-token-old")
+        self.assertEqual(len(self.server.requests_to("/refresh")), 1)
+        self.assertEqual(self.server.requests_to("/authenticate"), [])
+
+    def test_password_login_after_any_refresh_failure(self):
+        for failure in ((403, dict(error="ForbiddenOperationException"), dict()), (503, None, dict()), DROP):
+            self.server.script("/validate", (403, None, dict()))
+            self.server.script("/refresh", failure)
+
+            session = self._session()
+            self.assertEqual(self.store.get("alice").access_token, session.access_token)
+
+        self.assertEqual(len(self.server.requests_to("/authenticate")), 3)
+
+    def test_refresh_failure_without_password_raises(self):
+        self.server.script("/validate", (403, None, dict()))
+        self.server.script("/refresh", (503, None, dict()))
+        with self.assertRaises(HTTPError):
+            self._session(password=None)
+
+
+if __name__ == "__main__":
+    unittest.main()
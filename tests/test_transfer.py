@@ -0,0 +1,130 @@
+import time
+import errno
+import asyncio
+import unittest
+from urllib.error import HTTPError, URLError
+from mc_launcher_core.exceptions import CircuitOpenError
+from mc_launcher_core.web.transfer import TransferPolicy
+
+
+URL = "http://cdn.example/file"
+
+
+def fail(ex):
+    def func():
+        raise ex
+    return func
+
+
+def http_error(code):
+    return HTTPError(URL, code, "error", None, None)
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def make_policy(self, **kwargs):
+        return TransferPolicy(max_attempts=1, breaker_threshold=2, breaker_cooldown=0.01, **kwargs)
+
+    def open_circuit(self, policy):
+        for _ in range(2):
+            with self.assertRaises(URLError):
+                policy.call(URL, fail(URLError("down")))
+        with self.assertRaises(CircuitOpenError):
+            policy.call(URL, lambda: "ok")
+        time.sleep(0.02)
+
+    def test_opens_after_threshold_and_closes_on_success(self):
+        policy = self.make_policy()
+        self.open_circuit(policy)
+
+        self.assertEqual(policy.call(URL, lambda: "ok"), "ok")
+        self.assertEqual(policy.call(URL, lambda: "ok"), "ok")
+
+    def test_not_found_trial_closes_circuit(self):
+        policy = self.make_policy()
+        self.open_circuit(policy)
+
+        with self.assertRaises(HTTPError):
+            policy.call(URL, fail(http_error(404)))
+        self.assertEqual(policy.call(URL, lambda: "ok"), "ok")
+
+    def test_failed_trial_reopens_circuit(self):
+        policy = self.make_policy()
+        self.open_circuit(policy)
+
+        with self.assertRaises(URLError):
+            policy.call(URL, fail(URLError("still down")))
+        with self.assertRaises(CircuitOpenError):
+            policy.call(URL, lambda: "ok")
+
+    def test_cancelled_trial_releases_circuit(self):
+        policy = self.make_policy()
+        self.open_circuit(policy)
+
+        with self.assertRaises(asyncio.CancelledError):
+            policy.call(URL, fail(asyncio.CancelledError()))
+        self.assertEqual(policy.call(URL, lambda: "ok"), "ok")
+
+    def test_local_errors_dont_open_circuit(self):
+        policy = self.make_policy()
+
+        for _ in range(5):
+            with self.assertRaises(OSError):
+                policy.call(URL, fail(OSError(errno.ENOSPC, "No space left on device")))
+        self.assertEqual(policy.call(URL, lambda: "ok"), "ok")
+
+    def test_disabled(self):
+        policy = TransferPolicy(max_attempts=1, breaker_threshold=None)
+        for _ in range(10):
+            with self.assertRaises(URLError):
+                policy.call(URL, fail(URLError("down")))
+        self.assertEqual(policy.call(URL, lambda: "ok"), "ok")
+
+
+class RetryTest(unittest.TestCase):
+    def test_retries_until_success(self):
+        policy = TransferPolicy(max_attempts=3, base_backoff=0, breaker_threshold=None)
+        attempts = []
+
+        def func():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise URLError("flaky")
+            return "ok"
+
+        self.assertEqual(policy.call(URL, func), "ok")
+        self.assertEqual(len(attempts), 3)
+
+    def test_not_retryable(self):
+        policy = TransferPolicy(max_attempts=5, base_backoff=0, breaker_threshold=None)
+        self.assertIsNone(policy.retry_delay(1, http_error(404)))
+        self.assertIsNone(policy.retry_delay(1, OSError(errno.EACCES, "Permission denied", "/x")))
+        self.assertIsNone(policy.retry_delay(5, URLError("down")))
+        self.assertIsNotNone(policy.retry_delay(1, http_error(503)))
+
+    def test_retry_budget(self):
+        policy = TransferPolicy(max_attempts=10, base_backoff=0, breaker_threshold=None, retry_budget_ratio=0.5, min_retries=2)
+
+        self.assertIsNotNone(policy.retry_delay(1, URLError("down")))
+        self.assertIsNotNone(policy.retry_delay(1, URLError("down")))
+        self.assertIsNone(policy.retry_delay(1, URLError("down")))
+
+        # more requests earn more retries
+        for _ in range(2):
+            policy.before_request(URL)
+        self.assertIsNotNone(policy.retry_delay(1, URLError("down")))
+        self.assertIsNone(policy.retry_delay(1, URLError("down")))
+
+    def test_budget_shared_by_calls(self):
+        policy = TransferPolicy(max_attempts=10, base_backoff=0, breaker_threshold=None, retry_budget_ratio=0, min_retries=3)
+
+        with self.assertRaises(URLError):
+            policy.call(URL, fail(URLError("down")))
+        self.assertEqual(policy.retries, 3)
+
+        with self.assertRaises(URLError):
+            policy.call(URL, fail(URLError("down")))
+        self.assertEqual(policy.retries, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()